@@ -2,16 +2,37 @@ from airflow import DAG
 from airflow.operators.python import PythonOperator, BranchPythonOperator
 from airflow.operators.bash import BashOperator
 from datetime import datetime
+import json
+import os
 import subprocess
 
+# incremental - дообучение прошлых версий только на новых размеченных данных
+# (src/models/incremental.py), full - полный поиск гиперпараметров с нуля
+RETRAIN_MODE = os.environ.get("RETRAIN_MODE", "incremental")
 
+
+# Монитор дрейфа дочитывает новые файлы лога предсказаний и печатает вердикты
+# по окнам времени, по одному JSON на строку
 def check_drift_and_decide(**kwargs):
-    script_path = "monitoring/monitor_drift.py"
-    result = subprocess.run(["python", script_path], capture_output=True, text=True)
-    print(result.stdout)
+    result = subprocess.run(
+        ["python", "-m", "src.monitoring.drift"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
     print(result.stderr)
-
-    if "drift detected" in result.stdout.lower() or "PSI" in result.stdout:
+    verdicts = [json.loads(line) for line in result.stdout.splitlines() if line]
+    for verdict in verdicts:
+        print(
+            f'Окно {verdict["window_start"]}: строк {verdict["n_rows"]}, '
+            f'дрейф {verdict["drift_detected"]}, '
+            f'признаки {verdict["drifted_features"]}'
+            + ("" if verdict["complete"] else " (окно не закрыто)")
+        )
+
+    # Решение принимается только по закрытым окнам: промежуточный вердикт
+    # открытого окна посчитан по первым строкам и может быть случайным
+    if any(verdict["drift_detected"] for verdict in verdicts if verdict["complete"]):
         return "retrain_model"
     else:
         return "no_retrain_needed"
@@ -19,10 +40,13 @@ def check_drift_and_decide(**kwargs):
 
 # Функция переобучения модели
 def retrain_model():
-    print("Запуск переобучения модели...")
-    train_script = "src/models/train_pipeline_with_onxx.py"
-    subprocess.run(["python", train_script], check=True)
-    print("Модель переобучена и сохранена в models/new_model.onnx")
+    print(f"Запуск переобучения модели, режим {RETRAIN_MODE}...")
+    if RETRAIN_MODE == "incremental":
+        subprocess.run(["python", "-m", "src.models.incremental"], check=True)
+    else:
+        subprocess.run(["python", "-m", "src.models.train_pipeline"], check=True)
+    subprocess.run(["python", "-m", "onxx_transformation.export"], check=True)
+    print("Модель переобучена и зарегистрирована в models/registry.json")
 
 
 # Функция тестирования новой модели
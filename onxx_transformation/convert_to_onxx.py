@@ -1,66 +1,28 @@
-import joblib
-from skl2onnx import to_onnx
-import numpy as np
-import pandas as pd
-import os
-from src.data.make_dataset import load_and_split_data
-from src.models.train_pipeline import train_pipeline
+from onxx_transformation.export import export_model
+from src.models.registry import REGISTRY_PATH, read_registry
 
 
-def convert_to_onxx(model_path: str = None):
+# Экспорт обученной модели в ONNX по её записи в реестре: версионированные
+# models/{name}_v{version}*.onnx с входом float32 [N, 23], оптимизированный граф
+# и квантизованные варианты, отчёт о точности и скорости каждого
+# Без model_path экспортируется последняя версия RandomForestClassifier
+def convert_to_onxx(model_path: str = None, registry_path: str = REGISTRY_PATH):
+    models = read_registry(registry_path)["models"]
     if model_path is None:
-        if not os.path.exists("models/RandomForestClassifier_credit_default_model.pkl"):
-            load_and_split_data("data/raw/UCI_Credit_Card.csv")
-            _, model_path = train_pipeline("RandomForestClassifier")
+        forests = [e for e in models if e["name"] == "RandomForestClassifier"]
+        if forests:
+            model_path = max(forests, key=lambda entry: entry["version"])["path"]
         else:
-            model_path = "models/RandomForestClassifier_credit_default_model.pkl"
-        model = joblib.load(model_path)
-
-    feature_names = [
-        "LIMIT_BAL",
-        "SEX",
-        "EDUCATION",
-        "MARRIAGE",
-        "AGE",
-        "PAY_0",
-        "PAY_2",
-        "PAY_3",
-        "PAY_4",
-        "PAY_5",
-        "PAY_6",
-        "BILL_AMT1",
-        "BILL_AMT2",
-        "BILL_AMT3",
-        "BILL_AMT4",
-        "BILL_AMT5",
-        "BILL_AMT6",
-        "PAY_AMT1",
-        "PAY_AMT2",
-        "PAY_AMT3",
-        "PAY_AMT4",
-        "PAY_AMT5",
-        "PAY_AMT6",
-    ]
-
-    num_features = len(feature_names)
-
-    # Dummy input как DataFrame с именами колонок
-    dummy_input = pd.DataFrame(
-        np.random.randn(1, num_features).astype(np.float32), columns=feature_names
-    )
+            # Импорт внутри ветки: train_pipeline сам импортирует этот модуль
+            from src.data.make_dataset import load_and_split_data
+            from src.models.train_pipeline import train_pipeline
 
-    # Конвертация в ONNX
-    onnx_model = to_onnx(model, dummy_input, target_opset=13)
-
-    # Сохранение
-    onnx_path = "models/model.onnx"
-    with open(onnx_path, "wb") as f:
-        f.write(onnx_model.SerializeToString())
-
-    # Инфо о размерах для отчёта (benchmark)
-    pkl_size = os.path.getsize(model_path) / (1024 * 1024)
-    onnx_size = os.path.getsize(onnx_path) / (1024 * 1024)
+            load_and_split_data("data/raw/UCI_Credit_Card.csv")
+            _, model_path = train_pipeline("RandomForestClassifier")
+            models = read_registry(registry_path)["models"]
 
-    print(f"Конвертация успешна! ONNX-модель сохранена: {onnx_path}")
-    print(f"Размер исходной модели (.pkl): {pkl_size:.2f} MB")
-    print(f"Размер ONNX-модели: {onnx_size:.2f} MB")
+    # У каждой версии свой файл, поэтому путь однозначно задаёт запись реестра
+    entry = next((entry for entry in models if entry["path"] == model_path), None)
+    if entry is None:
+        raise FileNotFoundError(f"Модели {model_path} нет в реестре {registry_path}")
+    return export_model(entry["id"], registry_path)
@@ -0,0 +1,376 @@
+import copy
+import os
+import sys
+import numpy as np
+from sklearn.metrics import roc_auc_score
+from src.data.splits import SPLIT_NAMES, split_path
+from src.data.stage_cache import cached_stage, package_versions
+from src.features.build_features import FEATURE_NAMES
+from src.models.registry import (
+    REGISTRY_PATH,
+    file_sha256,
+    find_model,
+    read_registry,
+    update_model,
+)
+
+ONNX_DIR = os.environ.get("ONNX_DIR", "models")
+ONNX_TARGET_OPSET = {"": 17, "ai.onnx.ml": 3}
+ONNX_INPUT = "input"
+# Строки из data/processed для калибровки статической квантизации и проверки
+ONNX_CALIBRATION_ROWS = int(os.environ.get("ONNX_CALIBRATION_ROWS", 1000))
+# Вариант допускается к выбору, если вероятности отличаются от sklearn не больше
+# ONNX_EXPORT_TOLERANCE, а ROC-AUC упал не больше ONNX_MAX_AUC_DROP
+ONNX_EXPORT_TOLERANCE = float(os.environ.get("ONNX_EXPORT_TOLERANCE", 1e-3))
+ONNX_MAX_AUC_DROP = float(os.environ.get("ONNX_MAX_AUC_DROP", 0.005))
+# Вариант заменяет предыдущий по списку VARIANTS, только если быстрее хотя бы на
+# эту долю: разница в пределах шума замера не стоит менее простого графа
+ONNX_MIN_SPEEDUP = float(os.environ.get("ONNX_MIN_SPEEDUP", 0.05))
+# Варианты экспорта: исходный граф, граф после оптимизаций ONNX Runtime,
+# статическая int8-квантизация с калибровкой и динамическая квантизация весов
+VARIANTS = ("onnx", "onnx_opt", "onnx_int8", "onnx_dynamic")
+SUFFIXES = {
+    "onnx": ".onnx",
+    "onnx_opt": ".opt.onnx",
+    "onnx_int8": ".int8.onnx",
+    "onnx_dynamic": ".dynamic.onnx",
+}
+# Код, от которого зависят варианты и их отчёты: при его изменении кэш этапа
+# экспорта не используется
+EXPORT_SOURCES = [
+    __file__,
+    os.path.join(os.path.dirname(__file__), "..", "src", "api", "backends.py"),
+    os.path.join(os.path.dirname(__file__), "..", "src", "models", "benchmark.py"),
+]
+
+
+def variant_path(model_id: str, variant: str, onnx_dir: str = ONNX_DIR) -> str:
+    name, version = model_id.split(":")
+    return os.path.join(onnx_dir, f"{name}_v{version}{SUFFIXES[variant]}")
+
+
+# Копия пайплайна, в которой ColumnTransformer выбирает колонки по номеру в
+# FEATURE_NAMES, а не по имени: так у ONNX-модели один вход float32 [N, 23]
+# вместо отдельного входа на каждую колонку
+def indexed_pipeline(pipeline):
+    pipeline = copy.deepcopy(pipeline)
+    preprocessor = pipeline.named_steps.get("preprocessor")
+    if preprocessor is not None and hasattr(preprocessor, "transformers_"):
+        names = list(getattr(preprocessor, "feature_names_in_", FEATURE_NAMES))
+        preprocessor.transformers_ = [
+            (
+                name,
+                transformer,
+                [
+                    FEATURE_NAMES.index(
+                        column if isinstance(column, str) else names[column]
+                    )
+                    for column in columns
+                ],
+            )
+            for name, transformer, columns in preprocessor.transformers_
+        ]
+    return pipeline
+
+
+# StandardScaler на float32-входе считает (x - mean) и деление на scale в float64
+# с округлением до float32 после каждого шага. Опция div_cast в skl2onnx делает
+# оба шага в float64, но с одним округлением и с mean, уже округлённым до
+# float32. В граф возвращаются точные mean и scale и промежуточное округление
+# между Sub и Div: признаки совпадают с сервисом бит в бит, и деревья не
+# расходятся с sklearn на строках у самого порога
+def two_step_scaler(onnx_model, scalers) -> int:
+    from onnx import TensorProto, helper, numpy_helper
+
+    initializers = {tensor.name: tensor for tensor in onnx_model.graph.initializer}
+    producers = {
+        output: node for node in onnx_model.graph.node for output in node.output
+    }
+
+    def constant(name):
+        tensor = initializers.get(name)
+        return None if tensor is None else numpy_helper.to_array(tensor)
+
+    def replace(name, values):
+        initializers[name].CopyFrom(numpy_helper.from_array(values, name))
+
+    nodes, n_patched = [], 0
+    for node in onnx_model.graph.node:
+        source = producers.get(node.input[0]) if node.input else None
+        if node.op_type == "Div" and source is not None and source.op_type == "Sub":
+            mean, scale = constant(source.input[1]), constant(node.input[1])
+            scaler = next(
+                (
+                    scaler
+                    for scaler in scalers
+                    if mean is not None
+                    and scale is not None
+                    and np.array_equal(mean, scaler.mean_.astype(np.float32))
+                    and np.array_equal(scale, scaler.scale_)
+                ),
+                None,
+            )
+            if scaler is None:
+                nodes.append(node)
+                continue
+            replace(source.input[1], scaler.mean_.astype(np.float64))
+            replace(node.input[1], scaler.scale_.astype(np.float64))
+            rounded = f"{node.input[0]}_float32"
+            nodes += [
+                helper.make_node(
+                    "Cast", [node.input[0]], [rounded], to=TensorProto.FLOAT
+                ),
+                helper.make_node(
+                    "Cast", [rounded], [f"{rounded}_double"], to=TensorProto.DOUBLE
+                ),
+            ]
+            node.input[0] = f"{rounded}_double"
+            n_patched += 1
+        nodes.append(node)
+    del onnx_model.graph.node[:]
+    onnx_model.graph.node.extend(nodes)
+    return n_patched
+
+
+def _estimators(estimator):
+    yield estimator
+    for _, step in getattr(estimator, "steps", []):
+        yield from _estimators(step)
+    for _, transformer, _ in getattr(estimator, "transformers_", []):
+        yield from _estimators(transformer)
+
+
+def export_onnx(pipeline, path: str):
+    from skl2onnx import to_onnx
+    from skl2onnx.common.data_types import FloatTensorType
+
+    from sklearn.preprocessing import StandardScaler
+
+    indexed = indexed_pipeline(pipeline)
+    classifier = indexed.steps[-1][1]
+    # Без ZipMap вероятности приходят тензором [N, 2], а не списком словарей
+    options = {id(classifier): {"zipmap": False}}
+    scalers = [
+        step
+        for step in _estimators(indexed)
+        if isinstance(step, StandardScaler) and step.with_mean and step.with_std
+    ]
+    for scaler in scalers:
+        options[id(scaler)] = {"div": "div_cast"}
+    onnx_model = to_onnx(
+        indexed,
+        initial_types=[(ONNX_INPUT, FloatTensorType([None, len(FEATURE_NAMES)]))],
+        options=options,
+        target_opset=ONNX_TARGET_OPSET,
+    )
+    two_step_scaler(onnx_model, scalers)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(onnx_model.SerializeToString())
+    return path
+
+
+# Оптимизации графа ONNX Runtime выполняются один раз при экспорте, а не при
+# каждом старте сервиса. Уровень EXTENDED не зависит от процессора, на котором
+# граф будет исполняться
+def optimize_onnx(path: str, optimized_path: str) -> str:
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = optimized_path
+    ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+    return optimized_path
+
+
+def quantize_onnx_static(path: str, quantized_path: str, matrix: np.ndarray) -> str:
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+
+    class RowsReader(CalibrationDataReader):
+        def __init__(self, rows: np.ndarray, batch_size: int = 100):
+            self.batches = iter(
+                [rows[i : i + batch_size] for i in range(0, len(rows), batch_size)]
+            )
+
+        def get_next(self):
+            batch = next(self.batches, None)
+            return None if batch is None else {ONNX_INPUT: batch}
+
+    quantize_static(
+        path,
+        quantized_path,
+        RowsReader(matrix),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+    return quantized_path
+
+
+def quantize_onnx_dynamic(path: str, quantized_path: str) -> str:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def calibration_rows(n_rows: int = ONNX_CALIBRATION_ROWS):
+    from src.data.splits import load_splits
+
+    X_train, _, X_test, y_test = load_splits(copy=True)
+    random = np.random.RandomState(42)
+    rows = random.choice(len(X_train), min(n_rows, len(X_train)), replace=False)
+    calibration = np.ascontiguousarray(
+        X_train[FEATURE_NAMES].iloc[np.sort(rows)], dtype=np.float32
+    )
+    test = np.ascontiguousarray(X_test[FEATURE_NAMES], dtype=np.float32)
+    return calibration, test, y_test.to_numpy()
+
+
+# Качество и стоимость варианта против sklearn-пайплайна на тестовой выборке
+def evaluate_variant(variant: str, path: str, matrix, y, reference_proba) -> dict:
+    from src.api.backends import OnnxBackend
+    from src.models.benchmark import PROFILE_BATCH_SIZE, measure_latency
+
+    backend = OnnxBackend(variant, path)
+    proba = np.asarray(backend.predict_proba(matrix), dtype=np.float64)
+    roc_auc = float(roc_auc_score(y, proba))
+    single = measure_latency(backend.predict_proba, matrix, 1)
+    batch = measure_latency(backend.predict_proba, matrix, PROFILE_BATCH_SIZE)
+    return {
+        "path": path,
+        "sha256": file_sha256(path),
+        "size_bytes": os.path.getsize(path),
+        "roc_auc": roc_auc,
+        "roc_auc_delta": roc_auc - float(roc_auc_score(y, reference_proba)),
+        "max_diff": float(np.abs(proba - reference_proba).max()),
+        "p50_ms": single["p50_ms"],
+        "p95_ms": single["p95_ms"],
+        "throughput_rows_per_s": batch["throughput_rows_per_s"],
+    }
+
+
+def acceptable(report: dict) -> bool:
+    return (
+        report["max_diff"] <= ONNX_EXPORT_TOLERANCE
+        and report["roc_auc_delta"] >= -ONNX_MAX_AUC_DROP
+    )
+
+
+def select_variant(reports: dict):
+    best = None
+    for variant in VARIANTS:
+        report = reports.get(variant)
+        if report is None or not acceptable(report):
+            continue
+        if best is None or report["p50_ms"] < reports[best]["p50_ms"] * (
+            1 - ONNX_MIN_SPEEDUP
+        ):
+            best = variant
+    return best
+
+
+# Экспорт модели из реестра во все варианты, замер каждого и запись в реестр:
+# entry["onnx"][вариант] и самый быстрый допустимый вариант в entry["onnx_best"]
+def export_model(
+    model_id: str,
+    registry_path: str = REGISTRY_PATH,
+    onnx_dir: str = ONNX_DIR,
+    variants=VARIANTS,
+) -> dict:
+    entry = find_model(read_registry(registry_path), model_id)
+    if entry is None:
+        raise KeyError(f"Модели {model_id} нет в реестре {registry_path}")
+
+    # Ключ кэша - содержимое .pkl, а не id модели: та же модель под новой
+    # версией (например, после пересоздания реестра) не экспортируется заново,
+    # файлы восстанавливаются под путями её версии
+    paths = {variant: variant_path(model_id, variant, onnx_dir) for variant in variants}
+    reports = cached_stage(
+        "export",
+        lambda: _export_variants(
+            entry["path"], variant_path(model_id, "onnx", onnx_dir), paths
+        ),
+        lambda reports: {
+            variant: report["path"] for variant, report in reports.items()
+        },
+        inputs=[entry["path"]] + [split_path(name) for name in SPLIT_NAMES],
+        sources=EXPORT_SOURCES,
+        params={
+            "variants": list(variants),
+            "opset": ONNX_TARGET_OPSET,
+            "calibration_rows": ONNX_CALIBRATION_ROWS,
+            "versions": package_versions("skl2onnx", "onnx", "onnxruntime"),
+        },
+        should_store=bool,
+        destinations=paths,
+    )
+    reports = {
+        variant: {**report, "path": paths[variant]}
+        for variant, report in reports.items()
+    }
+
+    best = select_variant(reports)
+    update_model(model_id, {"onnx": reports, "onnx_best": best}, registry_path)
+
+    size = os.path.getsize(entry["path"])
+    for variant, report in reports.items():
+        print(
+            f"{model_id} {variant}: {report['size_bytes'] / 2**20:.2f} MB "
+            f"({report['size_bytes'] / size:.2f} от .pkl), "
+            f"p50 {report['p50_ms']:.3f} мс, "
+            f"{report['throughput_rows_per_s']:.0f} строк/с, "
+            f"ΔROC-AUC {report['roc_auc_delta']:+.4f}, "
+            f"макс. расхождение {report['max_diff']:.2e}"
+            + ("" if acceptable(report) else " - не допускается")
+        )
+    print(f"{model_id}: лучший вариант {best}")
+    return reports
+
+
+def _export_variants(model_path: str, base_path: str, paths: dict) -> dict:
+    import joblib
+    from src.api.backends import SklearnBackend
+
+    pipeline = joblib.load(model_path)
+    calibration, test, y = calibration_rows()
+    reference_proba = SklearnBackend(pipeline).predict_proba(test)
+
+    base_path = export_onnx(pipeline, base_path)
+    builders = {
+        "onnx": lambda path: base_path,
+        "onnx_opt": lambda path: optimize_onnx(base_path, path),
+        "onnx_int8": lambda path: quantize_onnx_static(base_path, path, calibration),
+        "onnx_dynamic": lambda path: quantize_onnx_dynamic(base_path, path),
+    }
+    reports = {}
+    for variant, path in paths.items():
+        try:
+            builders[variant](path)
+            reports[variant] = evaluate_variant(variant, path, test, y, reference_proba)
+        except Exception as error:
+            print(f"{model_path}: вариант {variant} не собран: {error}")
+    return reports
+
+
+def export_latest(model_names=None, registry_path: str = REGISTRY_PATH) -> dict:
+    latest = {}
+    for entry in read_registry(registry_path)["models"]:
+        if model_names and entry["name"] not in model_names:
+            continue
+        if entry["version"] >= latest.get(entry["name"], {}).get("version", 0):
+            latest[entry["name"]] = entry
+    return {
+        entry["id"]: export_model(entry["id"], registry_path)
+        for entry in latest.values()
+    }
+
+
+if __name__ == "__main__":
+    # Без аргументов экспортируются последние версии всех семейств
+    export_latest(sys.argv[1:] or None)
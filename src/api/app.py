@@ -1,13 +1,62 @@
-import joblib
-import pandas as pd
-from fastapi import FastAPI
+import os
+import time
+from typing import Optional
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-from src.data.make_dataset import load_and_split_data
-from src.models.train_pipeline import train_pipeline
+from src.api.backends import INFERENCE_BACKEND, create_backend
+from src.api.batching import MicroBatcher
+from src.api.cache import cache_key, create_cache
+from src.api.limits import BodySizeLimitMiddleware
+from src.features.build_features import (
+    FEATURE_NAMES,
+    columns_to_matrix,
+    records_to_matrix,
+)
+from src.models.registry import load_champion
+from src.monitoring.metrics import (
+    FEATURES_STAGE,
+    INFERENCE_STAGE,
+    PrometheusMiddleware,
+    handler_finished,
+    handler_started,
+    metrics_response,
+    observe_predictions,
+)
+from src.monitoring.prediction_log import PREDICTION_LOG_ENABLED, PredictionLog
+
+# registry - загрузка готовой модели-чемпиона из реестра (по умолчанию),
+# train - старое поведение: обучение всех моделей при старте приложения
+SERVING_MODE = os.environ.get("MODEL_SERVING_MODE", "registry")
+
+# Ограничения /predict/batch: не больше MAX_BATCH_SIZE строк за запрос и не больше
+# MAX_BATCH_MEMORY_MB на матрицу признаков float32 (23 признака * 4 байта на строку)
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 10000))
+MAX_BATCH_MEMORY_MB = float(os.environ.get("MAX_BATCH_MEMORY_MB", 64))
+# Предел тела /predict/batch, проверяется до разбора JSON (src/api/limits.py).
+# Запись ClientData в JSON - около 500 байт, MAX_BATCH_SIZE записей - около 5 MB
+MAX_BATCH_BODY_MB = float(os.environ.get("MAX_BATCH_BODY_MB", 8))
+
+# Микробатчинг одиночных /predict: запросы, пришедшие в течение
+# MICRO_BATCH_LATENCY_MS, скорятся одной матрицей (не больше MICRO_BATCH_SIZE строк).
+# MICRO_BATCH_SIZE=1 отключает микробатчинг
+MICRO_BATCH_SIZE = int(os.environ.get("MICRO_BATCH_SIZE", 32))
+MICRO_BATCH_LATENCY_MS = float(os.environ.get("MICRO_BATCH_LATENCY_MS", 2))
 
 app = FastAPI(title="Credit Default Prediction API")
+# Добавленное позже middleware - внешнее: задержка отклонённых по размеру
+# запросов тоже попадает в метрики
+app.add_middleware(
+    BodySizeLimitMiddleware, limits={"/predict/batch": int(MAX_BATCH_BODY_MB * 2**20)}
+)
+app.add_middleware(PrometheusMiddleware, paths=["/predict", "/predict/batch"])
 
 model = None
+model_info = None
+# (pipeline, запись реестра), загруженные в мастер-процессе gunicorn до fork
+champion = None
 
 
 class ClientData(BaseModel):
@@ -39,20 +88,122 @@ class ClientData(BaseModel):
     PAY_AMT6: float
 
 
-@app.lifespan("startup")
-def load_model():
-    global model
+class ClientBatch(BaseModel):
+    # Либо список записей ClientData, либо колоночный формат {признак: [значения]}
+    records: Optional[list[ClientData]] = None
+    columns: Optional[dict[str, list[float]]] = None
+
+
+# started - начало обработки строк (сборка матрицы признаков), от него считается
+# задержка, которая пишется в лог предсказаний
+def score_matrix(matrix, started=None):
+    inference_started = time.perf_counter()
+    proba = model.predict_proba(matrix)
+    finished = time.perf_counter()
+    INFERENCE_STAGE.observe(finished - inference_started)
+    observe_predictions(proba)
+    if prediction_log is not None:
+        prediction_log.push(
+            matrix, proba, finished - (started or inference_started), model_info["id"]
+        )
+    return proba
+
+
+def score_records(records):
+    started = time.perf_counter()
+    matrix = records_to_matrix(records)
+    FEATURES_STAGE.observe(time.perf_counter() - started)
+    return score_matrix(matrix, started)
+
+
+batcher = (
+    MicroBatcher(score_records, MICRO_BATCH_SIZE, MICRO_BATCH_LATENCY_MS)
+    if MICRO_BATCH_SIZE > 1
+    else None
+)
+
+# Лог входов и выходов модели для мониторинга дрейфа и дообучения, пишется
+# фоновым потоком. PREDICTION_LOG=0 отключает
+prediction_log = PredictionLog() if PREDICTION_LOG_ENABLED else None
+
+# Кэш вероятностей для повторных /predict по одному и тому же клиенту,
+# ключ - хеш признаков и версии модели. PREDICTION_CACHE=memory|file включает
+prediction_cache = create_cache()
+
+
+def train_models():
+    from src.data.make_dataset import load_and_split_data
+    from src.models.train_pipeline import MODEL_NAMES, train_pipelines
+
     load_and_split_data("data/raw/UCI_Credit_Card.csv")
-    logreg_model = train_pipeline("LogisticRegression")
-    grad_model = train_pipeline("GradientBoostingClassifier")
-    randfor_model = train_pipeline("RandomForestClassifier")
-    best_fi = 0
-    best_model_path = None
-    for model in [logreg_model, grad_model, randfor_model]:
-        metrics = model[0]
-        if metrics["best_f1"] >= best_fi:
-            best_model_path = model[1]
-    model = joblib.load(best_model_path)
+    train_pipelines(MODEL_NAMES)
+
+
+# Вызывается из src/api/gunicorn_conf.py в мастере до создания воркеров: массивы
+# модели (в том числе узлы деревьев) остаются в памяти мастера, и воркеры делят
+# их через copy-on-write вместо того, чтобы загружать свою копию
+def preload_champion():
+    global champion
+    if SERVING_MODE == "train":
+        train_models()
+    try:
+        champion = load_champion()
+    except (OSError, ValueError) as error:
+        # Сервис стартует без модели и отвечает 503, пока её не выложат
+        print(f"Модель не загружена: {error}")
+        return
+    print(f"Модель {champion[1]['id']} загружена до создания воркеров")
+
+
+@app.on_event("startup")
+def load_model():
+    global model, model_info
+    if champion is not None:
+        pipeline, model_info = champion
+    else:
+        if SERVING_MODE == "train":
+            train_models()
+        try:
+            pipeline, model_info = load_champion()
+        except (OSError, ValueError) as error:
+            print(f"Модель не загружена: {error}")
+            return
+    # model - бэкенд инференса (sklearn или ONNX Runtime), выбирается INFERENCE_BACKEND.
+    # ONNX-вариант, который не найден, не открылся (ошибки onnxruntime - не
+    # OSError) или не прошёл проверку, заменяется sklearn
+    try:
+        model = create_backend(pipeline, entry=model_info)
+    except Exception as error:
+        print(f"Бэкенд {INFERENCE_BACKEND} не создан, используется sklearn: {error}")
+        model = create_backend(pipeline, "sklearn", model_info)
+    if prediction_cache is not None:
+        prediction_cache.invalidate(model_info["id"])
+    print(f"Загружена модель {model_info['id']}, бэкенд {model.name}")
+
+
+@app.on_event("startup")
+async def start_batcher():
+    if batcher is not None:
+        await batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    if batcher is not None:
+        await batcher.stop()
+
+
+@app.on_event("startup")
+def start_prediction_log():
+    if prediction_log is not None:
+        prediction_log.start()
+
+
+@app.on_event("shutdown")
+def stop_prediction_log():
+    # Дописывает оставшиеся строки и закрывает текущий файл
+    if prediction_log is not None:
+        prediction_log.stop()
 
 
 @app.get("/")
@@ -60,9 +211,151 @@ def root():
     return {"message": "Credit Default Prediction API is working!"}
 
 
+@app.get("/health")
+def health():
+    if model is None:
+        return JSONResponse(
+            status_code=503, content={"status": "unavailable", "model_loaded": False}
+        )
+    return {
+        "status": "ok",
+        "model_loaded": True,
+        "model": model_info["id"],
+        "sha256": model_info["sha256"],
+        "backend": model.name,
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    content, content_type = metrics_response()
+    return Response(content=content, media_type=content_type)
+
+
 @app.post("/predict")
-def predict(data: ClientData):
-    input_data = pd.DataFrame([data.model_dump()])
-    proba = float(model.predict_proba(input_data)[0][1])
+async def predict(data: ClientData, request: Request):
+    handler_started(request.scope)
+    try:
+        return await _predict(data)
+    finally:
+        # Отмечается и для ранних ответов (503), иначе запрос не закрыт в метриках
+        handler_finished(request.scope)
+
+
+# Файловый кэш ходит в SQLite, его вызовы уходят в пул потоков, чтобы не
+# держать event loop; кэш в памяти вызывается напрямую
+async def cache_call(method, *args):
+    if prediction_cache.blocking:
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+# Попадание в кэш не доходит до модели, но учитывается в predictions_total и
+# пишется в лог предсказаний: иначе объём и дрейф недосчитываются с ростом
+# доли попаданий
+def record_cached(data: ClientData, proba: float, started: float) -> None:
+    probabilities = np.array([proba], dtype=np.float32)
+    observe_predictions(probabilities, model_call=False)
+    if prediction_log is not None:
+        prediction_log.push(
+            records_to_matrix([data]),
+            probabilities,
+            time.perf_counter() - started,
+            model_info["id"],
+        )
+
+
+async def _predict(data: ClientData):
+    if model is None:
+        return JSONResponse(status_code=503, content={"detail": "Модель не загружена"})
+    started = time.perf_counter()
+    proba = None
+    if prediction_cache is not None:
+        key = cache_key(data, model_info["id"])
+        proba = await cache_call(prediction_cache.get, key)
+        if proba is not None:
+            record_cached(data, proba, started)
+    if proba is None:
+        if batcher is not None:
+            proba = float(await batcher.submit(data))
+        else:
+            proba = float((await run_in_threadpool(score_records, [data]))[0])
+        if prediction_cache is not None:
+            await cache_call(prediction_cache.put, key, proba, model_info["id"])
     pred = int(proba >= 0.5)
     return {"default_prediction": pred, "default_probability": proba}
+
+
+@app.post(
+    "/predict/batch",
+    description=(
+        "Пакетный скоринг: одна матрица float32 и один вызов predict_proba. "
+        f"Максимум {MAX_BATCH_SIZE} строк, {MAX_BATCH_MEMORY_MB:g} MB на матрицу "
+        f"признаков и {MAX_BATCH_BODY_MB:g} MB на тело запроса, при превышении "
+        "возвращается 413."
+    ),
+)
+def predict_batch(batch: ClientBatch, request: Request):
+    handler_started(request.scope)
+    try:
+        return _predict_batch(batch)
+    finally:
+        handler_finished(request.scope)
+
+
+def _predict_batch(batch: ClientBatch):
+    if model is None:
+        return JSONResponse(status_code=503, content={"detail": "Модель не загружена"})
+    if (batch.records is None) == (batch.columns is None):
+        return JSONResponse(
+            status_code=422,
+            content={"detail": "Нужно передать либо records, либо columns"},
+        )
+
+    if batch.records is not None:
+        n_rows = len(batch.records)
+    else:
+        n_rows = max((len(values) for values in batch.columns.values()), default=0)
+    matrix_mb = n_rows * len(FEATURE_NAMES) * 4 / (1024 * 1024)
+    if n_rows > MAX_BATCH_SIZE or matrix_mb > MAX_BATCH_MEMORY_MB:
+        return JSONResponse(
+            status_code=413,
+            content={
+                "detail": f"Размер пакета {n_rows} строк ({matrix_mb:.1f} MB) превышает "
+                f"лимит {MAX_BATCH_SIZE} строк / {MAX_BATCH_MEMORY_MB:g} MB"
+            },
+        )
+    if n_rows == 0:
+        return {"default_predictions": [], "default_probabilities": [], "count": 0}
+
+    started = time.perf_counter()
+    if batch.records is not None:
+        matrix = records_to_matrix(batch.records)
+    else:
+        try:
+            matrix = columns_to_matrix(batch.columns)
+        except ValueError as error:
+            return JSONResponse(status_code=422, content={"detail": str(error)})
+    FEATURES_STAGE.observe(time.perf_counter() - started)
+
+    proba = score_matrix(matrix, started)
+    return {
+        "default_predictions": (proba >= 0.5).astype(int).tolist(),
+        "default_probabilities": proba.tolist(),
+        "count": n_rows,
+    }
+
+
+@app.get("/predict/stats")
+def predict_stats():
+    stats = {"micro_batching": batcher is not None}
+    if batcher is not None:
+        stats.update(batcher.stats())
+    if prediction_log is not None:
+        stats["prediction_log"] = prediction_log.stats()
+    if prediction_cache is not None:
+        stats["prediction_cache"] = {
+            "backend": prediction_cache.name,
+            "entries": prediction_cache.size(),
+        }
+    return stats
@@ -0,0 +1,210 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from src.features.build_features import FEATURE_NAMES, matrix_to_frame
+from src.features.vectorizer import check_compiled, compile_preprocessor
+from src.models.forest import CompiledForest
+
+# sklearn - joblib-пайплайн чемпиона, onnx, onnx_opt, onnx_int8, onnx_dynamic -
+# варианты, экспортированные для чемпиона onxx_transformation/export.py (пути
+# берутся из его записи в реестре), onnx_best - самый быстрый из них, прошедший
+# проверку точности при экспорте
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "sklearn")
+ONNX_INTRA_OP_THREADS = int(os.environ.get("ONNX_INTRA_OP_THREADS", 1))
+ONNX_INTER_OP_THREADS = int(os.environ.get("ONNX_INTER_OP_THREADS", 1))
+
+# Проверка ONNX-модели при загрузке: максимальное расхождение вероятностей с
+# sklearn-пайплайном на эталонной выборке. Экспорт воспроизводит float32-путь
+# sklearn (onxx_transformation/export.py), расхождение точных вариантов - около
+# 1e-6. Квантизованные варианты сравниваются с тем же допуском, с которым они
+# прошли проверку при экспорте (ONNX_EXPORT_TOLERANCE)
+ONNX_TOLERANCE = float(os.environ.get("ONNX_TOLERANCE", 1e-4))
+ONNX_QUANTIZED_TOLERANCE = float(os.environ.get("ONNX_QUANTIZED_TOLERANCE", 1e-3))
+QUANTIZED_VARIANTS = ("onnx_int8", "onnx_dynamic")
+# Эталонная выборка сохраняется при обучении рядом с артефактом модели
+# (запись reference в реестре), сервису не нужны данные обучения. Сырой датасет
+# используется только для записей без неё, если он есть на хосте
+REFERENCE_DATA_PATH = os.environ.get(
+    "REFERENCE_DATA_PATH", "data/raw/UCI_Credit_Card.csv"
+)
+REFERENCE_ROWS = int(os.environ.get("REFERENCE_ROWS", 1000))
+
+# Признаки для sklearn-бэкенда считаются скомпилированным препроцессором на NumPy
+# вместо DataFrame + ColumnTransformer. COMPILED_FEATURES=0 возвращает старый путь
+COMPILED_FEATURES = os.environ.get("COMPILED_FEATURES", "1") == "1"
+
+
+class SklearnBackend:
+    def __init__(self, pipeline, compiled_preprocessor=None):
+        self.pipeline = pipeline
+        self.compiled_preprocessor = compiled_preprocessor
+        self.classifier = pipeline.steps[-1][1]
+        # Пайплайн из компактного артефакта считает деревья своим движком
+        self.name = (
+            "forest" if isinstance(self.classifier, CompiledForest) else "sklearn"
+        )
+
+    def predict_proba(self, matrix: np.ndarray) -> np.ndarray:
+        if self.compiled_preprocessor is None:
+            return self.pipeline.predict_proba(matrix_to_frame(matrix))[:, 1]
+        features = self.compiled_preprocessor.transform(matrix)
+        return self.classifier.predict_proba(features)[:, 1]
+
+
+class OnnxBackend:
+    def __init__(
+        self, name: str, model_path: str, intra_op_threads=1, inter_op_threads=1
+    ):
+        import onnxruntime as ort
+
+        self.name = name
+        self.model_path = model_path
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Одна сессия на процесс: InferenceSession.run потокобезопасен
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+
+        inputs = self.session.get_inputs()
+        # skl2onnx из DataFrame создаёт отдельный вход [None, 1] на каждую колонку,
+        # типизированный экспорт - один вход [None, 23]
+        self.input_names = [inp.name for inp in inputs]
+        self.per_column = len(inputs) > 1
+        if self.per_column and self.input_names != FEATURE_NAMES:
+            raise ValueError(
+                f"Входы ONNX-модели {model_path} не совпадают с FEATURE_NAMES"
+            )
+        self.probability_output = self.session.get_outputs()[1].name
+
+        # Буферы float32 переиспользуются между вызовами, по одному на поток
+        self.buffers = threading.local()
+
+    def _buffer(self, n_rows: int) -> np.ndarray:
+        buffer = getattr(self.buffers, "matrix", None)
+        if buffer is None or buffer.shape[0] < n_rows:
+            capacity = max(n_rows, 64 if buffer is None else 2 * buffer.shape[0])
+            # Fortran-порядок: каждая колонка непрерывна и подаётся во вход без копии
+            order = "F" if self.per_column else "C"
+            buffer = np.empty((capacity, len(FEATURE_NAMES)), np.float32, order=order)
+            self.buffers.matrix = buffer
+        return buffer[:n_rows]
+
+    def predict_proba(self, matrix: np.ndarray) -> np.ndarray:
+        buffer = self._buffer(matrix.shape[0])
+        buffer[...] = matrix
+        if self.per_column:
+            feeds = {
+                name: buffer[:, i : i + 1] for i, name in enumerate(self.input_names)
+            }
+        else:
+            feeds = {self.input_names[0]: buffer}
+        proba = self.session.run([self.probability_output], feeds)[0]
+        # С ZipMap вероятности приходят списком словарей {класс: вероятность}
+        if isinstance(proba, list):
+            return np.fromiter((row[1] for row in proba), np.float32, len(proba))
+        return proba[:, 1]
+
+
+def save_reference(matrix: np.ndarray, path: str, n_rows=REFERENCE_ROWS) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.save(path, np.ascontiguousarray(matrix[:n_rows], dtype=np.float32))
+    return path
+
+
+def reference_matrix(
+    entry: dict = None, data_path: str = REFERENCE_DATA_PATH, n_rows=REFERENCE_ROWS
+):
+    reference = (entry or {}).get("reference")
+    try:
+        if reference is not None:
+            return np.load(reference["path"])
+        if os.path.exists(data_path):
+            frame = pd.read_csv(data_path, nrows=n_rows, usecols=FEATURE_NAMES)
+            return np.ascontiguousarray(frame[FEATURE_NAMES], dtype=np.float32)
+    except (OSError, ValueError) as error:
+        print(f"Эталонная выборка не прочитана: {error}")
+        return None
+    print("Эталонной выборки нет: у модели нет записи reference, нет и сырых данных")
+    return None
+
+
+def check_backend(backend, reference_backend, matrix: np.ndarray, tolerance: float):
+    diff = np.abs(
+        backend.predict_proba(matrix) - reference_backend.predict_proba(matrix)
+    )
+    max_diff = float(diff.max())
+    if max_diff > tolerance:
+        raise ValueError(
+            f"Бэкенд {backend.name} расходится с sklearn на {max_diff:.4f} "
+            f"(допуск {tolerance}) на {len(matrix)} эталонных строках"
+        )
+    return max_diff
+
+
+def compile_pipeline_features(pipeline, matrix: np.ndarray):
+    preprocessor = pipeline.named_steps.get("preprocessor")
+    try:
+        compiled = compile_preprocessor(preprocessor)
+    except (ValueError, AttributeError) as error:
+        print(f"Препроцессор не скомпилирован, используется sklearn: {error}")
+        return None
+    if not check_compiled(compiled, preprocessor, matrix):
+        print(
+            "Скомпилированный препроцессор расходится с sklearn, используется sklearn"
+        )
+        return None
+    return compiled
+
+
+def onnx_model_path(backend_name: str, entry: dict = None):
+    exported = (entry or {}).get("onnx") or {}
+    if backend_name == "onnx_best":
+        backend_name = (entry or {}).get("onnx_best")
+        if backend_name is None:
+            raise ValueError("У модели нет ONNX-варианта, прошедшего проверку")
+    if backend_name in exported:
+        return backend_name, exported[backend_name]["path"]
+    raise ValueError(
+        f"Бэкенд {backend_name} недоступен для модели "
+        f"{(entry or {}).get('id')}. Доступные: {['sklearn', 'onnx_best', *exported]}"
+    )
+
+
+# sklearn-бэкенд создаётся всегда: без эталонной выборки признаки считаются
+# sklearn-препроцессором. ONNX-бэкенд без проверки не создаётся, ошибки -
+# ValueError или OSError
+def create_backend(pipeline, backend_name: str = INFERENCE_BACKEND, entry: dict = None):
+    if backend_name == "sklearn":
+        compiled = None
+        if COMPILED_FEATURES:
+            reference = reference_matrix(entry)
+            if reference is not None:
+                compiled = compile_pipeline_features(pipeline, reference)
+        return SklearnBackend(pipeline, compiled)
+    sklearn_backend = SklearnBackend(pipeline)
+    backend_name, path = onnx_model_path(backend_name, entry)
+    reference = reference_matrix(entry)
+    if reference is None:
+        raise ValueError(f"Бэкенд {backend_name} не с чем проверить")
+    backend = OnnxBackend(
+        backend_name,
+        path,
+        ONNX_INTRA_OP_THREADS,
+        ONNX_INTER_OP_THREADS,
+    )
+    tolerance = (
+        ONNX_QUANTIZED_TOLERANCE
+        if backend_name in QUANTIZED_VARIANTS
+        else ONNX_TOLERANCE
+    )
+    max_diff = check_backend(backend, sklearn_backend, reference, tolerance)
+    print(
+        f"Бэкенд {backend_name} проверен, макс. расхождение с sklearn: {max_diff:.2e}"
+    )
+    return backend
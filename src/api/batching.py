@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import Counter
+from src.monitoring.metrics import MICRO_BATCH_QUEUE_WAIT
+
+# Границы гистограммы ожидания в очереди, секунды
+QUEUE_WAIT_BUCKETS = [0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1]
+
+
+# Собирает одиночные запросы в пакеты и скорит их одним вызовом модели.
+# Пакет отправляется, когда набралось max_batch_size запросов или с момента
+# прихода первого запроса прошло max_latency_ms. Пока модель считает пакет,
+# новые запросы копятся в очереди и уходят следующим пакетом.
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size: int = 32, max_latency_ms=2.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.queue = None
+        self.task = None
+        # Пакет, взятый из очереди и ещё не получивший ответов
+        self.pending = []
+
+        self.batch_sizes = Counter()
+        self.queue_wait_counts = [0] * (len(QUEUE_WAIT_BUCKETS) + 1)
+        self.queue_wait_sum = 0.0
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        # Запросы из недосчитанного пакета и из очереди получают ошибку сразу, а
+        # не ждут таймаута клиента при остановке или перезапуске воркера
+        pending, self.pending = self.pending, []
+        while self.queue is not None and not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("batcher stopped"))
+
+    async def submit(self, item):
+        if self.task is None:
+            raise RuntimeError("batcher stopped")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        batch = self.pending = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            self._observe(batch, started)
+
+            items = [item for item, _, _ in batch]
+            try:
+                # Модель считается в пуле потоков, чтобы не блокировать event loop
+                results = await loop.run_in_executor(None, self.predict_fn, items)
+            except Exception as error:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                self.pending = []
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            self.pending = []
+
+    def _observe(self, batch, started: float):
+        self.batch_sizes[len(batch)] += 1
+        for _, _, enqueued in batch:
+            wait = started - enqueued
+            MICRO_BATCH_QUEUE_WAIT.observe(wait)
+            self.queue_wait_sum += wait
+            for i, bound in enumerate(QUEUE_WAIT_BUCKETS):
+                if wait <= bound:
+                    self.queue_wait_counts[i] += 1
+                    break
+            else:
+                self.queue_wait_counts[-1] += 1
+
+    def stats(self) -> dict:
+        requests = sum(size * count for size, count in self.batch_sizes.items())
+        batches = sum(self.batch_sizes.values())
+        bounds = [str(bound) for bound in QUEUE_WAIT_BUCKETS] + ["+Inf"]
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_latency_ms": self.max_latency * 1000,
+            "requests": requests,
+            "batches": batches,
+            "mean_batch_size": requests / batches if batches else 0.0,
+            "batch_size_counts": dict(sorted(self.batch_sizes.items())),
+            "queue_wait_seconds_counts": dict(zip(bounds, self.queue_wait_counts)),
+            "queue_wait_seconds_mean": (
+                self.queue_wait_sum / requests if requests else 0.0
+            ),
+        }
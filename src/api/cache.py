@@ -0,0 +1,216 @@
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Optional
+from src.features.build_features import FEATURE_NAMES
+from src.monitoring.metrics import PREDICTION_CACHE_HITS, PREDICTION_CACHE_MISSES
+
+# off - без кэша, memory - LRU в памяти процесса, file - общий для всех
+# воркеров файл SQLite на локальном диске (или в /dev/shm)
+PREDICTION_CACHE = os.environ.get("PREDICTION_CACHE", "off")
+PREDICTION_CACHE_PATH = os.environ.get(
+    "PREDICTION_CACHE_PATH", "/dev/shm/prediction_cache.sqlite"
+)
+PREDICTION_CACHE_TTL_SECONDS = float(
+    os.environ.get("PREDICTION_CACHE_TTL_SECONDS", 300)
+)
+# Запись кэша - 16-байтный ключ и вероятность, около 200 байт в памяти процесса
+# вместе с накладными расходами OrderedDict, 100 тысяч записей - около 20 MB
+PREDICTION_CACHE_MAX_ENTRIES = int(
+    os.environ.get("PREDICTION_CACHE_MAX_ENTRIES", 100_000)
+)
+
+_features = attrgetter(*FEATURE_NAMES)
+_pack = struct.Struct(f"<{len(FEATURE_NAMES)}d").pack
+
+
+# Канонический ключ: значения признаков в порядке FEATURE_NAMES как float64 и
+# версия модели. 1 и 1.0 дают один ключ, порядок полей в JSON не важен
+def cache_key(record, model_id: str) -> bytes:
+    digest = hashlib.blake2b(_pack(*_features(record)), digest_size=16)
+    digest.update(model_id.encode())
+    return digest.digest()
+
+
+# blocking - вызовы кэша ходят на диск, и обработчик выносит их из event loop
+class MemoryCache:
+    name = "memory"
+    blocking = False
+
+    def __init__(
+        self,
+        max_entries: int = PREDICTION_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: bytes):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self.entries.move_to_end(key)
+                    PREDICTION_CACHE_HITS.inc()
+                    return entry[0]
+                del self.entries[key]
+        PREDICTION_CACHE_MISSES.inc()
+        return None
+
+    def put(self, key: bytes, value: float, model_id: str) -> None:
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, model_id: str) -> None:
+        # Ключ включает версию модели, старые записи всё равно не совпадут,
+        # но память под них освобождается сразу
+        with self.lock:
+            self.entries.clear()
+
+    def size(self) -> int:
+        return len(self.entries)
+
+
+# Кэш в одном файле SQLite, общий для всех воркеров uvicorn на узле. Каждый поток
+# держит своё соединение, WAL позволяет читать параллельно с записью. get и put
+# выполняются в пуле потоков и блокировки не ждут, чтобы не занимать потоки пула:
+# занятый другим воркером файл считается промахом, а запись пропускается
+class FileCache:
+    name = "file"
+    blocking = True
+
+    def __init__(
+        self,
+        path: str = PREDICTION_CACHE_PATH,
+        max_entries: int = PREDICTION_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.local = threading.local()
+        self.puts = 0
+        self.last_size = None
+        self.puts_lock = threading.Lock()
+        # Схема и режим WAL (он сохраняется в файле) создаются при старте, здесь
+        # можно подождать воркер, который делает то же самое
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key BLOB PRIMARY KEY, value REAL, model TEXT, "
+                "expires REAL, accessed REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)"
+            )
+        finally:
+            connection.close()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Соединение, унаследованное через fork от родителя, не используется
+        pid, connection = getattr(self.local, "connection", (None, None))
+        if pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+            connection.execute("PRAGMA synchronous=OFF")
+            self.local.connection = (os.getpid(), connection)
+        return connection
+
+    def get(self, key: bytes):
+        now = time.time()
+        connection = self._connection()
+        row = None
+        try:
+            row = connection.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] > now:
+                connection.execute(
+                    "UPDATE cache SET accessed = ? WHERE key = ?", (now, key)
+                )
+        except sqlite3.OperationalError:
+            # Файл занят: если строка уже прочитана, теряется только обновление
+            # времени доступа для LRU, иначе это промах
+            pass
+        if row is not None and row[1] > now:
+            PREDICTION_CACHE_HITS.inc()
+            return row[0]
+        PREDICTION_CACHE_MISSES.inc()
+        return None
+
+    def put(self, key: bytes, value: float, model_id: str) -> None:
+        now = time.time()
+        connection = self._connection()
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                (key, value, model_id, now + self.ttl, now),
+            )
+        except sqlite3.OperationalError:
+            # Файл занят другим воркером - запись в кэш не обязательна
+            return
+        with self.puts_lock:
+            self.puts += 1
+            evict = self.puts % 1000 == 0
+        # Вытеснение пачкой раз в 1000 записей в отдельном потоке: удаление
+        # просматривает индекс по времени доступа и не должно держать event loop
+        if evict:
+            threading.Thread(target=self.evict, args=(now,), daemon=True).start()
+
+    def evict(self, now: float) -> None:
+        connection = self._connection()
+        try:
+            connection.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+            connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            # Поток завершается, соединение больше не понадобится
+            connection.close()
+
+    def invalidate(self, model_id: str) -> None:
+        # Ключ включает версию модели: если файл занят, старые записи не
+        # совпадут с новыми запросами и уйдут при вытеснении
+        try:
+            self._connection().execute(
+                "DELETE FROM cache WHERE model != ?", (model_id,)
+            )
+        except sqlite3.OperationalError:
+            pass
+
+    # Число записей или последнее известное (None до первого успешного
+    # подсчёта), если файл занят другим воркером
+    def size(self) -> Optional[int]:
+        try:
+            self.last_size = (
+                self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            )
+        except sqlite3.OperationalError:
+            pass
+        return self.last_size
+
+
+def create_cache(kind: str = PREDICTION_CACHE):
+    if kind == "off":
+        return None
+    if kind == "memory":
+        return MemoryCache()
+    if kind == "file":
+        return FileCache()
+    raise ValueError(f"Неизвестный тип кэша {kind}. Доступные: off, memory, file")
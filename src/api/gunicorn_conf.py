@@ -0,0 +1,39 @@
+import gc
+import os
+import shutil
+
+# Несколько воркеров uvicorn под gunicorn. С preload_app модуль приложения
+# импортируется в мастере, и чемпион загружается один раз до fork: воркеры делят
+# страницы с массивами модели через copy-on-write, а часть массивов, которые
+# joblib отдаёт как memmap, - через page cache файла модели
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.environ.get("WORKER_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("WORKER_GRACEFUL_TIMEOUT", 30))
+accesslog = None
+
+# Каталог метрик очищается до импорта приложения: метрики создают в нём файлы
+# уже при импорте, а счётчики прошлого запуска не должны попасть в сумму
+multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if multiproc_dir:
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def when_ready(server):
+    from src.api import app
+
+    app.preload_champion()
+    # Объекты, живущие всё время работы, переносятся в постоянное поколение:
+    # сборщик мусора воркера не обходит их и не пишет в их заголовки, поэтому
+    # общие страницы не копируются после fork
+    gc.collect()
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    from src.monitoring.metrics import mark_worker_dead
+
+    mark_worker_dead(worker.pid)
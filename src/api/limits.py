@@ -0,0 +1,58 @@
+from fastapi.responses import JSONResponse
+
+
+async def _reject(scope, receive, send, limit: int) -> None:
+    response = JSONResponse(
+        status_code=413,
+        content={
+            "detail": f"Тело запроса больше {limit / 2**20:g} MB, "
+            "разбейте пакет на несколько запросов"
+        },
+    )
+    await response(scope, receive, send)
+
+
+# ASGI-middleware, отклоняющее слишком большие тела запросов до разбора JSON:
+# объекты pydantic занимают в разы больше памяти, чем сам JSON и итоговая матрица
+# признаков. Тело с Content-Length больше предела отклоняется сразу, не читаясь
+# (uvicorn не даст клиенту прислать больше заявленного). Тело без Content-Length
+# (chunked) читается с подсчётом и отклоняется, как только превысит предел
+class BodySizeLimitMiddleware:
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None:
+            if int(length) > limit:
+                return await _reject(scope, receive, send, limit)
+            return await self.app(scope, receive, send)
+
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > limit:
+                return await _reject(scope, receive, send, limit)
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, replay, send)
@@ -0,0 +1,77 @@
+import json
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from .splits import PROCESSED_DIR, TARGET_COLUMN
+
+# Статистики заполнения пропусков, посчитанные на этапе prepare. Их же читают
+# сервис и мониторинг дрейфа, чтобы не пересчитывать медианы по своим данным
+FILL_VALUES_FILE = "fill_values.json"
+FILL_VALUES_PATH = os.environ.get(
+    "FILL_VALUES_PATH", os.path.join(PROCESSED_DIR, FILL_VALUES_FILE)
+)
+
+
+def fill_values_path(processed_dir: str = PROCESSED_DIR) -> str:
+    return os.path.join(processed_dir, FILL_VALUES_FILE)
+
+
+# Медианы всех числовых колонок за один векторный проход по матрице и мода для
+# остальных (в исходных данных таких колонок нет)
+def fit_fill_values(frame: pd.DataFrame, exclude=(TARGET_COLUMN,)) -> dict:
+    columns = [column for column in frame.columns if column not in exclude]
+    numeric = [
+        column
+        for column in columns
+        if pd.api.types.is_numeric_dtype(frame[column].dtype)
+    ]
+    fill_values = {}
+    if numeric:
+        values = frame[numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+        with warnings.catch_warnings():
+            # Полностью пустая колонка даёт NaN, как Series.median()
+            warnings.simplefilter("ignore", RuntimeWarning)
+            medians = np.nanmedian(values, axis=0)
+        fill_values.update(zip(numeric, medians.tolist()))
+    for column in columns:
+        if column not in fill_values:
+            mode = frame[column].mode(dropna=True)
+            if len(mode):
+                fill_values[column] = mode.iloc[0]
+    return fill_values
+
+
+# Заполнение на месте: трогаются только колонки, в которых есть пропуски
+def fill_missing(frame: pd.DataFrame, fill_values: dict) -> pd.DataFrame:
+    columns = [column for column in fill_values if column in frame.columns]
+    if not columns:
+        return frame
+    has_missing = frame[columns].isna().to_numpy().any(axis=0)
+    to_fill = {
+        column: fill_values[column]
+        for column, missing in zip(columns, has_missing)
+        if missing and not pd.isna(fill_values[column])
+    }
+    if to_fill:
+        frame.fillna(to_fill, inplace=True)
+    return frame
+
+
+def save_fill_values(fill_values: dict, path: str = FILL_VALUES_PATH) -> str:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    values = {
+        column: None if pd.isna(value) else value
+        for column, value in fill_values.items()
+    }
+    with open(path, "w") as file:
+        json.dump(values, file, indent=2, default=str)
+    return path
+
+
+def load_fill_values(path: str = FILL_VALUES_PATH) -> dict:
+    with open(path) as file:
+        values = json.load(file)
+    return {
+        column: np.nan if value is None else value for column, value in values.items()
+    }
@@ -2,15 +2,38 @@ import pandas as pd
 from sklearn.model_selection import train_test_split
 import os
 import sys
-import great_expectations as ge
-from .great_expectations_validation import create_expectation_suite
+from .cleaning import (
+    FILL_VALUES_PATH,
+    fill_missing,
+    fill_values_path,
+    fit_fill_values,
+    save_fill_values,
+)
+from .stage_cache import cached_stage, package_versions
+from .validation import validate_frame
+from .splits import SPLIT_NAMES, TARGET_COLUMN, split_path, write_split
+from .streaming import INGESTION_CHUNK_ROWS, SKETCH_SIZE, stream_and_split_data
 
-TARGET_COLUMN = "default.payment.next.month"
+# memory - весь файл читается в pandas, stream - чтение кусками с ограниченной
+# памятью и разбиением по хешу ID, auto - stream для файлов больше
+# INGESTION_MEMORY_LIMIT_MB
+INGESTION_MODE = os.environ.get("INGESTION_MODE", "auto")
+INGESTION_MEMORY_LIMIT_MB = float(os.environ.get("INGESTION_MEMORY_LIMIT_MB", 1024))
+# Код, от которого зависят выборки: при его изменении кэш этапа не используется
+PREPARE_SOURCES = [
+    os.path.join(os.path.dirname(__file__), f"{name}.py")
+    for name in ("make_dataset", "splits", "validation", "streaming", "cleaning")
+]
 
 
-def basic_clean_data(target_df: pd.DataFrame, data_path: str) -> pd.DataFrame:
+def use_streaming(data_path: str) -> bool:
+    if INGESTION_MODE == "auto":
+        return os.path.getsize(data_path) > INGESTION_MEMORY_LIMIT_MB * 2**20
+    return INGESTION_MODE == "stream"
 
-    target_df = target_df.copy()
+
+# Приводит колонки к рабочему виду на месте, без копии всего датафрейма
+def prepare_columns(target_df: pd.DataFrame, data_path: str) -> pd.DataFrame:
     target_df.columns = [column.strip() for column in target_df.columns]
 
     if TARGET_COLUMN in target_df.columns:
@@ -22,53 +45,74 @@ def basic_clean_data(target_df: pd.DataFrame, data_path: str) -> pd.DataFrame:
             f"В данных отстутсвует таргет колонка {TARGET_COLUMN}. Проверьте данные в папке {data_path}."
         )
 
-    target_df = target_df.drop("ID", axis=1, errors="ignore")
-
-    for column in target_df.columns:
-        if column == TARGET_COLUMN:
-            continue
-        if pd.api.types.is_numeric_dtype(target_df[column]):
-            if target_df[column].isna().any():
-                target_df[column] = target_df[column].fillna(target_df[column].median())
-        else:
-            if target_df[column].isna().any():
-                target_df[column] = target_df[column].fillna(
-                    target_df[column].mode(dropna=True).iloc[0]
-                )
-
+    target_df.drop("ID", axis=1, errors="ignore", inplace=True)
     return target_df
 
 
+# Пропуски заполняются медианой (числовые колонки) или модой. Если fill_values
+# не переданы, статистики считаются по самим данным
+def basic_clean_data(
+    target_df: pd.DataFrame, data_path: str, fill_values: dict = None
+) -> pd.DataFrame:
+    target_df = prepare_columns(target_df, data_path)
+    if fill_values is None:
+        fill_values = fit_fill_values(target_df)
+    return fill_missing(target_df, fill_values)
+
+
+# Выборки и статистики заполнения берутся из кэша этапов, если не изменились
+# сырой файл, код подготовки и режим загрузки
 def load_and_split_data(data_path: str) -> bool:
+    streaming = os.path.exists(data_path) and use_streaming(data_path)
+
+    def outputs(_) -> dict:
+        files = {f"{name}.feather": split_path(name) for name in SPLIT_NAMES}
+        files["fill_values.json"] = (
+            fill_values_path() if streaming else FILL_VALUES_PATH
+        )
+        return files
+
+    return cached_stage(
+        "prepare",
+        lambda: _load_and_split_data(data_path),
+        outputs,
+        inputs=[data_path],
+        sources=PREPARE_SOURCES,
+        params={
+            "streaming": streaming,
+            "chunk_rows": INGESTION_CHUNK_ROWS if streaming else None,
+            "sketch_size": SKETCH_SIZE if streaming else None,
+            "versions": package_versions("pandas", "pyarrow", "scikit-learn"),
+        },
+        should_store=bool,
+    )
+
+
+def _load_and_split_data(data_path: str) -> bool:
     print("=" * 50)
     print("Загружаем данные для формирования выборок")
     print("=" * 50, end="\n\n")
+    if os.path.exists(data_path) and use_streaming(data_path):
+        return stream_and_split_data(data_path)
     if os.path.exists(data_path):
-        credit_card_df = pd.read_csv(data_path)
-        credit_card_df = basic_clean_data(credit_card_df, data_path)
-        print("=" * 50)
-        print("Создаем правила для обработки входных данных")
-        suite = create_expectation_suite()
-        print("Правила сформированы и записаны")
-        print("=" * 50, end="\n\n")
-
+        credit_card_df = prepare_columns(pd.read_csv(data_path), data_path)
+        fill_values = fit_fill_values(credit_card_df)
+        credit_card_df = fill_missing(credit_card_df, fill_values)
         print("=" * 50)
         print("Проверяем данные")
-        validator = ge.from_pandas(pandas_df=credit_card_df, expectation_suite=suite)
-
-        results = validator.validate()
-        for result in results.results:
-            if not result.success:
+        results = validate_frame(credit_card_df)
+        for result in results["results"]:
+            if not result["success"]:
                 print("=" * 25)
                 print("Ошибка проверки данных")
                 print(
                     f'Тип проверки: {result["expectation_config"]["expectation_type"]}'
                 )
                 print(f'Колонка: {result["expectation_config"]["kwargs"]["column"]}')
-                print(f"Нарушено: {result.result}")
+                print(f'Нарушено: {result["result"]}')
                 return False
-        print(f"Все проверки пройдены: {results.success}")
-        print(f"Успешно: {results.statistics['success_percent']:.1f}%")
+        print(f'Все проверки пройдены: {results["success"]}')
+        print(f'Успешно: {results["statistics"]["success_percent"]:.1f}%')
         print("=" * 50, end="\n\n")
 
         print("=" * 50)
@@ -78,11 +122,11 @@ def load_and_split_data(data_path: str) -> bool:
         Y_train = train["default.payment.next.month"]
         X_test = test.drop("default.payment.next.month", axis=1)
         Y_test = test["default.payment.next.month"]
-        os.makedirs("data/processed", exist_ok=True)
-        X_train.to_csv("data/processed/x_train.csv", index=False)
-        Y_train.to_csv("data/processed/y_train.csv", index=False)
-        X_test.to_csv("data/processed/x_test.csv", index=False)
-        Y_test.to_csv("data/processed/y_test.csv", index=False)
+        write_split(X_train, "x_train")
+        write_split(Y_train, "y_train")
+        write_split(X_test, "x_test")
+        write_split(Y_test, "y_test")
+        save_fill_values(fill_values)
         print("Тестовая и тренировочная выборки созданы")
         print("=" * 50, end="\n\n")
         return True
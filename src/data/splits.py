@@ -0,0 +1,118 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.ipc as ipc
+
+PROCESSED_DIR = "data/processed"
+TARGET_COLUMN = "default.payment.next.month"
+SPLIT_NAMES = ["x_train", "y_train", "x_test", "y_test"]
+
+# Явная схема обработанных выборок: категориальные и целочисленные признаки в
+# int8/int16, суммы в float32 (все суммы в датасете целые и меньше 2^24)
+SCHEMA = {
+    "LIMIT_BAL": "float32",
+    "SEX": "int8",
+    "EDUCATION": "int8",
+    "MARRIAGE": "int8",
+    "AGE": "int16",
+    "PAY_0": "int8",
+    "PAY_2": "int8",
+    "PAY_3": "int8",
+    "PAY_4": "int8",
+    "PAY_5": "int8",
+    "PAY_6": "int8",
+    "BILL_AMT1": "float32",
+    "BILL_AMT2": "float32",
+    "BILL_AMT3": "float32",
+    "BILL_AMT4": "float32",
+    "BILL_AMT5": "float32",
+    "BILL_AMT6": "float32",
+    "PAY_AMT1": "float32",
+    "PAY_AMT2": "float32",
+    "PAY_AMT3": "float32",
+    "PAY_AMT4": "float32",
+    "PAY_AMT5": "float32",
+    "PAY_AMT6": "float32",
+    TARGET_COLUMN: "int8",
+}
+
+
+def split_path(name: str, processed_dir: str = PROCESSED_DIR) -> str:
+    return os.path.join(processed_dir, f"{name}.feather")
+
+
+def apply_schema(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.astype({column: SCHEMA[column] for column in frame.columns})
+
+
+def write_split(frame, name: str, processed_dir: str = PROCESSED_DIR) -> str:
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame()
+    path = split_path(name, processed_dir)
+    os.makedirs(processed_dir, exist_ok=True)
+    table = pa.Table.from_pandas(apply_schema(frame), preserve_index=False)
+    # Без сжатия: файл Arrow IPC можно открыть через memory-map без копирования
+    feather.write_feather(table, path, compression="uncompressed")
+    return path
+
+
+# Запись выборки по частям: каждый кусок добавляется в файл Arrow IPC (формат
+# Feather V2) отдельным record batch, в памяти держится только текущий кусок.
+# Файл пишется под временным именем и появляется на месте только после commit()
+class SplitWriter:
+    def __init__(self, name: str, processed_dir: str = PROCESSED_DIR):
+        os.makedirs(processed_dir, exist_ok=True)
+        self.path = split_path(name, processed_dir)
+        self.tmp_path = f"{self.path}.tmp"
+        self.writer = None
+        self.n_rows = 0
+
+    def write(self, frame) -> None:
+        if isinstance(frame, pd.Series):
+            frame = frame.to_frame()
+        table = pa.Table.from_pandas(apply_schema(frame), preserve_index=False)
+        if self.writer is None:
+            self.writer = ipc.new_file(self.tmp_path, table.schema)
+        self.writer.write_table(table)
+        self.n_rows += len(frame)
+
+    def commit(self) -> str:
+        if self.writer is None:
+            raise ValueError(f"В выборку {self.path} не записано ни одной строки")
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def read_split(
+    name: str, processed_dir: str = PROCESSED_DIR, copy: bool = False
+) -> pd.DataFrame:
+    table = feather.read_table(split_path(name, processed_dir), memory_map=True)
+    for field in table.schema:
+        expected = SCHEMA.get(field.name)
+        if expected is None or field.type != pa.from_numpy_dtype(expected):
+            raise ValueError(
+                f"Колонка {field.name} в {name} имеет тип {field.type}, "
+                f"ожидался {expected}"
+            )
+    if copy:
+        return table.to_pandas()
+    # split_blocks оставляет колонки отдельными блоками прямо поверх memory-map,
+    # без копий. Такие массивы только для чтения, а sklearn при обучении требует
+    # записываемые, поэтому для обучения нужен copy=True или TrainingSession
+    return table.to_pandas(split_blocks=True)
+
+
+def load_splits(processed_dir: str = PROCESSED_DIR, copy: bool = False):
+    X_train = read_split("x_train", processed_dir, copy)
+    y_train = read_split("y_train", processed_dir, copy)[TARGET_COLUMN]
+    X_test = read_split("x_test", processed_dir, copy)
+    y_test = read_split("y_test", processed_dir, copy)[TARGET_COLUMN]
+    return X_train, y_train, X_test, y_test
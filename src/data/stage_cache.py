@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from importlib import metadata
+import joblib
+
+# Кэш результатов этапов (выборки, обученные модели, ONNX-артефакты) на
+# локальном диске. Ключ - хэш содержимого входных файлов, исходников этапа и
+# параметров, поэтому повторный запуск без изменений восстанавливает готовые
+# файлы вместо пересчёта. STAGE_CACHE=0 отключает кэш
+STAGE_CACHE_ENABLED = os.environ.get("STAGE_CACHE", "1") == "1"
+STAGE_CACHE_DIR = os.environ.get("STAGE_CACHE_DIR", ".cache/stages")
+# Предел размера кэша: при превышении удаляются давно не использованные записи
+STAGE_CACHE_MAX_MB = float(os.environ.get("STAGE_CACHE_MAX_MB", 2048))
+
+MANIFEST_FILE = "manifest.json"
+VALUE_FILE = "value.pkl"
+
+# Хэши файлов в пределах процесса: один и тот же CSV или .pkl не читается
+# заново, пока не изменились его размер и время модификации
+_file_digests = {}
+
+
+def file_digest(path: str) -> str:
+    stat = os.stat(path)
+    cache_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if cache_key not in _file_digests:
+        sha = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                sha.update(block)
+        _file_digests[cache_key] = sha.hexdigest()
+    return _file_digests[cache_key]
+
+
+def package_versions(*packages: str) -> dict:
+    versions = {"python": platform.python_version()}
+    for package in packages:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def _directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+# Запись кэша - каталог <stage>-<key> с копиями выходных файлов, значением
+# этапа (joblib) и manifest.json. Запись собирается во временном каталоге и
+# появляется атомарным переименованием, поэтому параллельные запуски никогда
+# не видят её наполовину записанной. Время последнего использования - mtime
+# манифеста
+class StageCache:
+    def __init__(
+        self,
+        cache_dir: str = STAGE_CACHE_DIR,
+        max_bytes: float = STAGE_CACHE_MAX_MB * 2**20,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def key(self, stage: str, inputs=(), sources=(), params=None) -> str:
+        # Файлы хэшируются по содержимому, а не по пути: перенос репозитория
+        # или повторная выгрузка тех же данных не сбрасывают кэш
+        parts = {
+            "stage": stage,
+            "inputs": [file_digest(path) for path in inputs],
+            "sources": [file_digest(path) for path in sources],
+            "params": joblib.hash(params),
+        }
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()[:32]
+
+    def _entry_dir(self, stage: str, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{stage}-{key}")
+
+    # destinations - {имя в записи: путь} или функция значения этапа, которая
+    # возвращает такой словарь: файлы восстанавливаются по этим путям вместо
+    # путей, с которыми были сохранены
+    def load(self, stage: str, key: str, destinations=None):
+        entry_dir = self._entry_dir(stage, key)
+        manifest_path = os.path.join(entry_dir, MANIFEST_FILE)
+        try:
+            with open(manifest_path) as file:
+                manifest = json.load(file)
+            value = joblib.load(os.path.join(entry_dir, VALUE_FILE))
+        except (OSError, ValueError, KeyError, EOFError) as error:
+            return self._discard(stage, key, error)
+        if callable(destinations):
+            destinations = destinations(value)
+        try:
+            # Файлы восстанавливаются копией (не жёсткой ссылкой): этап может
+            # потом перезаписать файл на месте, и запись кэша не должна меняться
+            for name, path in manifest["files"].items():
+                target = (destinations or {}).get(name, path)
+                os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+                tmp_path = f"{target}.cache.tmp"
+                shutil.copyfile(os.path.join(entry_dir, name), tmp_path)
+                os.replace(tmp_path, target)
+        except (OSError, KeyError) as error:
+            return self._discard(stage, key, error)
+        os.utime(manifest_path)
+        return value
+
+    def _discard(self, stage: str, key: str, error: Exception) -> None:
+        entry_dir = self._entry_dir(stage, key)
+        if os.path.isdir(entry_dir):
+            print(f"Запись кэша {stage}-{key} повреждена и удалена: {error}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        return None
+
+    # files - {имя в записи: путь}: при загрузке файл возвращается по тому же
+    # пути или по пути из destinations
+    def store(self, stage: str, key: str, files: dict, value=None) -> bool:
+        entry_dir = self._entry_dir(stage, key)
+        if os.path.isdir(entry_dir):
+            return True
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{stage}-", dir=self.cache_dir)
+        try:
+            for name, path in files.items():
+                shutil.copyfile(path, os.path.join(tmp_dir, name))
+            joblib.dump(value, os.path.join(tmp_dir, VALUE_FILE))
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as file:
+                json.dump(
+                    {
+                        "stage": stage,
+                        "key": key,
+                        "files": files,
+                        "created_at": time.time(),
+                    },
+                    file,
+                    indent=2,
+                )
+            size = _directory_size(tmp_dir)
+            if size > self.max_bytes:
+                print(
+                    f"Результат этапа {stage} ({size / 2**20:.1f} MB) больше "
+                    f"кэша ({self.max_bytes / 2**20:.0f} MB) и не сохранён"
+                )
+                return False
+            try:
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # Ту же запись уже сохранил параллельный запуск
+                return os.path.isdir(entry_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict(keep=entry_dir)
+        return True
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            manifest_path = os.path.join(entry_dir, MANIFEST_FILE)
+            if name.startswith(".") or not os.path.exists(manifest_path):
+                continue
+            entries.append(
+                (
+                    os.path.getmtime(manifest_path),
+                    _directory_size(entry_dir),
+                    entry_dir,
+                )
+            )
+        return sorted(entries)
+
+    # LRU: записи удаляются от давно не использованных к недавним, пока кэш
+    # не уложится в предел
+    def evict(self, keep: str = None) -> int:
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        n_evicted = 0
+        for _, size, entry_dir in entries:
+            if total <= self.max_bytes:
+                break
+            if entry_dir == keep:
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            n_evicted += 1
+        return n_evicted
+
+
+# Этап через кэш: при совпадении ключа восстанавливаются файлы и значение,
+# иначе этап выполняется, и его результат сохраняется, если should_store
+# (например, не сохраняется неудачная загрузка данных). outputs(value) -
+# {имя: путь} выходных файлов этапа
+def cached_stage(
+    stage: str,
+    compute,
+    outputs,
+    inputs=(),
+    sources=(),
+    params=None,
+    should_store=lambda value: True,
+    destinations=None,
+    cache: StageCache = None,
+):
+    if not STAGE_CACHE_ENABLED and cache is None:
+        return compute()
+    cache = cache or StageCache()
+    missing = [path for path in inputs if not os.path.exists(path)]
+    if missing:
+        return compute()
+    key = cache.key(stage, inputs, sources, params)
+    value = cache.load(stage, key, destinations)
+    if value is not None:
+        print(f"Этап {stage}: входы не изменились, результат взят из кэша ({key})")
+        return value
+    value = compute()
+    if should_store(value):
+        cache.store(stage, key, outputs(value), value)
+    return value
@@ -0,0 +1,173 @@
+import os
+from collections import Counter
+import numpy as np
+import pandas as pd
+from .cleaning import fill_missing, fill_values_path, save_fill_values
+from .splits import PROCESSED_DIR, TARGET_COLUMN, SplitWriter
+from .validation import FLOAT_COLUMNS, INT_COLUMNS, CompiledSuite, load_suite
+
+ID_COLUMN = "ID"
+INGESTION_CHUNK_ROWS = int(os.environ.get("INGESTION_CHUNK_ROWS", 500_000))
+# Размер выборки на колонку, по которой оценивается медиана. Ошибка оценки
+# квантиля порядка 1/sqrt(SKETCH_SIZE) по рангу
+SKETCH_SIZE = int(os.environ.get("INGESTION_SKETCH_SIZE", 100_000))
+SPLIT_SEED = 42
+
+# Явные типы при чтении. Целочисленные признаки читаются как float64 (парсер
+# nullable Int64 в pandas в несколько раз медленнее) и приводятся к Int64 после
+# заполнения пропусков, чтобы проверка типов видела целые колонки
+RAW_DTYPES = {
+    ID_COLUMN: "int64",
+    **{column: "float64" for column in INT_COLUMNS + FLOAT_COLUMNS},
+}
+
+
+# Равномерная выборка фиксированного размера без возвращения: каждому значению
+# присваивается случайный ключ и хранятся значения с k наименьшими ключами.
+# Память не зависит от числа строк, обновление - векторная операция на кусок
+class QuantileSketch:
+    def __init__(self, size: int = SKETCH_SIZE, random_state: int = SPLIT_SEED):
+        self.size = size
+        self.random = np.random.RandomState(random_state)
+        self.values = np.empty(0)
+        self.keys = np.empty(0)
+
+    def update(self, values: np.ndarray) -> None:
+        values = values[~np.isnan(values)]
+        keys = np.concatenate([self.keys, self.random.random_sample(len(values))])
+        values = np.concatenate([self.values, values])
+        if len(values) > self.size:
+            keep = np.argpartition(keys, self.size)[: self.size]
+            keys, values = keys[keep], values[keep]
+        self.keys, self.values = keys, values
+
+    def quantile(self, q: float) -> float:
+        if len(self.values) == 0:
+            return np.nan
+        return float(np.quantile(self.values, q))
+
+
+# Потоковый аналог статистик basic_clean_data: медиана для числовых колонок и
+# мода для остальных
+class FillStatistics:
+    def __init__(self, sketch_size: int = SKETCH_SIZE):
+        self.sketch_size = sketch_size
+        self.sketches = {}
+        self.counts = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        for column in chunk.columns:
+            if column in (ID_COLUMN, TARGET_COLUMN):
+                continue
+            series = chunk[column]
+            if pd.api.types.is_numeric_dtype(series.dtype):
+                sketch = self.sketches.setdefault(
+                    column, QuantileSketch(self.sketch_size)
+                )
+                sketch.update(series.to_numpy(dtype=np.float64, na_value=np.nan))
+            else:
+                counts = self.counts.setdefault(column, Counter())
+                counts.update(series.value_counts(dropna=True).to_dict())
+
+    def fill_values(self) -> dict:
+        fill_values = {}
+        for column, sketch in self.sketches.items():
+            median = sketch.quantile(0.5)
+            # В целочисленную колонку медиана записывается округлённой
+            if column in INT_COLUMNS and not np.isnan(median):
+                median = float(round(median))
+            fill_values[column] = median
+        for column, counts in self.counts.items():
+            if counts:
+                fill_values[column] = counts.most_common(1)[0][0]
+        return fill_values
+
+
+def hash_test_mask(ids: pd.Series, test_size: float) -> np.ndarray:
+    # Строка попадает в тест по хешу ID, а не по позиции: разбиение не зависит
+    # от порядка строк и размера кусков и стабильно между запусками
+    hashes = pd.util.hash_pandas_object(ids, index=False).to_numpy()
+    return hashes % 10_000 < int(test_size * 10_000)
+
+
+def read_chunks(data_path: str, chunk_rows: int = INGESTION_CHUNK_ROWS):
+    header = pd.read_csv(data_path, nrows=0).columns
+    names = {column: column.strip() for column in header}
+    dtypes = {
+        column: RAW_DTYPES[name] for column, name in names.items() if name in RAW_DTYPES
+    }
+    for chunk in pd.read_csv(data_path, dtype=dtypes, chunksize=chunk_rows):
+        yield chunk.rename(columns=names)
+
+
+def stream_and_split_data(
+    data_path: str,
+    test_size: float = 0.2,
+    chunk_rows: int = INGESTION_CHUNK_ROWS,
+    processed_dir: str = PROCESSED_DIR,
+) -> bool:
+    header = [column.strip() for column in pd.read_csv(data_path, nrows=0).columns]
+    for column in (ID_COLUMN, TARGET_COLUMN):
+        if column not in header:
+            print(
+                f"В данных отсутствует колонка {column}, потоковая загрузка невозможна"
+            )
+            return False
+
+    # Первый проход: статистики для заполнения пропусков
+    print("Считаем статистики для заполнения пропусков")
+    statistics = FillStatistics()
+    n_rows = 0
+    for chunk in read_chunks(data_path, chunk_rows):
+        statistics.update(chunk)
+        n_rows += len(chunk)
+    fill_values = statistics.fill_values()
+    int_columns = {column: "Int64" for column in INT_COLUMNS if column in header}
+    print(f"Строк: {n_rows}, колонок с заполнением: {len(fill_values)}")
+
+    # Второй проход: очистка, проверка и запись каждого куска
+    print("Проверяем данные и записываем выборки по частям")
+    suite = CompiledSuite(load_suite())
+    writers = {
+        name: SplitWriter(name, processed_dir)
+        for name in ("x_train", "y_train", "x_test", "y_test")
+    }
+    try:
+        for chunk in read_chunks(data_path, chunk_rows):
+            is_test = hash_test_mask(chunk[ID_COLUMN], test_size)
+            chunk = fill_missing(chunk.drop(columns=ID_COLUMN), fill_values)
+            try:
+                chunk = chunk.astype(int_columns)
+            except TypeError as error:
+                raise ValueError(f"Дробные значения в целочисленной колонке: {error}")
+
+            results = suite.validate(chunk)
+            failed = [result for result in results["results"] if not result["success"]]
+            if failed:
+                print("=" * 25)
+                print("Ошибка проверки данных")
+                for result in failed:
+                    config = result["expectation_config"]
+                    print(f'Тип проверки: {config["expectation_type"]}')
+                    print(f'Колонка: {config["kwargs"]["column"]}')
+                    print(f'Нарушено: {result["result"]}')
+                raise ValueError("Данные не прошли проверку")
+
+            for name, rows in (("train", chunk[~is_test]), ("test", chunk[is_test])):
+                if len(rows):
+                    writers[f"x_{name}"].write(rows.drop(columns=TARGET_COLUMN))
+                    writers[f"y_{name}"].write(rows[TARGET_COLUMN])
+        for writer in writers.values():
+            writer.commit()
+        save_fill_values(fill_values, fill_values_path(processed_dir))
+    except ValueError as error:
+        for writer in writers.values():
+            writer.abort()
+        print(error)
+        return False
+
+    print(
+        f'Тренировочная выборка: {writers["x_train"].n_rows} строк, '
+        f'тестовая: {writers["x_test"].n_rows} строк'
+    )
+    return True
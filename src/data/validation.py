@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+SUITE_NAME = "credit_card_data_suite"
+SUITE_DIR = os.environ.get("EXPECTATIONS_DIR", "gx/expectations")
+PARTIAL_UNEXPECTED_COUNT = 20
+
+COLUMNS_TO_EXIST = [
+    "LIMIT_BAL",
+    "SEX",
+    "EDUCATION",
+    "MARRIAGE",
+    "AGE",
+    "PAY_0",
+    "PAY_2",
+    "PAY_3",
+    "PAY_4",
+    "PAY_5",
+    "PAY_6",
+    "BILL_AMT1",
+    "BILL_AMT2",
+    "BILL_AMT3",
+    "BILL_AMT4",
+    "BILL_AMT5",
+    "BILL_AMT6",
+    "PAY_AMT1",
+    "PAY_AMT2",
+    "PAY_AMT3",
+    "PAY_AMT4",
+    "PAY_AMT5",
+    "PAY_AMT6",
+    "default.payment.next.month",
+]
+NOT_NULL_COLUMNS = [
+    "LIMIT_BAL",
+    "SEX",
+    "EDUCATION",
+    "MARRIAGE",
+    "AGE",
+    "default.payment.next.month",
+]
+INT_COLUMNS = [
+    "SEX",
+    "EDUCATION",
+    "MARRIAGE",
+    "AGE",
+    "PAY_0",
+    "PAY_2",
+    "PAY_3",
+    "PAY_4",
+    "PAY_5",
+    "PAY_6",
+    "default.payment.next.month",
+]
+FLOAT_COLUMNS = [
+    "LIMIT_BAL",
+    "BILL_AMT1",
+    "BILL_AMT2",
+    "BILL_AMT3",
+    "BILL_AMT4",
+    "BILL_AMT5",
+    "BILL_AMT6",
+    "PAY_AMT1",
+    "PAY_AMT2",
+    "PAY_AMT3",
+    "PAY_AMT4",
+    "PAY_AMT5",
+    "PAY_AMT6",
+]
+
+
+# Правила проверки в формате конфигураций Great Expectations
+def build_expectations() -> list[dict]:
+    expectations = []
+
+    def expect(expectation_type: str, **kwargs):
+        expectations.append({"expectation_type": expectation_type, "kwargs": kwargs})
+
+    for column in COLUMNS_TO_EXIST:
+        expect("expect_column_to_exist", column=column)
+    for column in NOT_NULL_COLUMNS:
+        expect("expect_column_values_to_not_be_null", column=column)
+    for column in INT_COLUMNS:
+        expect(
+            "expect_column_values_to_be_in_type_list",
+            column=column,
+            type_list=["int64", "int32", "int16"],
+        )
+    for column in FLOAT_COLUMNS:
+        expect(
+            "expect_column_values_to_be_in_type_list",
+            column=column,
+            type_list=["float64", "float32"],
+        )
+
+    # Диапазоны
+    expect(
+        "expect_column_values_to_be_between", column="AGE", min_value=18, max_value=100
+    )
+    expect("expect_column_values_to_be_between", column="LIMIT_BAL", min_value=1)
+    # Таргет 0/1
+    expect(
+        "expect_column_values_to_be_in_set",
+        column="default.payment.next.month",
+        value_set=[0, 1],
+        result_format="SUMMARY",
+    )
+    return expectations
+
+
+def suite_hash(expectations: list[dict]) -> str:
+    payload = json.dumps(expectations, sort_keys=True).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+# Suite собирается один раз и хранится в gx/expectations в формате GE. Файл
+# переписывается, только если правила в коде изменились (другой хеш содержимого)
+def load_suite(suite_dir: str = SUITE_DIR) -> dict:
+    expectations = build_expectations()
+    content_hash = suite_hash(expectations)
+    path = os.path.join(suite_dir, f"{SUITE_NAME}.json")
+    if os.path.exists(path):
+        with open(path) as file:
+            suite = json.load(file)
+        if suite.get("meta", {}).get("content_hash") == content_hash:
+            return suite
+
+    suite = {
+        "expectation_suite_name": SUITE_NAME,
+        "expectations": [{**expectation, "meta": {}} for expectation in expectations],
+        "meta": {"content_hash": content_hash},
+    }
+    os.makedirs(suite_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(suite, file, indent=2)
+    os.replace(tmp_path, path)
+    print(f"Suite сохранён: {path}")
+    return suite
+
+
+def _map_result(n_rows: int, missing, unexpected, values) -> dict:
+    n_missing = int(missing.sum())
+    n_unexpected = int(unexpected.sum())
+    n_nonmissing = n_rows - n_missing
+    return {
+        "element_count": n_rows,
+        "missing_count": n_missing,
+        "missing_percent": 100 * n_missing / n_rows if n_rows else None,
+        "unexpected_count": n_unexpected,
+        "unexpected_percent": (
+            100 * n_unexpected / n_nonmissing if n_nonmissing else None
+        ),
+        "unexpected_percent_total": 100 * n_unexpected / n_rows if n_rows else None,
+        "unexpected_percent_nonmissing": (
+            100 * n_unexpected / n_nonmissing if n_nonmissing else None
+        ),
+        "partial_unexpected_list": values[unexpected][
+            :PARTIAL_UNEXPECTED_COUNT
+        ].tolist(),
+    }
+
+
+def _column_arrays(series: pd.Series):
+    # Один раз на колонку: значения во float64/object и маска пропусков
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return values, np.isnan(values)
+    values = series.to_numpy()
+    return values, pd.isna(values)
+
+
+def _check(expectation: dict, series, values, missing) -> tuple[bool, dict]:
+    expectation_type = expectation["expectation_type"]
+    kwargs = expectation["kwargs"]
+    n_rows = len(values)
+
+    if expectation_type == "expect_column_values_to_not_be_null":
+        n_missing = int(missing.sum())
+        percent = 100 * n_missing / n_rows if n_rows else None
+        return n_missing == 0, {
+            "element_count": n_rows,
+            "unexpected_count": n_missing,
+            "unexpected_percent": percent,
+            "unexpected_percent_total": percent,
+            "partial_unexpected_list": [],
+        }
+
+    if expectation_type == "expect_column_values_to_be_in_type_list":
+        # Как в GE для pandas: сравнивается тип элементов dtype колонки
+        types = {np.dtype(name).type for name in kwargs["type_list"]}
+        return getattr(series.dtype, "type", None) in types, {
+            "observed_value": series.dtype.name
+        }
+
+    # Пропуски в проверках значений не считаются нарушениями
+    if expectation_type == "expect_column_values_to_be_between":
+        unexpected = np.zeros(n_rows, dtype=bool)
+        if kwargs.get("min_value") is not None:
+            unexpected |= values < kwargs["min_value"]
+        if kwargs.get("max_value") is not None:
+            unexpected |= values > kwargs["max_value"]
+    elif expectation_type == "expect_column_values_to_be_in_set":
+        unexpected = ~np.isin(values, kwargs["value_set"]) & ~missing
+    else:
+        raise ValueError(f"Проверка {expectation_type} не поддерживается")
+    result = _map_result(n_rows, missing, unexpected, values)
+    return result["unexpected_count"] == 0, result
+
+
+# "Скомпилированный" suite: проверки сгруппированы по колонкам, и каждая колонка
+# переводится в массив один раз, после чего все её проверки - векторные операции NumPy
+class CompiledSuite:
+    def __init__(self, suite: dict):
+        self.name = suite["expectation_suite_name"]
+        self.columns = {}
+        for expectation in suite["expectations"]:
+            expectation = {
+                "expectation_type": expectation["expectation_type"],
+                "kwargs": expectation["kwargs"],
+            }
+            self.columns.setdefault(expectation["kwargs"]["column"], []).append(
+                expectation
+            )
+
+    def validate(self, frame: pd.DataFrame) -> dict:
+        results = []
+        for column, expectations in self.columns.items():
+            exists = column in frame.columns
+            arrays = _column_arrays(frame[column]) if exists else None
+            for expectation in expectations:
+                if expectation["expectation_type"] == "expect_column_to_exist":
+                    success, result = exists, {}
+                elif not exists:
+                    success, result = False, {"error": f"Колонка {column} отсутствует"}
+                else:
+                    success, result = _check(expectation, frame[column], *arrays)
+                results.append(
+                    {
+                        "success": bool(success),
+                        "expectation_config": expectation,
+                        "result": result,
+                    }
+                )
+
+        n_success = sum(result["success"] for result in results)
+        return {
+            "success": n_success == len(results),
+            "results": results,
+            "statistics": {
+                "evaluated_expectations": len(results),
+                "successful_expectations": n_success,
+                "unsuccessful_expectations": len(results) - n_success,
+                "success_percent": 100 * n_success / len(results) if results else None,
+            },
+        }
+
+
+@lru_cache(maxsize=None)
+def _compiled_suite(suite_dir: str) -> CompiledSuite:
+    return CompiledSuite(load_suite(suite_dir))
+
+
+def validate_frame(frame: pd.DataFrame, suite_dir: str = SUITE_DIR) -> dict:
+    return _compiled_suite(suite_dir).validate(frame)
@@ -0,0 +1,57 @@
+from operator import attrgetter
+import numpy as np
+import pandas as pd
+
+# Порядок признаков совпадает с входом ONNX-модели и схемой ClientData
+FEATURE_NAMES = [
+    "LIMIT_BAL",
+    "SEX",
+    "EDUCATION",
+    "MARRIAGE",
+    "AGE",
+    "PAY_0",
+    "PAY_2",
+    "PAY_3",
+    "PAY_4",
+    "PAY_5",
+    "PAY_6",
+    "BILL_AMT1",
+    "BILL_AMT2",
+    "BILL_AMT3",
+    "BILL_AMT4",
+    "BILL_AMT5",
+    "BILL_AMT6",
+    "PAY_AMT1",
+    "PAY_AMT2",
+    "PAY_AMT3",
+    "PAY_AMT4",
+    "PAY_AMT5",
+    "PAY_AMT6",
+]
+
+_get_features = attrgetter(*FEATURE_NAMES)
+
+
+def records_to_matrix(records: list) -> np.ndarray:
+    # Один проход по записям без промежуточных dict и DataFrame
+    return np.array([_get_features(record) for record in records], dtype=np.float32)
+
+
+def columns_to_matrix(columns: dict) -> np.ndarray:
+    missing = [name for name in FEATURE_NAMES if name not in columns]
+    if missing:
+        raise ValueError(f"В данных отсутствуют признаки: {missing}")
+    lengths = {len(columns[name]) for name in FEATURE_NAMES}
+    if len(lengths) != 1:
+        raise ValueError("Колонки признаков имеют разную длину")
+
+    matrix = np.empty((lengths.pop(), len(FEATURE_NAMES)), dtype=np.float32)
+    for i, name in enumerate(FEATURE_NAMES):
+        matrix[:, i] = columns[name]
+    return matrix
+
+
+def matrix_to_frame(matrix: np.ndarray) -> pd.DataFrame:
+    # ColumnTransformer выбирает колонки по имени, поэтому оборачиваем матрицу
+    # в DataFrame без копирования данных
+    return pd.DataFrame(matrix, columns=FEATURE_NAMES, copy=False)
@@ -0,0 +1,136 @@
+import threading
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from .build_features import FEATURE_NAMES, matrix_to_frame
+
+
+# "Скомпилированный" ColumnTransformer из get_best_pipeline: те же медианы,
+# средние, масштабы и таблицы one-hot, но без DataFrame и обхода sklearn-объектов.
+# На вход - матрица в порядке FEATURE_NAMES, на выходе - плотная матрица признаков,
+# побитово совпадающая с preprocessor.transform(...).toarray()
+class CompiledPreprocessor:
+    def __init__(self, blocks: list, n_features_out: int):
+        self.blocks = blocks
+        self.n_features_out = n_features_out
+        self.buffers = threading.local()
+
+    def _buffer(self, n_rows: int) -> np.ndarray:
+        buffer = getattr(self.buffers, "features", None)
+        if buffer is None or buffer.shape[0] < n_rows:
+            capacity = max(n_rows, 64 if buffer is None else 2 * buffer.shape[0])
+            buffer = np.empty((capacity, self.n_features_out))
+            self.buffers.features = buffer
+        return buffer[:n_rows]
+
+    def transform(self, matrix: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        if out is None:
+            out = self._buffer(matrix.shape[0])
+        offset = 0
+        for block in self.blocks:
+            if block["kind"] == "numeric":
+                values = matrix[:, block["columns"]]
+                for op, *params in block["ops"]:
+                    if op == "impute":
+                        missing = np.isnan(values)
+                        if missing.any():
+                            values[missing] = np.take(params[0], np.where(missing)[1])
+                    elif op == "scale":
+                        values -= params[0]
+                        values /= params[1]
+                width = values.shape[1]
+                out[:, offset : offset + width] = values
+            else:
+                width = block["width"]
+                out[:, offset : offset + width] = 0.0
+                rows = np.arange(matrix.shape[0])
+                for column, fill_value, categories, start in block["columns"]:
+                    values = matrix[:, column]
+                    values = np.where(np.isnan(values), fill_value, values)
+                    codes = np.searchsorted(categories, values)
+                    codes = np.minimum(codes, len(categories) - 1)
+                    # Неизвестные категории дают нулевой вектор (handle_unknown="ignore")
+                    known = categories[codes] == values
+                    out[rows[known], offset + start + codes[known]] = 1.0
+            offset += width
+        return out
+
+
+def _steps(transformer) -> list:
+    if isinstance(transformer, Pipeline):
+        return [step for _, step in transformer.steps]
+    return [transformer]
+
+
+def _compile_numeric(steps: list, columns: list) -> dict:
+    ops = []
+    for step in steps:
+        if isinstance(step, SimpleImputer) and np.isnan(step.missing_values):
+            if step.add_indicator or np.isnan(step.statistics_).any():
+                raise ValueError("SimpleImputer с индикатором или пустыми колонками")
+            ops.append(("impute", step.statistics_))
+        elif isinstance(step, StandardScaler):
+            mean = step.mean_ if step.with_mean else np.zeros(len(columns))
+            scale = step.scale_ if step.with_std else np.ones(len(columns))
+            ops.append(("scale", mean, scale))
+        else:
+            raise ValueError(f"Шаг {type(step).__name__} не поддерживается")
+    return {"kind": "numeric", "columns": columns, "ops": ops}
+
+
+def _compile_onehot(steps: list, columns: list) -> dict:
+    *imputers, encoder = steps
+    if not isinstance(encoder, OneHotEncoder) or encoder.drop_idx_ is not None:
+        raise ValueError(
+            "Категориальный блок должен заканчиваться OneHotEncoder без drop"
+        )
+    if encoder._infrequent_enabled or encoder.handle_unknown != "ignore":
+        raise ValueError("Поддерживается только OneHotEncoder(handle_unknown='ignore')")
+
+    fill_values = np.full(len(columns), np.nan)
+    for imputer in imputers:
+        if not isinstance(imputer, SimpleImputer) or imputer.strategy != "constant":
+            raise ValueError(
+                "Перед OneHotEncoder допустим только SimpleImputer(constant)"
+            )
+        fill_values = np.asarray(imputer.statistics_, dtype=float)
+
+    compiled_columns = []
+    start = 0
+    for column, fill_value, categories in zip(
+        columns, fill_values, encoder.categories_
+    ):
+        categories = np.asarray(categories, dtype=float)
+        compiled_columns.append((column, fill_value, categories, start))
+        start += len(categories)
+    return {"kind": "onehot", "columns": compiled_columns, "width": start}
+
+
+def compile_preprocessor(preprocessor: ColumnTransformer) -> CompiledPreprocessor:
+    blocks = []
+    for _, transformer, columns in preprocessor.transformers_:
+        if transformer == "drop":
+            continue
+        if transformer == "passthrough":
+            raise ValueError("passthrough-колонки не поддерживаются")
+        indices = [FEATURE_NAMES.index(column) for column in columns]
+        steps = _steps(transformer)
+        if isinstance(steps[-1], OneHotEncoder):
+            blocks.append(_compile_onehot(steps, indices))
+        else:
+            blocks.append(_compile_numeric(steps, indices))
+
+    n_features_out = sum(
+        len(block["columns"]) if block["kind"] == "numeric" else block["width"]
+        for block in blocks
+    )
+    return CompiledPreprocessor(blocks, n_features_out)
+
+
+def check_compiled(compiled, preprocessor, matrix: np.ndarray) -> bool:
+    expected = preprocessor.transform(matrix_to_frame(matrix))
+    if hasattr(expected, "toarray"):
+        expected = expected.toarray()
+    return np.array_equal(compiled.transform(matrix), expected)
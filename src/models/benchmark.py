@@ -0,0 +1,326 @@
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from queue import Empty
+import joblib
+import numpy as np
+from sklearn.metrics import f1_score, roc_auc_score
+from src.api.backends import (
+    ONNX_INTER_OP_THREADS,
+    ONNX_INTRA_OP_THREADS,
+    OnnxBackend,
+    SklearnBackend,
+    compile_pipeline_features,
+)
+from src.data.splits import load_splits
+from src.features.build_features import FEATURE_NAMES
+from src.models.registry import REGISTRY_PATH, read_registry
+
+BENCHMARK_PATH = os.environ.get("BENCHMARK_PATH", "benchmark.json")
+# Предыдущий результат для проверки регрессии: если задан, запуск завершается с
+# кодом 1, когда задержка хоть одного варианта выросла больше допустимого
+BENCHMARK_BASELINE_PATH = os.environ.get("BENCHMARK_BASELINE_PATH")
+BENCHMARK_MAX_REGRESSION = float(os.environ.get("BENCHMARK_MAX_REGRESSION", 0.2))
+BENCHMARK_BATCH_SIZES = [
+    int(size) for size in os.environ.get("BENCHMARK_BATCH_SIZES", "1,32,256").split(",")
+]
+# Время замера на один размер пачки и верхняя граница числа вызовов
+BENCHMARK_SECONDS = float(os.environ.get("BENCHMARK_SECONDS", 2))
+BENCHMARK_MAX_CALLS = int(os.environ.get("BENCHMARK_MAX_CALLS", 2000))
+BENCHMARK_WARMUP_CALLS = 5
+# Регрессия считается по этим перцентилям задержки
+GATED_PERCENTILES = ("p50_ms", "p99_ms")
+# Дочерний процесс замера может умереть, не вернув результат (OOM killer,
+# падение нативной библиотеки), или зависнуть: очередь опрашивается с таймаутом,
+# и такой вариант записывается с ошибкой, а не останавливает весь прогон
+BENCHMARK_CASE_TIMEOUT = float(os.environ.get("BENCHMARK_CASE_TIMEOUT", 600))
+QUEUE_POLL_SECONDS = 1.0
+# Размер пачки для пропускной способности в профиле кандидата на чемпиона
+PROFILE_BATCH_SIZE = int(os.environ.get("PROFILE_BATCH_SIZE", 256))
+
+
+def latency_stats(latencies: list, batch_size: int) -> dict:
+    latencies = np.asarray(latencies)
+    return {
+        "calls": len(latencies),
+        "p50_ms": float(np.percentile(latencies, 50) * 1e3),
+        "p95_ms": float(np.percentile(latencies, 95) * 1e3),
+        "p99_ms": float(np.percentile(latencies, 99) * 1e3),
+        "throughput_rows_per_s": float(batch_size * len(latencies) / latencies.sum()),
+    }
+
+
+def measure_latency(
+    predict,
+    matrix: np.ndarray,
+    batch_size: int,
+    seconds: float = BENCHMARK_SECONDS,
+    max_calls: int = BENCHMARK_MAX_CALLS,
+) -> dict:
+    # Пачки берутся подряд по кругу из тестовой выборки, чтобы не мерить
+    # один и тот же закэшированный путь по деревьям
+    n_batches = max(1, len(matrix) // batch_size)
+    batches = [matrix[i * batch_size : (i + 1) * batch_size] for i in range(n_batches)]
+    for batch in batches[:BENCHMARK_WARMUP_CALLS]:
+        predict(batch)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while len(latencies) < max_calls and time.perf_counter() < deadline:
+        batch = batches[len(latencies) % n_batches]
+        started = time.perf_counter()
+        predict(batch)
+        latencies.append(time.perf_counter() - started)
+    return latency_stats(latencies, len(batches[0]))
+
+
+def peak_rss_mb() -> float:
+    # VmHWM - пик RSS текущего образа процесса. ru_maxrss переживает exec, и
+    # в процессе, запущенном из большого родителя, показывает пик родителя
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Тот же путь, что в сервисе: скомпилированный препроцессор для пайплайнов
+# sklearn и сессия ONNX Runtime с настройками из src/api/backends.py. Время
+# загрузки - чтение артефакта (или создание сессии ONNX) без подготовки признаков
+def load_backend(variant: str, path: str, matrix: np.ndarray):
+    started = time.perf_counter()
+    if variant in ("sklearn", "forest"):
+        pipeline = joblib.load(path, mmap_mode="r")
+        load_seconds = time.perf_counter() - started
+        compiled = compile_pipeline_features(pipeline, matrix)
+        return SklearnBackend(pipeline, compiled), load_seconds
+    backend = OnnxBackend(variant, path, ONNX_INTRA_OP_THREADS, ONNX_INTER_OP_THREADS)
+    return backend, time.perf_counter() - started
+
+
+# Один вариант модели: загрузка, качество на тестовой выборке и задержка по
+# размерам пачек. Выполняется в отдельном процессе, чтобы время загрузки и пик
+# памяти не зависели от предыдущих вариантов
+def run_case(case: dict, matrix: np.ndarray, y: np.ndarray, batch_sizes: list) -> dict:
+    rss_before = peak_rss_mb()
+    backend, load_seconds = load_backend(case["variant"], case["path"], matrix)
+
+    proba = np.asarray(backend.predict_proba(matrix), dtype=np.float64)
+    result = {
+        **case,
+        "artifact_bytes": os.path.getsize(case["path"]),
+        "load_seconds": load_seconds,
+        "roc_auc": float(roc_auc_score(y, proba)),
+        "f1": float(f1_score(y, proba >= 0.5)),
+        "latency": {
+            str(batch_size): measure_latency(backend.predict_proba, matrix, batch_size)
+            for batch_size in batch_sizes
+        },
+    }
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["peak_rss_delta_mb"] = result["peak_rss_mb"] - rss_before
+    return result
+
+
+# Профиль кандидата на чемпиона для train_pipeline: задержка одной строки,
+# пропускная способность пачкой, размер файла и память под модель (пик
+# выделений Python и NumPy при полной загрузке без memory-map)
+def profile_artifact(
+    path: str,
+    variant: str,
+    matrix: np.ndarray,
+    seconds: float = BENCHMARK_SECONDS,
+) -> dict:
+    tracemalloc.start()
+    try:
+        joblib.load(path)
+        _, memory_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    backend, load_seconds = load_backend(variant, path, matrix)
+    single = measure_latency(backend.predict_proba, matrix, 1, seconds)
+    batch = measure_latency(backend.predict_proba, matrix, PROFILE_BATCH_SIZE, seconds)
+    return {
+        "variant": variant,
+        "p50_ms": single["p50_ms"],
+        "p95_ms": single["p95_ms"],
+        "throughput_rows_per_s": batch["throughput_rows_per_s"],
+        "size_bytes": os.path.getsize(path),
+        "memory_mb": memory_bytes / 2**20,
+        "load_seconds": load_seconds,
+    }
+
+
+def _run_case_in_child(queue, case, matrix, y, batch_sizes):
+    try:
+        queue.put(run_case(case, matrix, y, batch_sizes))
+    except Exception as error:
+        queue.put({**case, "error": f"{type(error).__name__}: {error}"})
+
+
+def run_isolated(
+    case: dict,
+    matrix: np.ndarray,
+    y: np.ndarray,
+    batch_sizes: list,
+    timeout: float = BENCHMARK_CASE_TIMEOUT,
+    target=_run_case_in_child,
+):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=target, args=(queue, case, matrix, y, batch_sizes))
+    process.start()
+    deadline = time.monotonic() + timeout
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=QUEUE_POLL_SECONDS)
+        except Empty:
+            if not process.is_alive():
+                # Результат мог попасть в очередь перед самым выходом процесса
+                try:
+                    result = queue.get(timeout=QUEUE_POLL_SECONDS)
+                except Empty:
+                    result = {
+                        **case,
+                        "error": f"Процесс замера завершился с кодом {process.exitcode}",
+                    }
+            elif time.monotonic() > deadline:
+                process.terminate()
+                result = {**case, "error": f"Замер не завершился за {timeout:g} с"}
+    process.join()
+    return result
+
+
+# Все артефакты из реестра: для каждого семейства последняя версия - полный
+# sklearn-дамп, компактный ансамбль и ONNX-экспорты, если они сохранены
+def discover_cases(registry_path: str = REGISTRY_PATH) -> list[dict]:
+    registry = read_registry(registry_path)
+    latest = {}
+    for entry in registry["models"]:
+        if entry["version"] >= latest.get(entry["name"], {}).get("version", 0):
+            latest[entry["name"]] = entry
+
+    cases = []
+    for entry in latest.values():
+        cases.append(
+            {"model": entry["id"], "variant": "sklearn", "path": entry["path"]}
+        )
+        if "compact" in entry:
+            cases.append(
+                {
+                    "model": entry["id"],
+                    "variant": "forest",
+                    "path": entry["compact"]["path"],
+                }
+            )
+        for variant, artifact in entry.get("onnx", {}).items():
+            cases.append(
+                {"model": entry["id"], "variant": variant, "path": artifact["path"]}
+            )
+    return [case for case in cases if os.path.exists(case["path"])]
+
+
+def case_key(result: dict) -> str:
+    return f'{result["model"]}/{result["variant"]}'
+
+
+def compare(
+    baseline: dict, current: dict, max_regression: float = BENCHMARK_MAX_REGRESSION
+) -> list[str]:
+    previous = {case_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get(case_key(result))
+        if before is None or "error" in result or "error" in before:
+            continue
+        for batch_size, stats in result["latency"].items():
+            old_stats = before["latency"].get(batch_size)
+            if old_stats is None:
+                continue
+            for percentile in GATED_PERCENTILES:
+                old, new = old_stats[percentile], stats[percentile]
+                if new > old * (1 + max_regression):
+                    regressions.append(
+                        f"{case_key(result)} batch={batch_size} {percentile}: "
+                        f"{old:.3f} -> {new:.3f} ms (+{(new / old - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def save_results(results: dict, path: str = BENCHMARK_PATH) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(results, file, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run(
+    path: str = BENCHMARK_PATH,
+    batch_sizes: list = BENCHMARK_BATCH_SIZES,
+    registry_path: str = REGISTRY_PATH,
+) -> dict:
+    _, _, X_test, y_test = load_splits(copy=True)
+    matrix = np.ascontiguousarray(X_test[FEATURE_NAMES], dtype=np.float32)
+    y = y_test.to_numpy()
+
+    results = []
+    for case in discover_cases(registry_path):
+        print(f'Замер {case_key(case)}: {case["path"]}')
+        result = run_isolated(case, matrix, y, batch_sizes)
+        if "error" in result:
+            print(f'Ошибка: {result["error"]}')
+        results.append(result)
+
+    benchmark = {
+        "created_at": str(datetime.now()),
+        "rows": len(matrix),
+        "platform": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    save_results(benchmark, path)
+    return benchmark
+
+
+if __name__ == "__main__":
+    # Базовый результат читается до запуска: BENCHMARK_BASELINE_PATH может
+    # совпадать с BENCHMARK_PATH
+    baseline = None
+    if BENCHMARK_BASELINE_PATH and os.path.exists(BENCHMARK_BASELINE_PATH):
+        with open(BENCHMARK_BASELINE_PATH) as file:
+            baseline = json.load(file)
+
+    benchmark = run()
+    for result in benchmark["results"]:
+        if "error" in result:
+            continue
+        single = result["latency"].get("1")
+        print(
+            f"{case_key(result)}: {result['artifact_bytes'] / 2**20:.1f} MB, "
+            f"загрузка {result['load_seconds']:.2f} с, "
+            f"ROC-AUC {result['roc_auc']:.4f}"
+            + (f", p50 {single['p50_ms']:.3f} мс" if single else "")
+        )
+
+    if baseline is not None:
+        regressions = compare(baseline, benchmark)
+        if regressions:
+            print("Задержка выросла больше допустимого:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("Регрессий задержки нет")
@@ -0,0 +1,249 @@
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as csv
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from src.api.backends import SklearnBackend, compile_pipeline_features, reference_matrix
+from src.features.build_features import FEATURE_NAMES
+from src.models.registry import REGISTRY_PATH, load_champion
+
+BULK_CHUNK_ROWS = int(os.environ.get("BULK_CHUNK_ROWS", 100_000))
+BULK_WORKERS = int(os.environ.get("BULK_WORKERS", os.cpu_count() or 1))
+# Сколько кусков на воркер может быть в работе одновременно: память задания
+# ограничена (воркеры * BULK_IN_FLIGHT * BULK_CHUNK_ROWS) строками
+BULK_IN_FLIGHT = int(os.environ.get("BULK_IN_FLIGHT", 2))
+BULK_REPORT_SECONDS = float(os.environ.get("BULK_REPORT_SECONDS", 10))
+# Колонка, которая переносится из входа в выход для сопоставления строк
+BULK_ID_COLUMN = os.environ.get("BULK_ID_COLUMN", "ID")
+# Для больших пачек полный sklearn-ансамбль быстрее компактного
+BULK_COMPACT_MODEL = os.environ.get("BULK_COMPACT_MODEL", "0") == "1"
+
+ROW_COLUMN = "row"
+PROBABILITY_COLUMN = "probability"
+
+# Модель воркера: при fork наследуется от родителя уже загруженной, при spawn
+# загружается в инициализаторе
+_backend = None
+
+
+def load_backend(registry_path: str = REGISTRY_PATH, compact: bool = False):
+    pipeline, entry = load_champion(registry_path, compact=compact)
+    reference = reference_matrix(entry)
+    compiled = None
+    if reference is not None:
+        compiled = compile_pipeline_features(pipeline, reference)
+    return SklearnBackend(pipeline, compiled), entry
+
+
+def _init_worker(registry_path: str, compact: bool) -> None:
+    global _backend
+    if _backend is None:
+        _backend, _ = load_backend(registry_path, compact)
+
+
+def _score(matrix: np.ndarray) -> np.ndarray:
+    return _backend.predict_proba(matrix).astype(np.float32)
+
+
+# Схема входа: для CSV типы выводятся по первому блоку так же, как при чтении
+def input_schema(path: str) -> pa.Schema:
+    if path.endswith(".parquet"):
+        return pq.ParquetFile(path).schema_arrow
+    with csv.open_csv(path) as reader:
+        return reader.schema
+
+
+# Поток record batch по BULK_CHUNK_ROWS строк из CSV или Parquet: читаются
+# только нужные колонки, признаки сразу приводятся к float32
+def read_batches(path: str, columns: list, chunk_rows: int = BULK_CHUNK_ROWS):
+    if path.endswith(".parquet"):
+        yield from pq.ParquetFile(path).iter_batches(
+            batch_size=chunk_rows, columns=columns
+        )
+        return
+    options = csv.ConvertOptions(
+        include_columns=columns,
+        column_types={name: pa.float32() for name in FEATURE_NAMES},
+    )
+    pending, n_pending = [], 0
+    with csv.open_csv(path, convert_options=options) as reader:
+        for batch in reader:
+            pending.append(batch)
+            n_pending += batch.num_rows
+            # Блоки CSV-читателя разного размера, наружу отдаются куски ровно
+            # по chunk_rows строк (кроме последнего)
+            while n_pending >= chunk_rows:
+                table = pa.Table.from_batches(pending)
+                yield from table.slice(0, chunk_rows).to_batches(
+                    max_chunksize=chunk_rows
+                )
+                rest = table.slice(chunk_rows)
+                pending, n_pending = rest.to_batches(), rest.num_rows
+    if n_pending:
+        yield from pa.Table.from_batches(pending).to_batches()
+
+
+def batch_to_matrix(batch: pa.RecordBatch) -> np.ndarray:
+    matrix = np.empty((batch.num_rows, len(FEATURE_NAMES)), dtype=np.float32)
+    for i, name in enumerate(FEATURE_NAMES):
+        column = batch.column(batch.schema.get_field_index(name))
+        # Пропуски становятся NaN и заполняются препроцессором модели
+        matrix[:, i] = column.cast(pa.float32()).to_numpy(zero_copy_only=False)
+    return matrix
+
+
+# Выход пишется по мере готовности кусков в Parquet или Arrow IPC (по
+# расширению) под временным именем и появляется на месте после успешного конца
+class ScoreWriter:
+    def __init__(self, path: str, schema: pa.Schema):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.tmp_path = f"{path}.part"
+        self.schema = schema
+        if path.endswith(".parquet"):
+            self.writer = pq.ParquetWriter(self.tmp_path, schema, compression="zstd")
+        else:
+            options = ipc.IpcWriteOptions(compression="zstd")
+            self.writer = ipc.new_file(self.tmp_path, schema, options=options)
+
+    def write(self, table: pa.Table) -> None:
+        self.writer.write_table(table)
+
+    def commit(self) -> str:
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        self.writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    registry_path: str = REGISTRY_PATH,
+    workers: int = BULK_WORKERS,
+    chunk_rows: int = BULK_CHUNK_ROWS,
+    compact: bool = BULK_COMPACT_MODEL,
+) -> dict:
+    global _backend
+    schema = input_schema(input_path)
+    names = schema.names
+    missing = [name for name in FEATURE_NAMES if name not in names]
+    if missing:
+        raise ValueError(f"Во входном файле нет колонок {missing}")
+    id_column = BULK_ID_COLUMN if BULK_ID_COLUMN in names else None
+    columns = FEATURE_NAMES + ([id_column] if id_column else [])
+
+    # Модель загружается в родителе до создания пула: воркеры, созданные
+    # через fork, делят её страницы с родителем
+    _backend, entry = load_backend(registry_path, compact)
+    print(f"Модель {entry['id']}, бэкенд {_backend.name}, воркеров: {workers}")
+
+    fields = [pa.field(ROW_COLUMN, pa.int64())]
+    if id_column:
+        # Идентификатор переносится в выход с типом входа: это может быть
+        # число, строка или UUID
+        fields.append(pa.field(id_column, schema.field(id_column).type))
+    fields.append(pa.field(PROBABILITY_COLUMN, pa.float32()))
+    writer = ScoreWriter(output_path, pa.schema(fields))
+
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(method),
+        initializer=_init_worker,
+        initargs=(registry_path, compact),
+    )
+    # Очередь задач в порядке чтения: результаты пишутся в том же порядке, и
+    # в памяти не больше workers * BULK_IN_FLIGHT кусков
+    in_flight = deque()
+    n_rows = 0
+    started = last_report = time.perf_counter()
+
+    def write_next():
+        nonlocal n_rows, last_report
+        first_row, ids, future = in_flight.popleft()
+        proba = future.result()
+        arrays = [pa.array(np.arange(first_row, first_row + len(proba)))]
+        if id_column:
+            arrays.append(ids)
+        arrays.append(pa.array(proba))
+        writer.write(pa.Table.from_arrays(arrays, schema=writer.schema))
+        n_rows += len(proba)
+        now = time.perf_counter()
+        if now - last_report >= BULK_REPORT_SECONDS:
+            print(f"Обработано {n_rows} строк, {n_rows / (now - started):.0f} строк/с")
+            last_report = now
+
+    try:
+        first_row = 0
+        for batch in read_batches(input_path, columns, chunk_rows):
+            ids = (
+                batch.column(batch.schema.get_field_index(id_column))
+                if id_column
+                else None
+            )
+            matrix = batch_to_matrix(batch)
+            in_flight.append((first_row, ids, pool.submit(_score, matrix)))
+            first_row += batch.num_rows
+            if len(in_flight) >= workers * BULK_IN_FLIGHT:
+                write_next()
+        while in_flight:
+            write_next()
+        writer.commit()
+    except BaseException:
+        for _, _, future in in_flight:
+            future.cancel()
+        writer.abort()
+        raise
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    seconds = time.perf_counter() - started
+    stats = {
+        "model": entry["id"],
+        "rows": n_rows,
+        "seconds": seconds,
+        "rows_per_second": n_rows / seconds if seconds else 0.0,
+        "output": output_path,
+    }
+    print(
+        f"Готово: {n_rows} строк за {seconds:.1f} с "
+        f"({stats['rows_per_second']:.0f} строк/с), результат в {output_path}"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Пакетный скоринг файла заявителей моделью-чемпионом"
+    )
+    parser.add_argument("input", help="CSV или Parquet с колонками ClientData")
+    parser.add_argument("output", help="Результат: .parquet или .feather")
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS)
+    parser.add_argument("--chunk-rows", type=int, default=BULK_CHUNK_ROWS)
+    parser.add_argument("--registry", default=REGISTRY_PATH)
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        default=BULK_COMPACT_MODEL,
+        help="Компактный ансамбль вместо полного sklearn-дампа",
+    )
+    args = parser.parse_args()
+    score_file(
+        args.input,
+        args.output,
+        registry_path=args.registry,
+        workers=args.workers,
+        chunk_rows=args.chunk_rows,
+        compact=args.compact,
+    )
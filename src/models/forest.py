@@ -0,0 +1,273 @@
+import os
+import numpy as np
+import joblib
+from scipy import sparse
+from scipy.special import expit
+
+# Точность значений в листьях компактного ансамбля: float32 или float16.
+# float16 вдвое уменьшает таблицу листьев ценой расхождения порядка 1e-3
+FOREST_LEAF_DTYPE = os.environ.get("FOREST_LEAF_DTYPE", "float32")
+# Допустимое расхождение вероятностей с sklearn при экспорте
+FOREST_TOLERANCE = float(os.environ.get("FOREST_TOLERANCE", 0.01))
+# Сколько уровней обхода проходит между удалениями из работы пар
+# (строка, дерево), уже дошедших до листа
+FOREST_COMPACT_EVERY = 8
+# Сколько пар (строка, дерево) обходится за один векторный шаг
+FOREST_PAIRS_PER_STEP = 1 << 16
+LEAF_DTYPES = ("float32", "float16")
+
+
+# Ансамбль деревьев в виде плоских таблиц узлов всех деревьев подряд
+# (struct of arrays): номер признака int16, порог float32, правый потомок int32
+# и значение в листе. Узлы каждого дерева пронумерованы в прямом порядке обхода,
+# поэтому левый потомок узла i - всегда i + 1 и отдельно не хранится. Порог
+# листа - NaN (сравнение всегда ложно), а правый потомок листа - он сам, поэтому
+# обход всех деревьев для пачки строк - одинаковые векторные шаги без ветвлений
+# по типу узла. kind="mean" - среднее вероятностей (случайный лес), kind="sum" -
+# сумма значений деревьев с learning_rate и начальным приближением под сигмоидой
+# (градиентный бустинг)
+class CompiledForest:
+    def __init__(
+        self,
+        kind: str,
+        roots: np.ndarray,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        max_depth: int,
+        n_features: int,
+        missing_left: np.ndarray = None,
+        scale: float = 1.0,
+        init: float = 0.0,
+    ):
+        self.kind = kind
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.right = right
+        self.value = value
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features
+        self.missing_left = missing_left
+        self.scale = scale
+        self.init = init
+        self.classes_ = np.array([0, 1])
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.roots, self.feature, self.threshold, self.right, self.value)
+        if self.missing_left is not None:
+            arrays += (self.missing_left,)
+        return sum(array.nbytes for array in arrays)
+
+    def _leaf_sums(self, X: np.ndarray, roots: np.ndarray) -> np.ndarray:
+        n_rows, n_features = X.shape
+        n_trees = len(roots)
+        # Активные пары (строка, дерево) в плоском виде: текущий узел и смещение
+        # строки в X
+        nodes = np.tile(roots, n_rows)
+        rows = np.repeat(np.arange(n_rows, dtype=np.intp), n_trees)
+        offsets = rows * n_features
+        flat = X.ravel()
+        totals = np.zeros(n_rows)
+        for depth in range(1, self.max_depth + 1):
+            values = flat[offsets + self.feature[nodes]]
+            go_left = values <= self.threshold[nodes]
+            if self.missing_left is not None:
+                go_left |= np.isnan(values) & self.missing_left[nodes]
+            nodes = np.where(go_left, nodes + 1, self.right[nodes])
+            if depth % FOREST_COMPACT_EVERY == 0 and depth < self.max_depth:
+                # Пары, дошедшие до листа, сразу дают вклад в сумму и больше
+                # не обходятся: средняя глубина листа заметно меньше максимальной
+                done = self.right[nodes] == nodes
+                if done.any():
+                    totals += np.bincount(
+                        rows[done],
+                        weights=self.value[nodes[done]],
+                        minlength=n_rows,
+                    )
+                    active = ~done
+                    nodes, rows, offsets = nodes[active], rows[active], offsets[active]
+                if len(nodes) == 0:
+                    return totals
+        totals += np.bincount(rows, weights=self.value[nodes], minlength=n_rows)
+        return totals
+
+    def predict_proba(self, X) -> np.ndarray:
+        if sparse.issparse(X):
+            X = X.toarray()
+        # Деревья sklearn сравнивают признаки во float32, так же делаем и здесь
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        # Большая пачка обходится группами деревьев: узлы группы помещаются в
+        # кэш процессора, а одна строка проходит все деревья за один обход
+        group = max(1, FOREST_PAIRS_PER_STEP // max(len(X), 1))
+        sums = np.zeros(len(X))
+        for start in range(0, len(self.roots), group):
+            sums += self._leaf_sums(X, self.roots[start : start + group])
+        if self.kind == "mean":
+            positive = sums / len(self.roots)
+        else:
+            positive = expit(self.init + self.scale * sums)
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X) -> np.ndarray:
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(np.int64)
+
+
+def _float32_floor(threshold: np.ndarray) -> np.ndarray:
+    # Наибольшее float32, не превосходящее порог: для float32-признака x
+    # сравнение x <= t совпадает с x <= floor32(t), как в самом sklearn
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _preorder(tree) -> np.ndarray:
+    # Деревья sklearn, построенные в глубину, уже пронумерованы в прямом
+    # порядке; перенумерация нужна только для построенных с max_leaf_nodes
+    internal = tree.children_left != -1
+    if np.all(tree.children_left[internal] == np.flatnonzero(internal) + 1):
+        return np.arange(tree.node_count)
+    order, stack = [], [0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if tree.children_left[node] != -1:
+            stack += [tree.children_right[node], tree.children_left[node]]
+    return np.asarray(order)
+
+
+def _tree_tables(trees, leaf_values, offsets):
+    tables = []
+    for tree, values, offset in zip(trees, leaf_values, offsets):
+        order = _preorder(tree)
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+        is_leaf = tree.children_left[order] == -1
+        node_ids = np.arange(tree.node_count) + offset
+        right = np.where(
+            is_leaf, node_ids, position[tree.children_right[order]] + offset
+        )
+        feature = np.where(is_leaf, 0, tree.feature[order])
+        threshold = np.where(is_leaf, np.nan, tree.threshold[order])
+        missing = getattr(tree, "missing_go_to_left", None)
+        if missing is None:
+            missing = np.zeros(tree.node_count, dtype=bool)
+        missing = missing[order].astype(bool) & ~is_leaf
+        tables.append((feature, threshold, right, values[order], missing))
+    return [np.concatenate(column) for column in zip(*tables)]
+
+
+# Классы sklearn импортируются только при компиляции: сервису, который
+# загружает готовый компактный ансамбль, sklearn.ensemble не нужен
+def compile_forest(classifier, leaf_dtype: str = FOREST_LEAF_DTYPE) -> CompiledForest:
+    from sklearn.dummy import DummyClassifier
+    from sklearn.ensemble import (
+        ExtraTreesClassifier,
+        GradientBoostingClassifier,
+        RandomForestClassifier,
+    )
+
+    if leaf_dtype not in LEAF_DTYPES:
+        raise ValueError(f"Неизвестная точность листьев {leaf_dtype}: {LEAF_DTYPES}")
+    if list(getattr(classifier, "classes_", [])) != [0, 1]:
+        raise ValueError("Поддерживается только бинарная классификация с классами 0/1")
+
+    if isinstance(classifier, (RandomForestClassifier, ExtraTreesClassifier)):
+        trees = [estimator.tree_ for estimator in classifier.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError("Поддерживаются только деревья с одним выходом")
+        # Вероятность класса 1 в листе - доля (взвешенных) объектов класса
+        leaf_values = [
+            tree.value[:, 0, 1] / tree.value[:, 0, :].sum(axis=1) for tree in trees
+        ]
+        kind, scale, init = "mean", 1.0, 0.0
+    elif isinstance(classifier, GradientBoostingClassifier):
+        if classifier.estimators_.shape[1] != 1:
+            raise ValueError("Поддерживается только бинарный градиентный бустинг")
+        trees = [estimator.tree_ for estimator in classifier.estimators_[:, 0]]
+        leaf_values = [tree.value[:, 0, 0] for tree in trees]
+        kind, scale = "sum", float(classifier.learning_rate)
+        # Начальное приближение должно быть константой: априорная доля класса
+        # (DummyClassifier по умолчанию) или ноль
+        if classifier.init_ == "zero":
+            init = 0.0
+        elif isinstance(classifier.init_, DummyClassifier):
+            init = float(
+                classifier._raw_predict_init(
+                    np.zeros((1, classifier.n_features_in_), np.float32)
+                )[0, 0]
+            )
+        else:
+            raise ValueError("Начальная модель бустинга не константная")
+    else:
+        raise ValueError(
+            f"Компиляция не поддерживается для {type(classifier).__name__}"
+        )
+
+    if classifier.n_features_in_ > np.iinfo(np.int16).max:
+        raise ValueError("Номер признака не помещается в int16")
+    sizes = [tree.node_count for tree in trees]
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+    if sum(sizes) > np.iinfo(np.int32).max:
+        raise ValueError("Число узлов не помещается в int32")
+    feature, threshold, right, values, missing = _tree_tables(
+        trees, leaf_values, offsets
+    )
+    return CompiledForest(
+        kind=kind,
+        roots=offsets.astype(np.int32),
+        feature=feature.astype(np.int16),
+        threshold=_float32_floor(threshold),
+        right=right.astype(np.int32),
+        value=values.astype(leaf_dtype),
+        max_depth=max(tree.max_depth for tree in trees),
+        n_features=classifier.n_features_in_,
+        missing_left=missing if missing.any() else None,
+        scale=scale,
+        init=init,
+    )
+
+
+# Пайплайн с тем же препроцессором и скомпилированным ансамблем вместо
+# классификатора: predict_proba и всё, что его вызывает, работают без изменений
+def compact_pipeline(pipeline, leaf_dtype: str = FOREST_LEAF_DTYPE):
+    from sklearn.pipeline import Pipeline
+
+    *steps, (name, classifier) = pipeline.steps
+    return Pipeline(steps=[*steps, (name, compile_forest(classifier, leaf_dtype))])
+
+
+def check_compact(compact, pipeline, X, tolerance: float = FOREST_TOLERANCE) -> float:
+    diff = np.abs(compact.predict_proba(X)[:, 1] - pipeline.predict_proba(X)[:, 1])
+    max_diff = float(diff.max())
+    if max_diff > tolerance:
+        raise ValueError(
+            f"Компактный ансамбль расходится с sklearn на {max_diff:.5f} "
+            f"(допуск {tolerance})"
+        )
+    return max_diff
+
+
+# Экспорт рядом с полным дампом: несжатый joblib, чтобы таблицы узлов читались
+# через memory-map. Если модель не ансамбль деревьев или расходится с sklearn
+# на X, возвращается None
+def export_compact(pipeline, path: str, X, leaf_dtype: str = FOREST_LEAF_DTYPE):
+    try:
+        compact = compact_pipeline(pipeline, leaf_dtype)
+        max_diff = check_compact(compact, pipeline, X)
+    except ValueError as error:
+        print(f"Компактный ансамбль не сохранён: {error}")
+        return None
+    joblib.dump(compact, path)
+    print(
+        f"Компактный ансамбль сохранён в {path}: "
+        f"{compact.steps[-1][1].n_nodes} узлов, расхождение с sklearn {max_diff:.2e}"
+    )
+    return path
@@ -0,0 +1,321 @@
+import copy
+import glob
+import math
+import os
+import time
+import numpy as np
+import pandas as pd
+import joblib
+from joblib import Parallel, delayed
+from sklearn.model_selection import ParameterGrid, train_test_split
+from sklearn.pipeline import Pipeline
+from src.data.cleaning import FILL_VALUES_PATH, fill_missing, load_fill_values
+from src.data.make_dataset import prepare_columns
+from src.data.splits import TARGET_COLUMN, apply_schema, load_splits
+from src.data.validation import validate_frame
+from src.features.build_features import FEATURE_NAMES
+from src.monitoring.drift import load_json, save_json
+from .pipeline import MODELS, RANDOM_STATE, SCORING
+from .registry import REGISTRY_PATH, read_registry
+from .search import get_scorers
+from .train_pipeline import MODEL_NAMES, log_model, record_champion, train_pipelines
+
+# Новые размеченные данные: CSV, Parquet или Feather с колонками исходного
+# датасета. Каждый файл попадает в дообучение ровно один раз, список уже
+# обработанных файлов хранится в RETRAIN_STATE_PATH
+RETRAIN_NEW_DATA_DIR = os.environ.get("RETRAIN_NEW_DATA_DIR", "data/new")
+RETRAIN_STATE_PATH = os.environ.get("RETRAIN_STATE_PATH", "models/retrain_state.json")
+# Сколько строк старой обучающей выборки добавляется на каждую новую строку,
+# чтобы модель не забывала прежнее распределение
+RETRAIN_REPLAY_RATIO = float(os.environ.get("RETRAIN_REPLAY_RATIO", 1.0))
+RETRAIN_VALIDATION_SIZE = float(os.environ.get("RETRAIN_VALIDATION_SIZE", 0.2))
+RETRAIN_N_ITER = int(os.environ.get("RETRAIN_N_ITER", 8))
+RETRAIN_MIN_ROWS = int(os.environ.get("RETRAIN_MIN_ROWS", 200))
+# Ансамбль растёт пропорционально доле новых данных, но не меньше чем на
+# RETRAIN_MIN_NEW_ESTIMATORS деревьев
+RETRAIN_MIN_NEW_ESTIMATORS = int(os.environ.get("RETRAIN_MIN_NEW_ESTIMATORS", 10))
+DATA_EXTENSIONS = (".csv", ".parquet", ".feather")
+
+# Не перебираются при дообучении: число деревьев задаётся ростом ансамбля, а
+# learning_rate бустинга применяется при предсказании ко всем стадиям сразу
+FROZEN_PARAMS = {"classifier__n_estimators", "classifier__learning_rate"}
+
+
+def new_data_files(data_dir: str, processed_files) -> list[str]:
+    processed = set(processed_files)
+    return [
+        path
+        for path in sorted(glob.glob(os.path.join(data_dir, "*")))
+        if path.endswith(DATA_EXTENSIONS) and os.path.basename(path) not in processed
+    ]
+
+
+def _read_frame(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if path.endswith(".feather"):
+        return pd.read_feather(path)
+    return pd.read_csv(path)
+
+
+# Новые строки проходят ту же подготовку, что и исходный датасет в
+# src/data/make_dataset.py, но пропуски заполняются статистиками prepare, а не
+# пересчитанными по новым данным
+def read_new_data(paths: list[str], fill_values: dict) -> pd.DataFrame:
+    frames = []
+    for path in paths:
+        frame = fill_missing(prepare_columns(_read_frame(path), path), fill_values)
+        results = validate_frame(frame)
+        if not results["success"]:
+            failed = [
+                result["expectation_config"]["expectation_type"]
+                for result in results["results"]
+                if not result["success"]
+            ]
+            raise ValueError(f"Файл {path} не прошёл проверку данных: {failed}")
+        frames.append(apply_schema(frame[FEATURE_NAMES + [TARGET_COLUMN]]))
+    return pd.concat(frames, ignore_index=True)
+
+
+def latest_models(registry_path: str = REGISTRY_PATH) -> dict:
+    latest = {}
+    for entry in read_registry(registry_path)["models"]:
+        if entry["version"] >= latest.get(entry["name"], {}).get("version", 0):
+            latest[entry["name"]] = entry
+    return latest
+
+
+# Узкая окрестность прошлых лучших параметров: для числовых параметров -
+# текущее значение и соседние по сетке поиска, остальные (solver, penalty,
+# class_weight, max_features) остаются как есть
+def neighbourhood(pipeline, param_distributions: dict) -> dict:
+    current = pipeline.get_params()
+    space = {}
+    for key, values in param_distributions.items():
+        value = current[key]
+        numeric = all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in values
+        )
+        if key in FROZEN_PARAMS or not numeric or value not in values:
+            space[key] = [value]
+            continue
+        ordered = sorted(values)
+        position = ordered.index(value)
+        space[key] = ordered[max(0, position - 1) : position + 2]
+    return space
+
+
+def candidate_params(space: dict, n_iter: int = RETRAIN_N_ITER) -> list[dict]:
+    grid = list(ParameterGrid(space))
+    if len(grid) <= n_iter:
+        return grid
+    random = np.random.RandomState(RANDOM_STATE)
+    return [grid[i] for i in sorted(random.choice(len(grid), n_iter, replace=False))]
+
+
+# Копия обученного классификатора, которая при fit продолжит обучение: у
+# ансамблей деревьев (warm_start) добавятся новые деревья или стадии бустинга
+# поверх старых, логистическая регрессия начнёт оптимизацию с прошлых
+# коэффициентов (кроме solver="liblinear", который warm_start не поддерживает)
+def warm_start_classifier(classifier, params: dict, n_new_rows: int, n_seen_rows: int):
+    classifier = copy.deepcopy(classifier)
+    classifier.set_params(
+        **{key.split("__", 1)[1]: value for key, value in params.items()}
+    )
+    if hasattr(classifier, "estimators_"):
+        n_estimators = len(classifier.estimators_)
+        extra = max(
+            RETRAIN_MIN_NEW_ESTIMATORS,
+            math.ceil(n_estimators * n_new_rows / max(n_seen_rows, 1)),
+        )
+        classifier.set_params(warm_start=True, n_estimators=n_estimators + extra)
+    elif "warm_start" in classifier.get_params():
+        classifier.set_params(warm_start=True)
+    return classifier
+
+
+def _warm_fit_and_score(
+    classifier, params, growth, X_train, y_train, X_val, y_val, scorers
+):
+    started = time.perf_counter()
+    classifier = warm_start_classifier(classifier, params, *growth)
+    classifier.fit(X_train, y_train)
+    fit_time = time.perf_counter() - started
+    scores = {
+        name: scorer(classifier, X_val, y_val) for name, scorer in scorers.items()
+    }
+    return scores, fit_time
+
+
+def _warm_fit(classifier, params, growth, X, y):
+    return warm_start_classifier(classifier, params, *growth).fit(X, y)
+
+
+# Дообучение одного семейства: препроцессор прошлой модели не переобучается
+# (на его признаках построены старые деревья и коэффициенты), кандидаты из
+# окрестности прошлых параметров продолжают обучение прошлого классификатора
+# на части прироста и сравниваются на отложенной части, лучший затем
+# дообучается на всём приросте
+def retrain_family(
+    model_name: str,
+    entry: dict,
+    increment: tuple,
+    growth: tuple,
+    n_iter: int = RETRAIN_N_ITER,
+    n_jobs: int = -1,
+):
+    X_train, y_train, X_val, y_val = increment
+    pipeline = joblib.load(entry["path"])
+    *steps, (step_name, classifier) = pipeline.steps
+    preprocessor = Pipeline(steps)
+    features_train = preprocessor.transform(X_train)
+    features_val = preprocessor.transform(X_val)
+
+    candidates = candidate_params(
+        neighbourhood(pipeline, MODELS[model_name]["param_distributions"]), n_iter
+    )
+    scorers = get_scorers(SCORING)
+    parallel = Parallel(n_jobs=n_jobs, batch_size=1)
+    outputs = parallel(
+        delayed(_warm_fit_and_score)(
+            classifier,
+            params,
+            growth,
+            features_train,
+            y_train,
+            features_val,
+            y_val,
+            scorers,
+        )
+        for params in candidates
+    )
+    f1 = [np.nan_to_num(scores["f1"], nan=-np.inf) for scores, _ in outputs]
+    best = int(np.argmax(f1))
+    previous = {
+        name: scorer(classifier, features_val, y_val)
+        for name, scorer in scorers.items()
+    }
+    print(
+        f"{model_name}: {len(candidates)} кандидатов, F1 на отложенных строках "
+        f"{outputs[best][0]['f1']:.3f} (прошлая версия {entry['id']}: "
+        f"{previous['f1']:.3f})"
+    )
+
+    features = preprocessor.transform(pd.concat([X_train, X_val]))
+    target = pd.concat([y_train, y_val])
+    final = _warm_fit(classifier, candidates[best], growth, features, target)
+    # Сохранённая модель при обычном fit учится с нуля, как после полного поиска
+    final.set_params(warm_start=False)
+    best_params = dict(candidates[best])
+    if "n_estimators" in final.get_params():
+        best_params["classifier__n_estimators"] = final.n_estimators
+    # Оценки на отложенной части прироста (в ней есть строки повтора, которые
+    # прошлая версия уже видела) - только для сравнения кандидатов, чемпион
+    # выбирается по test_* из log_model
+    model_log = {
+        "best_params": best_params,
+        "metrics": {
+            **{
+                f"increment_{name}": float(value)
+                for name, value in outputs[best][0].items()
+            },
+            "previous_f1": float(previous["f1"]),
+            "mean_fit_time": float(np.mean([fit_time for _, fit_time in outputs])),
+        },
+    }
+    return Pipeline([*steps, (step_name, final)]), model_log
+
+
+# Прирост для дообучения: все новые строки и случайная выборка старой
+# обучающей выборки размером RETRAIN_REPLAY_RATIO от числа новых строк
+def build_increment(new_data: pd.DataFrame, replay_ratio: float = RETRAIN_REPLAY_RATIO):
+    X_old, y_old, _, _ = load_splits()
+    n_replay = min(len(X_old), int(len(new_data) * replay_ratio))
+    random = np.random.RandomState(RANDOM_STATE)
+    rows = np.sort(random.choice(len(X_old), n_replay, replace=False))
+    X = pd.concat(
+        [new_data[FEATURE_NAMES], X_old.iloc[rows][FEATURE_NAMES]], ignore_index=True
+    )
+    y = pd.concat(
+        [new_data[TARGET_COLUMN], y_old.iloc[rows]], ignore_index=True
+    ).rename(TARGET_COLUMN)
+    X_train, X_val, y_train, y_val = train_test_split(
+        X,
+        y,
+        test_size=RETRAIN_VALIDATION_SIZE,
+        stratify=y,
+        random_state=RANDOM_STATE,
+    )
+    return (X_train, y_train, X_val, y_val), len(X_old)
+
+
+def run(
+    data_dir: str = RETRAIN_NEW_DATA_DIR,
+    state_path: str = RETRAIN_STATE_PATH,
+    registry_path: str = REGISTRY_PATH,
+    model_names: list[str] = MODEL_NAMES,
+) -> dict:
+    started = time.perf_counter()
+    state = {"processed_files": [], "n_rows": None}
+    if os.path.exists(state_path):
+        state = load_json(state_path)
+    paths = new_data_files(data_dir, state["processed_files"])
+    if not paths:
+        print(f"Новых данных в {data_dir} нет, дообучение не требуется")
+        return {}
+    new_data = read_new_data(paths, load_fill_values(FILL_VALUES_PATH))
+    if len(new_data) < RETRAIN_MIN_ROWS:
+        print(
+            f"Новых строк {len(new_data)}, нужно не меньше {RETRAIN_MIN_ROWS}: "
+            "дообучение отложено"
+        )
+        return {}
+
+    increment, n_train_rows = build_increment(new_data)
+    # Сколько строк уже видели модели: исходная обучающая выборка и все
+    # прошлые приросты
+    n_seen_rows = state["n_rows"] or n_train_rows
+    growth = (len(new_data), n_seen_rows)
+    print(
+        f"Дообучение на {len(new_data)} новых строках из {len(paths)} файлов "
+        f"(+{len(increment[0]) + len(increment[2]) - len(new_data)} строк повтора), "
+        f"ранее обучено на {n_seen_rows}"
+    )
+
+    latest = latest_models(registry_path)
+    # Дообученные версии оцениваются на той же тестовой выборке, что и версии
+    # полного поиска, и только после этого участвуют в выборе чемпиона
+    _, _, X_test, y_test = load_splits(copy=True)
+    results, model_logs = {}, {}
+    for model_name in model_names:
+        if model_name not in latest:
+            continue
+        pipeline, model_log = retrain_family(
+            model_name, latest[model_name], increment, growth
+        )
+        results[model_name] = log_model(model_name, pipeline, model_log, X_test, y_test)
+        model_logs[model_name] = model_log
+    if model_logs:
+        record_champion(model_logs)
+    # Семейства без прошлой версии обучаются с нуля полным поиском
+    missing = [model_name for model_name in model_names if model_name not in latest]
+    if missing:
+        print(f"Нет прошлых версий {missing}, обучаем их с нуля")
+        results.update(train_pipelines(missing))
+
+    save_json(
+        {
+            "processed_files": sorted(
+                state["processed_files"] + [os.path.basename(path) for path in paths]
+            ),
+            "n_rows": n_seen_rows + len(new_data),
+            "updated_at": time.time(),
+        },
+        state_path,
+    )
+    print(f"Дообучение завершено за {time.perf_counter() - started:.1f} с")
+    return results
+
+
+if __name__ == "__main__":
+    run()
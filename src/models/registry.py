@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Optional
+
+import joblib
+
+REGISTRY_PATH = os.environ.get("MODEL_REGISTRY_PATH", "models/registry.json")
+# Чемпион выбирается по F1 на общей тестовой выборке data/processed: на ней
+# оцениваются и модели полного поиска, и дообученные. Записи без этой оценки
+# (зарегистрированные до её появления) сравниваются между собой по F1
+# кросс-валидации и уступают любой оценённой модели
+CHAMPION_METRIC = "test_f1"
+LEGACY_CHAMPION_METRIC = "best_f1"
+# Бюджет сервиса для чемпиона: p95 задержки одной строки и память под модель.
+# Чемпион - лучшая по F1 модель из укладывающихся в бюджет
+CHAMPION_MAX_P95_MS = float(os.environ.get("CHAMPION_MAX_P95_MS", 50))
+CHAMPION_MAX_MEMORY_MB = float(os.environ.get("CHAMPION_MAX_MEMORY_MB", 256))
+# Загружать компактный ансамбль деревьев (src/models/forest.py) вместо полного
+# sklearn-дампа, если он сохранён для модели
+COMPACT_MODEL = os.environ.get("COMPACT_MODEL", "1") == "1"
+# Каталог файлов моделей: у каждой версии свой файл, поэтому переобучение не
+# перезаписывает артефакт, на который ссылается старая запись реестра
+MODEL_DIR = os.environ.get("MODEL_DIR", "models/versions")
+
+
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def read_registry(registry_path: str = REGISTRY_PATH) -> dict:
+    if not os.path.exists(registry_path):
+        return {"champion": None, "models": []}
+    with open(registry_path) as f:
+        return json.load(f)
+
+
+def write_registry(registry: dict, registry_path: str = REGISTRY_PATH) -> None:
+    # Пишем во временный файл и подменяем атомарно, чтобы под при старте
+    # никогда не прочитал наполовину записанный реестр
+    os.makedirs(os.path.dirname(registry_path) or ".", exist_ok=True)
+    tmp_path = f"{registry_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, registry_path)
+
+
+def find_model(registry: dict, model_id: str) -> Optional[dict]:
+    for entry in registry["models"]:
+        if entry["id"] == model_id:
+            return entry
+    return None
+
+
+def next_version(model_name: str, registry_path: str = REGISTRY_PATH) -> int:
+    registry = read_registry(registry_path)
+    versions = [e["version"] for e in registry["models"] if e["name"] == model_name]
+    return max(versions, default=0) + 1
+
+
+def artifact_path(
+    model_name: str, version: int, suffix: str = ".pkl", model_dir: str = MODEL_DIR
+) -> str:
+    return os.path.join(model_dir, f"{model_name}_v{version}{suffix}")
+
+
+def register_model(
+    model_name: str,
+    model_path: str,
+    metrics: dict,
+    registry_path: str = REGISTRY_PATH,
+    compact_path: Optional[str] = None,
+    serving: Optional[dict] = None,
+    version: Optional[int] = None,
+    reference_path: Optional[str] = None,
+) -> dict:
+    registry = read_registry(registry_path)
+
+    if version is None:
+        version = next_version(model_name, registry_path)
+    elif find_model(registry, f"{model_name}:{version}") is not None:
+        raise ValueError(f"Версия {model_name}:{version} уже есть в реестре")
+    entry = {
+        "id": f"{model_name}:{version}",
+        "name": model_name,
+        "version": version,
+        "path": model_path,
+        "sha256": file_sha256(model_path),
+        "size_bytes": os.path.getsize(model_path),
+        "metrics": {key: float(value) for key, value in metrics.items()},
+        "created_at": str(datetime.now()),
+    }
+    if compact_path is not None:
+        entry["compact"] = {
+            "path": compact_path,
+            "sha256": file_sha256(compact_path),
+            "size_bytes": os.path.getsize(compact_path),
+        }
+    if reference_path is not None:
+        # Эталонные строки признаков для проверок при загрузке в сервисе
+        entry["reference"] = {
+            "path": reference_path,
+            "sha256": file_sha256(reference_path),
+            "size_bytes": os.path.getsize(reference_path),
+        }
+    if serving is not None:
+        entry["serving"] = serving
+    registry["models"].append(entry)
+    registry["champion"] = select_champion(registry["models"])["id"]
+
+    write_registry(registry, registry_path)
+    print(f"Модель {entry['id']} зарегистрирована, чемпион: {registry['champion']}")
+    return entry
+
+
+# Дополнение записи модели (например, экспортированными ONNX-артефактами)
+def update_model(
+    model_id: str, changes: dict, registry_path: str = REGISTRY_PATH
+) -> dict:
+    registry = read_registry(registry_path)
+    entry = find_model(registry, model_id)
+    if entry is None:
+        raise KeyError(f"Модели {model_id} нет в реестре {registry_path}")
+    entry.update(changes)
+    write_registry(registry, registry_path)
+    return entry
+
+
+# Модели без замеров (зарегистрированные до их появления) считаются
+# укладывающимися в бюджет
+def fits_budget(
+    entry: dict,
+    max_p95_ms: float = CHAMPION_MAX_P95_MS,
+    max_memory_mb: float = CHAMPION_MAX_MEMORY_MB,
+) -> bool:
+    serving = entry.get("serving")
+    if serving is None:
+        return True
+    return serving["p95_ms"] <= max_p95_ms and serving["memory_mb"] <= max_memory_mb
+
+
+# Модели в порядке предпочтения: укладывающиеся в бюджет по убыванию F1 (при
+# равном F1 - более поздняя), затем остальные от самой быстрой
+def champion_score(entry: dict) -> tuple:
+    metrics = entry["metrics"]
+    if CHAMPION_METRIC in metrics:
+        return True, metrics[CHAMPION_METRIC]
+    return False, metrics[LEGACY_CHAMPION_METRIC]
+
+
+def rank_models(
+    models: list,
+    max_p95_ms: float = CHAMPION_MAX_P95_MS,
+    max_memory_mb: float = CHAMPION_MAX_MEMORY_MB,
+) -> list:
+    order = {entry["id"]: index for index, entry in enumerate(models)}
+    candidates = [
+        entry for entry in models if fits_budget(entry, max_p95_ms, max_memory_mb)
+    ]
+    others = [entry for entry in models if entry not in candidates]
+    candidates.sort(
+        key=lambda entry: (*champion_score(entry), order[entry["id"]]),
+        reverse=True,
+    )
+    others.sort(key=lambda entry: entry["serving"]["p95_ms"])
+    return candidates + others
+
+
+def select_champion(
+    models: list,
+    max_p95_ms: float = CHAMPION_MAX_P95_MS,
+    max_memory_mb: float = CHAMPION_MAX_MEMORY_MB,
+) -> dict:
+    if not any(fits_budget(entry, max_p95_ms, max_memory_mb) for entry in models):
+        # Сервису нужна хоть какая-то модель: берётся самая быстрая
+        print("Ни одна модель не укладывается в бюджет задержки и памяти")
+    return rank_models(models, max_p95_ms, max_memory_mb)[0]
+
+
+# Повторный выбор чемпиона без регистрации новой модели: например, после
+# изменения бюджета CHAMPION_MAX_*
+def refresh_champion(registry_path: str = REGISTRY_PATH) -> dict:
+    registry = read_registry(registry_path)
+    champion = select_champion(registry["models"])
+    if registry["champion"] != champion["id"]:
+        registry["champion"] = champion["id"]
+        write_registry(registry, registry_path)
+    return champion
+
+
+def get_champion(registry_path: str = REGISTRY_PATH) -> Optional[dict]:
+    registry = read_registry(registry_path)
+    if registry["champion"] is None:
+        return None
+    return find_model(registry, registry["champion"])
+
+
+def load_champion(
+    registry_path: str = REGISTRY_PATH,
+    mmap_mode: Optional[str] = "r",
+    verify_hash: bool = True,
+    compact: bool = COMPACT_MODEL,
+):
+    registry = read_registry(registry_path)
+    champion = get_champion(registry_path)
+    if champion is None:
+        raise FileNotFoundError(f"В реестре {registry_path} нет модели-чемпиона")
+
+    # Если файл чемпиона пропал или изменён, загружается следующая по
+    # предпочтению версия: сервис стартует на ней, а не падает. Когда не
+    # загружается ни одна, поднимается ошибка самого чемпиона
+    fallbacks = [
+        e for e in rank_models(registry["models"]) if e["id"] != champion["id"]
+    ]
+    champion_error = None
+    for entry in [champion] + fallbacks:
+        try:
+            model = load_artifact(entry, mmap_mode, verify_hash, compact)
+        except (OSError, ValueError) as error:
+            print(f"Модель {entry['id']} не загружена: {error}")
+            champion_error = champion_error or error
+            continue
+        if entry is not champion:
+            print(f"Вместо чемпиона {champion['id']} загружена модель {entry['id']}")
+        return model, entry
+    raise champion_error
+
+
+def load_artifact(
+    entry: dict,
+    mmap_mode: Optional[str] = "r",
+    verify_hash: bool = True,
+    compact: bool = COMPACT_MODEL,
+):
+    artifact = entry["compact"] if compact and "compact" in entry else entry
+    if verify_hash and file_sha256(artifact["path"]) != artifact["sha256"]:
+        raise ValueError(
+            f"Хэш файла {artifact['path']} не совпадает с записью в реестре "
+            f"({entry['id']})"
+        )
+
+    # Несжатый joblib-дамп открывается через memory-map: numpy-массивы модели
+    # (у компактного ансамбля - все таблицы узлов) не копируются в память
+    # процесса, а подгружаются страницами по мере чтения
+    return joblib.load(artifact["path"], mmap_mode=mmap_mode)
@@ -0,0 +1,264 @@
+import math
+import time
+import warnings
+import numpy as np
+from joblib import Parallel, delayed, hash as joblib_hash
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterSampler, StratifiedKFold
+from sklearn.pipeline import Pipeline
+
+
+# Скореры sklearn по словарю scoring (имена метрик или готовые скореры): общие
+# для поиска, дообучения и оценки на тестовой выборке
+def get_scorers(scoring: dict) -> dict:
+    return {
+        name: get_scorer(scorer) if isinstance(scorer, str) else scorer
+        for name, scorer in scoring.items()
+    }
+
+
+
+def _fit_and_score(estimator, params, X_train, y_train, X_val, y_val, scorers):
+    started = time.perf_counter()
+    estimator = clone(estimator).set_params(**params)
+    try:
+        estimator.fit(X_train, y_train)
+    except Exception as error:
+        # Как error_score=np.nan в RandomizedSearchCV: несовместимые параметры
+        # (например, penalty="elasticnet" с solver="liblinear") не роняют поиск
+        warnings.warn(f"Не удалось обучить модель с параметрами {params}: {error}")
+        return {name: np.nan for name in scorers}, time.perf_counter() - started
+    fit_time = time.perf_counter() - started
+
+    scores = {name: scorer(estimator, X_val, y_val) for name, scorer in scorers.items()}
+    return scores, fit_time
+
+
+def _fit(estimator, params, X, y):
+    return clone(estimator).set_params(**params).fit(X, y)
+
+
+# Срезы фолдов берутся уже в воркере: общие X и y передаются memory-map'ом,
+# а не копией строк фолда в каждую задачу
+def _fit_and_score_fold(estimator, params, X, y, train_idx, val_idx, scorers):
+    return _fit_and_score(
+        estimator,
+        params,
+        X.iloc[train_idx],
+        y.iloc[train_idx],
+        X.iloc[val_idx],
+        y.iloc[val_idx],
+        scorers,
+    )
+
+
+def _transform_fold(preprocessor, X, y, train_idx, val_idx):
+    preprocessor = clone(preprocessor)
+    return (
+        preprocessor.fit_transform(X.iloc[train_idx], y.iloc[train_idx]),
+        preprocessor.transform(X.iloc[val_idx]),
+    )
+
+
+def _task(family: dict, index: int, fold: int, X, y, fold_subset, scorers):
+    train_idx, val_idx = fold_subset
+    if family["split"] is None:
+        estimator, params = family["estimator"], family["candidates"][index]
+        return delayed(_fit_and_score_fold)(
+            estimator, params, X, y, train_idx, val_idx, scorers
+        )
+    _, estimator, final_params = family["split"]
+    X_train, X_val = family["fold_cache"][fold]
+    return delayed(_fit_and_score)(
+        estimator,
+        final_params[index],
+        X_train,
+        y.iloc[train_idx],
+        X_val,
+        y.iloc[val_idx],
+        scorers,
+    )
+
+
+def _split_preprocessing(estimator, candidates: list):
+    # Если меняются только параметры последнего шага пайплайна, предобработку
+    # можно обучить один раз на фолд и переиспользовать для всех кандидатов
+    if not isinstance(estimator, Pipeline) or len(estimator.steps) < 2:
+        return None
+    name, final_step = estimator.steps[-1]
+    prefix = f"{name}__"
+    if not all(key.startswith(prefix) for params in candidates for key in params):
+        return None
+    return (
+        estimator[:-1],
+        final_step,
+        [
+            {key[len(prefix) :]: value for key, value in params.items()}
+            for params in candidates
+        ],
+    )
+
+
+def _halving_schedule(n_candidates: int, n_samples: int, factor: int, min_resources):
+    # Как в HalvingRandomSearchCV: на последнем шаге кандидаты учатся на всех данных,
+    # на каждом предыдущем - на выборке в factor раз меньше, а кандидатов в factor
+    # раз больше
+    if factor <= 1:
+        return [(n_candidates, n_samples)]
+    n_rungs = int(math.log(n_candidates, factor)) + 1
+    n_rungs = min(n_rungs, int(math.log(n_samples / min_resources, factor)) + 1)
+    schedule = []
+    for rung in range(n_rungs):
+        n_keep = math.ceil(n_candidates / factor**rung)
+        resources = int(n_samples / factor ** (n_rungs - 1 - rung))
+        schedule.append((n_keep, resources))
+    return schedule
+
+
+# Случайный поиск гиперпараметров сразу для нескольких семейств моделей.
+# estimators - {имя: (pipeline, param_distributions)}. Кандидаты всех семейств
+# считаются в одном пуле процессов. При halving_factor > 1 применяется successive
+# halving: слабые кандидаты отсеиваются на подвыборках, и только лучшие доходят
+# до полной кросс-валидации на всех данных. Если истёк budget_seconds, поиск
+# сразу переходит к последнему шагу с лучшим кандидатом каждого семейства
+def search_models(
+    estimators: dict,
+    X,
+    y,
+    scoring: dict,
+    refit: str = "f1",
+    n_iter: int = 30,
+    cv: int = 5,
+    random_state: int = 42,
+    halving_factor: int = 3,
+    min_resources: int = 500,
+    budget_seconds: float = None,
+    cache_folds: bool = True,
+    n_jobs: int = -1,
+    verbose: bool = True,
+) -> dict:
+    started = time.perf_counter()
+    scorers = get_scorers(scoring)
+    folds = list(StratifiedKFold(n_splits=cv).split(X, y))
+    # Подвыборки вложены друг в друга: берём префикс одной перестановки
+    order = np.random.RandomState(random_state).permutation(len(X))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+
+    families = {}
+    for name, (estimator, param_distributions) in estimators.items():
+        candidates = list(
+            ParameterSampler(param_distributions, n_iter, random_state=random_state)
+        )
+        split = _split_preprocessing(estimator, candidates) if cache_folds else None
+        families[name] = {
+            "estimator": estimator,
+            "candidates": candidates,
+            "alive": list(range(len(candidates))),
+            "results": [{"params": params, "rung": -1} for params in candidates],
+            "split": split,
+            "cache_key": joblib_hash(split[0]) if split is not None else None,
+        }
+
+    schedule = _halving_schedule(n_iter, len(X), halving_factor, min_resources)
+    parallel = Parallel(n_jobs=n_jobs, batch_size=1)
+    for rung, (n_keep, resources) in enumerate(schedule):
+        last_rung = rung == len(schedule) - 1
+        over_budget = (
+            budget_seconds is not None
+            and time.perf_counter() - started > budget_seconds
+        )
+        if over_budget and not last_rung:
+            if verbose:
+                print("Бюджет времени исчерпан, переходим к финальной проверке")
+            rung, (n_keep, resources) = len(schedule) - 1, schedule[-1]
+            last_rung = True
+        for family in families.values():
+            family["alive"] = family["alive"][: 1 if over_budget else n_keep]
+
+        fold_subsets = [
+            (train_idx[rank[train_idx] < resources], val_idx)
+            for train_idx, val_idx in folds
+        ]
+        tasks = [
+            (name, index, fold)
+            for name, family in families.items()
+            for index in family["alive"]
+            for fold in range(cv)
+        ]
+
+        # Предобработка обучается один раз на фолд и шаг, а не для каждого кандидата.
+        # Одинаковые препроцессоры разных семейств делят один кэш. Большие массивы
+        # joblib передаёт воркерам через memory-map, а не копией в каждую задачу
+        preprocessors = {
+            family["cache_key"]: family["split"][0]
+            for family in families.values()
+            if family["split"] is not None
+        }
+        cache_keys = list(preprocessors)
+        transformed = parallel(
+            delayed(_transform_fold)(preprocessors[key], X, y, train_idx, val_idx)
+            for key in cache_keys
+            for train_idx, val_idx in fold_subsets
+        )
+        fold_cache = {
+            (key, fold): transformed[i * cv + fold]
+            for i, key in enumerate(cache_keys)
+            for fold in range(cv)
+        }
+        for family in families.values():
+            family["fold_cache"] = [
+                fold_cache.get((family["cache_key"], fold)) for fold in range(cv)
+            ]
+
+        outputs = parallel(
+            _task(families[name], index, fold, X, y, fold_subsets[fold], scorers)
+            for name, index, fold in tasks
+        )
+
+        fold_scores = {}
+        for (name, index, _), (scores, fit_time) in zip(tasks, outputs):
+            fold_scores.setdefault((name, index), []).append((scores, fit_time))
+        for (name, index), per_fold in fold_scores.items():
+            result = families[name]["results"][index]
+            result["rung"] = rung
+            result["n_resources"] = resources
+            result["mean_fit_time"] = float(np.mean([t for _, t in per_fold]))
+            for metric in scorers:
+                values = [scores[metric] for scores, _ in per_fold]
+                result[f"mean_test_{metric}"] = float(np.mean(values))
+                result[f"std_test_{metric}"] = float(np.std(values))
+
+        for family in families.values():
+            family["alive"].sort(
+                key=lambda index: np.nan_to_num(
+                    family["results"][index][f"mean_test_{refit}"], nan=-np.inf
+                ),
+                reverse=True,
+            )
+        if last_rung:
+            break
+
+    # Лучшая модель каждого семейства уже определена - обучаем её на всех данных
+    # ровно один раз, все семейства параллельно
+    best_indices = {name: family["alive"][0] for name, family in families.items()}
+    best_estimators = parallel(
+        delayed(_fit)(
+            families[name]["estimator"], families[name]["candidates"][index], X, y
+        )
+        for name, index in best_indices.items()
+    )
+
+    results = {}
+    for (name, index), best_estimator in zip(best_indices.items(), best_estimators):
+        family = families[name]
+        results[name] = {
+            "best_index": index,
+            "best_params": family["candidates"][index],
+            "best_estimator": best_estimator,
+            "cv_results": family["results"],
+        }
+    if verbose:
+        print(f"Поиск завершён за {time.perf_counter() - started:.1f} с")
+    return results
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from src.data.splits import PROCESSED_DIR, TARGET_COLUMN, load_splits
+from src.features.build_features import FEATURE_NAMES
+
+# Каталог для общих массивов сессии: /dev/shm - это tmpfs, страницы лежат в
+# общей памяти и не дублируются в каждом процессе пула
+SHARED_MEMORY_DIR = os.environ.get(
+    "TRAINING_SHARED_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None
+)
+
+
+def check_splits(X_train, y_train, X_test, y_test) -> None:
+    for name, X, y in (("train", X_train, y_train), ("test", X_test, y_test)):
+        if list(X.columns) != FEATURE_NAMES:
+            raise ValueError(f"Колонки x_{name} не совпадают с FEATURE_NAMES")
+        if len(X) == 0 or len(X) != len(y):
+            raise ValueError(
+                f"В x_{name} {len(X)} строк, в y_{name} {len(y)}: "
+                "выборки пусты или не совпадают по длине"
+            )
+        labels = set(np.unique(y.to_numpy()).tolist())
+        if not labels <= {0, 1}:
+            raise ValueError(f"В y_{name} недопустимые метки {sorted(labels)}")
+
+
+# Сессия обучения: выборки читаются и проверяются один раз и дальше общие для
+# всех семейств моделей. Каждая колонка лежит отдельным .npy в общей памяти и
+# открыта как memory-map в режиме copy-on-write: joblib передаёт такие массивы
+# воркерам ссылкой на файл, а не копией, а sklearn может снять с них флаг
+# read-only (запись ушла бы в приватную копию страницы, файл не меняется)
+class TrainingSession:
+    def __init__(
+        self, processed_dir: str = PROCESSED_DIR, shared_dir=SHARED_MEMORY_DIR
+    ):
+        X_train, y_train, X_test, y_test = load_splits(processed_dir)
+        check_splits(X_train, y_train, X_test, y_test)
+
+        self.folder = tempfile.mkdtemp(prefix="training_session_", dir=shared_dir)
+        try:
+            self.X_train = self._share_frame(X_train, "x_train")
+            self.y_train = self._share_column(y_train, "y_train")
+            self.X_test = self._share_frame(X_test, "x_test")
+            self.y_test = self._share_column(y_test, "y_test")
+        except BaseException:
+            self.close()
+            raise
+
+    def _share_array(self, values: np.ndarray, name: str) -> np.ndarray:
+        path = os.path.join(self.folder, f"{name}.npy")
+        np.save(path, values)
+        return np.load(path, mmap_mode="c")
+
+    def _share_column(self, series: pd.Series, name: str) -> pd.Series:
+        values = self._share_array(series.to_numpy(), name)
+        return pd.Series(values, name=TARGET_COLUMN, copy=False)
+
+    def _share_frame(self, frame: pd.DataFrame, name: str) -> pd.DataFrame:
+        # copy=False оставляет каждую колонку отдельным блоком поверх memory-map
+        return pd.DataFrame(
+            {
+                column: self._share_array(frame[column].to_numpy(), f"{name}.{column}")
+                for column in frame.columns
+            },
+            copy=False,
+        )
+
+    def close(self) -> None:
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
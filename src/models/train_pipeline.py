@@ -2,31 +2,99 @@ import mlflow
 import mlflow.sklearn
 from sklearn.metrics import roc_curve
 import matplotlib.pyplot as plt
-import pandas as pd
 import os
+import shutil
+import tempfile
 import joblib
-from .pipeline import get_best_pipeline
+from src.api.backends import REFERENCE_ROWS, save_reference
+from src.data.splits import SPLIT_NAMES, split_path
+from src.data.stage_cache import cached_stage, package_versions
+from src.features.build_features import FEATURE_NAMES
+from .benchmark import profile_artifact
+from .forest import FOREST_LEAF_DTYPE, FOREST_TOLERANCE, export_compact
+from .pipeline import MODELS, RANDOM_STATE, SCORING, get_best_pipelines
+from .registry import (
+    CHAMPION_MAX_MEMORY_MB,
+    CHAMPION_MAX_P95_MS,
+    COMPACT_MODEL,
+    artifact_path,
+    find_model,
+    get_champion,
+    next_version,
+    read_registry,
+    refresh_champion,
+    register_model,
+)
+from .search import get_scorers
+from .session import TrainingSession
 from datetime import datetime
-import pandas as pd
 import json
-from onxx_transformation.convert_to_onxx import convert_to_onxx
+import numpy as np
 
+MODEL_NAMES = [
+    "LogisticRegression",
+    "GradientBoostingClassifier",
+    "RandomForestClassifier",
+]
 
-def train_pipeline(model_name: str):
-    X_train = pd.read_csv("data/processed/x_train.csv")
-    y_train = pd.read_csv("data/processed/y_train.csv")
-    X_test = pd.read_csv("data/processed/x_test.csv")
-    y_test = pd.read_csv("data/processed/y_test.csv")
+# Определение признаков
+NUMERIC_FEATURES = ["LIMIT_BAL", "AGE", "BILL_AMT1", "PAY_AMT1"]
+CATEGORICAL_FEATURES = ["EDUCATION", "MARRIAGE", "PAY_0"]
 
-    # Определение признаков
-    numeric_features = ["LIMIT_BAL", "AGE", "BILL_AMT1", "PAY_AMT1"]
-    categorical_features = ["EDUCATION", "MARRIAGE", "PAY_0"]
-
-    with mlflow.start_run():
-        best_pipeline, model_log = get_best_pipeline(
-            numeric_features, categorical_features, X_train, y_train, model_name
+# Параметры общего поиска гиперпараметров: SEARCH_HALVING_FACTOR=1 отключает
+# successive halving, SEARCH_BUDGET_SECONDS ограничивает время поиска
+SEARCH_HALVING_FACTOR = int(os.environ.get("SEARCH_HALVING_FACTOR", 3))
+SEARCH_BUDGET_SECONDS = os.environ.get("SEARCH_BUDGET_SECONDS")
+# Код, от которого зависят обученные модели, их метрики и записи реестра: при
+# его изменении кэш этапа обучения не используется
+TRAIN_SOURCES = (
+    [
+        os.path.join(os.path.dirname(__file__), f"{name}.py")
+        for name in (
+            "train_pipeline",
+            "pipeline",
+            "search",
+            "forest",
+            "benchmark",
+            "registry",
+            "session",
         )
+    ]
+    + [
+        os.path.join(os.path.dirname(__file__), "..", "features", f"{name}.py")
+        for name in ("build_features", "vectorizer")
+    ]
+    + [
+        os.path.join(os.path.dirname(__file__), "..", "data", f"{name}.py")
+        for name in ("splits", "cleaning")
+    ]
+    + [os.path.join(os.path.dirname(__file__), "..", "api", "backends.py")]
+)
+
+
+def search_options() -> dict:
+    return {
+        "halving_factor": SEARCH_HALVING_FACTOR,
+        "budget_seconds": (
+            float(SEARCH_BUDGET_SECONDS) if SEARCH_BUDGET_SECONDS else None
+        ),
+    }
+
+
+# Метрики на тестовой выборке: по ним сравниваются все версии в реестре
+def test_metrics(pipeline, X_test, y_test) -> dict:
+    return {
+        f"test_{name}": float(scorer(pipeline, X_test, y_test))
+        for name, scorer in get_scorers(SCORING).items()
+    }
 
+
+# X_test, y_test - общая тестовая выборка data/processed, а не отложенная
+# часть данных, на которых подбиралась модель
+def log_model(model_name, best_pipeline, model_log, X_test, y_test):
+    model_log["metrics"].update(test_metrics(best_pipeline, X_test, y_test))
+    with mlflow.start_run() as run:
+        model_log["run_id"] = run.info.run_id
         # Предсказания и метрики
         y_pred_proba = best_pipeline.predict_proba(X_test)[:, 1]
 
@@ -39,7 +107,7 @@ def train_pipeline(model_name: str):
         fpr, tpr, _ = roc_curve(y_test, y_pred_proba)
         plt.figure()
         plt.plot(
-            fpr, tpr, label=f'ROC-AUC = {model_log["metrics"]["best_roc_auc"]:.2f})'
+            fpr, tpr, label=f'ROC-AUC = {model_log["metrics"]["test_roc_auc"]:.2f})'
         )
         plt.plot([0, 1], [0, 1], "k--")
         plt.xlabel("Доля ложно полижетельных результатов")
@@ -47,33 +115,264 @@ def train_pipeline(model_name: str):
         plt.title("ROC кривая")
         plt.legend(loc="lower right")
         plt.savefig(f"graphs/{model_name}_roc_curve.png")
+        plt.close()
         mlflow.log_artifact(f"graphs/{model_name}_roc_curve.png")
 
-        # Сохранение модели
+        # Сохранение модели: у каждой версии свой файл, файлы прошлых версий
+        # в реестре остаются нетронутыми
         mlflow.sklearn.log_model(best_pipeline, "model")
-        model_path = f"models/{model_name}_credit_default_model.pkl"
+        version = next_version(model_name)
+        model_path = artifact_path(model_name, version)
         os.makedirs(os.path.dirname(model_path), exist_ok=True)
         joblib.dump(best_pipeline, model_path)
         mlflow.log_artifact(model_path)
+        # Для ансамблей деревьев рядом сохраняется компактная версия для сервиса
+        compact_path = export_compact(
+            best_pipeline,
+            artifact_path(model_name, version, ".compact.pkl"),
+            X_test,
+        )
+        if compact_path is not None:
+            mlflow.log_artifact(compact_path)
 
-        # Сохранение метрик
-        with open("metrics.json", "a") as f:
-            model_metrics = {
-                "model_name": model_name,
-                "timestamp": str(datetime.now()),
-                **model_log["metrics"],
-            }
-            f.write(json.dumps(model_metrics) + "\n")
+        # Стоимость обслуживания меряется на том артефакте, который загрузит
+        # сервис, и участвует в выборе чемпиона
+        if compact_path is not None and COMPACT_MODEL:
+            serving_path, variant = compact_path, "forest"
+        else:
+            serving_path, variant = model_path, "sklearn"
+        matrix = np.ascontiguousarray(X_test[FEATURE_NAMES], dtype=np.float32)
+        serving = profile_artifact(serving_path, variant, matrix)
+        # Эталонные строки для проверок бэкендов в сервисе, без данных обучения
+        reference_path = save_reference(
+            matrix, artifact_path(model_name, version, ".reference.npy")
+        )
+        mlflow.log_metrics(serving_metrics(serving))
+        entry = register_model(
+            model_name,
+            model_path,
+            model_log["metrics"],
+            compact_path=compact_path,
+            serving=serving,
+            version=version,
+            reference_path=reference_path,
+        )
+        model_log["registry_id"] = entry["id"]
+        append_metrics(model_name, model_log["metrics"], serving)
 
     return model_log["metrics"], model_path
 
 
-def train_pipeline_with_onxx(model_name):
-    metrics, model_path = train_pipeline(model_name)
-    convert_to_onxx(model_path=model_path)
+def serving_metrics(serving: dict) -> dict:
+    return {
+        f"serving_{key}": value for key, value in serving.items() if key != "variant"
+    }
+
+
+def append_metrics(model_name: str, metrics: dict, serving: dict) -> None:
+    with open("metrics.json", "a") as f:
+        model_metrics = {
+            "model_name": model_name,
+            "timestamp": str(datetime.now()),
+            **metrics,
+            **serving_metrics(serving),
+        }
+        f.write(json.dumps(model_metrics) + "\n")
+
+
+# Итог выбора после регистрации всех кандидатов: метка champion у запусков
+# MLflow и строка с чемпионом и бюджетом в metrics.json
+def record_champion(model_logs: dict) -> dict:
+    champion = get_champion()
+    client = mlflow.tracking.MlflowClient()
+    for model_log in model_logs.values():
+        client.set_tag(
+            model_log["run_id"],
+            "champion",
+            str(model_log["registry_id"] == champion["id"]).lower(),
+        )
+    with open("metrics.json", "a") as f:
+        selection = {
+            "champion": champion["id"],
+            "timestamp": str(datetime.now()),
+            "max_p95_ms": CHAMPION_MAX_P95_MS,
+            "max_memory_mb": CHAMPION_MAX_MEMORY_MB,
+            **{f"serving_{k}": v for k, v in champion.get("serving", {}).items()},
+        }
+        f.write(json.dumps(selection) + "\n")
+    print(
+        f"Чемпион {champion['id']}: лучший F1 в бюджете "
+        f"p95 {CHAMPION_MAX_P95_MS} мс и {CHAMPION_MAX_MEMORY_MB} MB"
+    )
+    return champion
+
+
+# Файлы записи реестра по суффиксам artifact_path
+def entry_artifacts(entry: dict) -> dict:
+    artifacts = {".pkl": entry["path"]}
+    if "compact" in entry:
+        artifacts[".compact.pkl"] = entry["compact"]["path"]
+    if "reference" in entry:
+        artifacts[".reference.npy"] = entry["reference"]["path"]
+    return artifacts
+
+
+# Куда вернуть файлы из кэша обучения. Модель, которая уже есть в реестре с
+# тем же хэшем, заново не регистрируется, её копии из кэша распаковываются во
+# временный каталог. Остальные получают следующую версию и её пути: пути, с
+# которыми они были сохранены, могли с тех пор занять другие версии (например,
+# после дообучения или пересоздания реестра)
+def plan_restore(value: dict) -> dict:
+    registry = read_registry()
+    restore = value["restore"] = {
+        "scratch": tempfile.mkdtemp(prefix="train_cache_"),
+        "known": {},
+        "versions": {},
+    }
+    files = {}
+    for entry in value["entries"]:
+        name = entry["name"]
+        known = next(
+            (
+                other["id"]
+                for other in registry["models"]
+                if other["name"] == name and other["sha256"] == entry["sha256"]
+            ),
+            None,
+        )
+        restore["known"][name] = known
+        restore["versions"][name] = None if known else next_version(name)
+        for suffix in entry_artifacts(entry):
+            files[f"{name}{suffix}"] = (
+                os.path.join(restore["scratch"], f"{name}{suffix}")
+                if known
+                else artifact_path(name, restore["versions"][name], suffix)
+            )
+    return files
+
+
+# Результат обучения из кэша: модели регистрируются по плану plan_restore, для
+# каждой пишутся запуск MLflow с меткой stage_cache=hit и строка в
+# metrics.json, чемпион выбирается заново (могли измениться бюджеты или реестр)
+def restore_registered(value: dict) -> dict:
+    restore = value["restore"]
+    registry = read_registry()
+    results, model_logs = {}, {}
+    try:
+        for entry in value["entries"]:
+            name = entry["name"]
+            if restore["known"][name] is not None:
+                registered = find_model(registry, restore["known"][name])
+            else:
+                version = restore["versions"][name]
+                artifacts = {
+                    suffix: artifact_path(name, version, suffix)
+                    for suffix in entry_artifacts(entry)
+                }
+                registered = register_model(
+                    name,
+                    artifacts[".pkl"],
+                    entry["metrics"],
+                    compact_path=artifacts.get(".compact.pkl"),
+                    serving=entry.get("serving"),
+                    version=version,
+                    reference_path=artifacts.get(".reference.npy"),
+                )
+            with mlflow.start_run() as run:
+                mlflow.set_tag("stage_cache", "hit")
+                mlflow.log_param("model_type", name)
+                mlflow.log_metrics(
+                    {**entry["metrics"], **serving_metrics(entry.get("serving", {}))}
+                )
+            model_logs[name] = {
+                "run_id": run.info.run_id,
+                "registry_id": registered["id"],
+            }
+            append_metrics(name, entry["metrics"], entry.get("serving", {}))
+            results[name] = (entry["metrics"], registered["path"])
+    finally:
+        shutil.rmtree(restore["scratch"], ignore_errors=True)
+    refresh_champion()
+    record_champion(model_logs)
+    return results
+
+
+def training_outputs(value: dict) -> dict:
+    files = {}
+    for entry in value["entries"]:
+        for suffix, path in entry_artifacts(entry).items():
+            files[f"{entry['name']}{suffix}"] = path
+        graph_path = f"graphs/{entry['name']}_roc_curve.png"
+        if os.path.exists(graph_path):
+            files[f"{entry['name']}_roc_curve.png"] = graph_path
+    return files
+
+
+def train_pipelines(model_names: list[str], session: TrainingSession = None) -> dict:
+    # Переданная сессия может содержать любые выборки, кэшируется только
+    # обучение на выборках из data/processed
+    if session is not None:
+        return _train_pipelines(model_names, session)[0]
+
+    def compute() -> dict:
+        with TrainingSession() as session:
+            results, model_ids = _train_pipelines(model_names, session)
+        registry = read_registry()
+        entries = [find_model(registry, model_id) for model_id in model_ids]
+        return {"results": results, "entries": entries}
+
+    value = cached_stage(
+        "train",
+        compute,
+        training_outputs,
+        inputs=[split_path(name) for name in SPLIT_NAMES],
+        sources=TRAIN_SOURCES,
+        params={
+            "model_names": sorted(model_names),
+            "models": joblib.hash(MODELS),
+            "search": search_options(),
+            "random_state": RANDOM_STATE,
+            "compact": [COMPACT_MODEL, FOREST_LEAF_DTYPE, FOREST_TOLERANCE],
+            "budget": [CHAMPION_MAX_P95_MS, CHAMPION_MAX_MEMORY_MB],
+            "reference_rows": REFERENCE_ROWS,
+            "versions": package_versions("scikit-learn", "numpy", "scipy"),
+        },
+        destinations=plan_restore,
+    )
+    if "restore" in value:
+        return restore_registered(value)
+    return value["results"]
+
+
+def _train_pipelines(
+    model_names: list[str], session: TrainingSession
+) -> tuple[dict, list[str]]:
+    # Все семейства моделей подбираются одним поиском в общем пуле процессов
+    # на общих выборках сессии
+    best_pipelines = get_best_pipelines(
+        NUMERIC_FEATURES,
+        CATEGORICAL_FEATURES,
+        session.X_train,
+        session.y_train,
+        model_names,
+        **search_options(),
+    )
+    results = {
+        model_name: log_model(
+            model_name, best_pipeline, model_log, session.X_test, session.y_test
+        )
+        for model_name, (best_pipeline, model_log) in best_pipelines.items()
+    }
+    model_logs = {
+        model_name: model_log for model_name, (_, model_log) in best_pipelines.items()
+    }
+    record_champion(model_logs)
+    return results, [model_log["registry_id"] for model_log in model_logs.values()]
+
+
+def train_pipeline(model_name: str, session: TrainingSession = None):
+    return train_pipelines([model_name], session)[model_name]
 
 
 if __name__ == "__main__":
-    train_pipeline("LogisticRegression")
-    train_pipeline("GradientBoostingClassifier")
-    train_pipeline("RandomForestClassifier")
+    train_pipelines(MODEL_NAMES)
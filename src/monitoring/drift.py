@@ -0,0 +1,347 @@
+import json
+import os
+import sys
+import time
+from typing import Optional
+import numpy as np
+import pyarrow.feather as feather
+from src.features.build_features import FEATURE_NAMES
+from src.monitoring.prediction_log import (
+    LOG_PROBABILITY,
+    LOG_TIMESTAMP,
+    PREDICTION_LOG_DIR,
+    log_files,
+)
+
+DRIFT_REFERENCE_PATH = os.environ.get(
+    "DRIFT_REFERENCE_PATH", "monitoring/drift_reference.json"
+)
+DRIFT_STATE_PATH = os.environ.get("DRIFT_STATE_PATH", "monitoring/drift_state.json")
+DRIFT_VERDICTS_PATH = os.environ.get(
+    "DRIFT_VERDICTS_PATH", "monitoring/drift_verdicts.jsonl"
+)
+
+DRIFT_WINDOW_SECONDS = int(os.environ.get("DRIFT_WINDOW_SECONDS", 24 * 3600))
+DRIFT_BINS = int(os.environ.get("DRIFT_BINS", 20))
+# Признак считается сдвинутым при PSI или KS выше порога, датасет - если сдвинута
+# доля признаков не меньше DRIFT_SHARE (как DatasetDriftMetric в Evidently) или
+# распределение предсказаний
+PSI_THRESHOLD = float(os.environ.get("PSI_THRESHOLD", 0.2))
+KS_THRESHOLD = float(os.environ.get("KS_THRESHOLD", 0.1))
+DRIFT_SHARE = float(os.environ.get("DRIFT_SHARE", 0.5))
+MIN_WINDOW_ROWS = int(os.environ.get("DRIFT_MIN_WINDOW_ROWS", 500))
+PREDICTION = "prediction"
+EPS = 1e-4
+
+
+def bin_edges(values: np.ndarray, n_bins: int = DRIFT_BINS) -> np.ndarray:
+    values = values[~np.isnan(values)]
+    unique = np.unique(values)
+    # Дискретные признаки (SEX, PAY_*) получают по корзине на значение,
+    # непрерывные - корзины равной массы по квантилям эталона
+    if len(unique) <= n_bins:
+        return unique[1:]
+    quantiles = np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1])
+    return np.unique(quantiles)
+
+
+def bin_counts(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    return np.bincount(
+        np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1
+    )
+
+
+def psi(reference: np.ndarray, current: np.ndarray) -> float:
+    expected = np.maximum(reference / reference.sum(), EPS)
+    actual = np.maximum(current / current.sum(), EPS)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks(reference: np.ndarray, current: np.ndarray) -> float:
+    # Статистика Колмогорова-Смирнова по корзинам: максимум разности CDF на
+    # границах корзин (оценка снизу для точной статистики)
+    return float(
+        np.max(
+            np.abs(
+                np.cumsum(reference) / reference.sum()
+                - np.cumsum(current) / current.sum()
+            )
+        )
+    )
+
+
+# Эталон считается один раз по обучающей выборке: границы корзин и доли в них
+# для каждого признака и для вероятности модели
+def build_reference(X_train, proba=None, fill_values: dict = None) -> dict:
+    features = {}
+    for column in FEATURE_NAMES:
+        values = np.asarray(X_train[column], dtype=np.float64)
+        edges = bin_edges(values)
+        features[column] = {
+            "edges": edges.tolist(),
+            "counts": bin_counts(values[~np.isnan(values)], edges).tolist(),
+        }
+    if proba is not None:
+        edges = bin_edges(np.asarray(proba, dtype=np.float64))
+        features[PREDICTION] = {
+            "edges": edges.tolist(),
+            "counts": bin_counts(proba, edges).tolist(),
+        }
+    return {
+        "features": features,
+        "fill_values": fill_values or {},
+        "n_rows": len(X_train),
+        "created_at": time.time(),
+    }
+
+
+def save_json(data: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def load_json(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+# Онлайн-монитор дрейфа: для каждого окна времени хранятся только счётчики по
+# корзинам эталона, поэтому память на признак постоянна и не зависит от числа
+# запросов. Окна, после которых уже пришли данные следующего окна, закрываются
+# и выдают итоговый вердикт
+class DriftMonitor:
+    def __init__(self, reference: dict, window_seconds: int = DRIFT_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.columns = list(reference["features"])
+        self.edges = {
+            column: np.asarray(feature["edges"])
+            for column, feature in reference["features"].items()
+        }
+        self.reference = {
+            column: np.asarray(feature["counts"], dtype=np.float64)
+            for column, feature in reference["features"].items()
+        }
+        self.fill_values = reference.get("fill_values", {})
+        self.windows = {}
+        # Отметка прочитанного лога: [время изменения в нс, имя] последнего
+        # файла. Файлы лога закрываются по очереди, поэтому всё, что не новее
+        # отметки, уже учтено, и состояние не растёт с числом файлов
+        self.consumed = None
+
+    def _window(self, start: int) -> dict:
+        if start not in self.windows:
+            self.windows[start] = {
+                "n_rows": 0,
+                "counts": {
+                    column: np.zeros(len(self.edges[column]) + 1, dtype=np.int64)
+                    for column in self.columns
+                },
+            }
+        return self.windows[start]
+
+    def update(self, columns: dict, timestamps: np.ndarray) -> None:
+        starts = (np.asarray(timestamps) // self.window_seconds).astype(np.int64)
+        starts *= self.window_seconds
+        for start in np.unique(starts):
+            rows = starts == start
+            window = self._window(int(start))
+            window["n_rows"] += int(rows.sum())
+            for column in self.columns:
+                if column not in columns:
+                    continue
+                values = np.asarray(columns[column], dtype=np.float64)[rows]
+                missing = np.isnan(values)
+                if missing.any():
+                    values = values[~missing]
+                    fill_value = self.fill_values.get(column)
+                    if fill_value is not None:
+                        values = np.concatenate(
+                            [values, np.full(int(missing.sum()), fill_value)]
+                        )
+                window["counts"][column] += bin_counts(values, self.edges[column])
+
+    def verdict(self, start: int, complete: bool = True) -> dict:
+        window = self.windows[start]
+        enough_data = window["n_rows"] >= MIN_WINDOW_ROWS
+        statistics = {}
+        for column in self.columns:
+            counts = window["counts"][column]
+            if counts.sum() == 0:
+                continue
+            psi_value = psi(self.reference[column], counts)
+            ks_value = ks(self.reference[column], counts)
+            statistics[column] = {
+                "psi": psi_value,
+                "ks": ks_value,
+                "drift": enough_data
+                and (psi_value > PSI_THRESHOLD or ks_value > KS_THRESHOLD),
+            }
+
+        drifted = [
+            column
+            for column in FEATURE_NAMES
+            if statistics.get(column, {}).get("drift")
+        ]
+        n_features = sum(column in statistics for column in FEATURE_NAMES)
+        drift_share = len(drifted) / n_features if n_features else 0.0
+        prediction_drift = statistics.get(PREDICTION, {}).get("drift", False)
+        return {
+            "window_start": start,
+            "window_end": start + self.window_seconds,
+            "complete": complete,
+            "n_rows": window["n_rows"],
+            "enough_data": enough_data,
+            "drift_share": drift_share,
+            "drifted_features": drifted,
+            "prediction_drift": prediction_drift,
+            "drift_detected": enough_data
+            and (drift_share >= DRIFT_SHARE or prediction_drift),
+            "statistics": statistics,
+        }
+
+    def close_windows(self) -> list[dict]:
+        # Все окна, кроме последнего, закрываются и удаляются из состояния,
+        # последнее остаётся открытым и получает промежуточный вердикт
+        if not self.windows:
+            return []
+        latest = max(self.windows)
+        verdicts = [self.verdict(start) for start in sorted(self.windows)[:-1]]
+        for verdict in verdicts:
+            del self.windows[verdict["window_start"]]
+        verdicts.append(self.verdict(latest, complete=False))
+        return verdicts
+
+    def consume_logs(self, log_dir: str = PREDICTION_LOG_DIR) -> int:
+        # Каждый файл лога читается ровно один раз за всё время работы монитора
+        n_rows = 0
+        files = sorted(
+            (os.stat(path).st_mtime_ns, os.path.basename(path), path)
+            for path in log_files(log_dir)
+        )
+        for mtime, name, path in files:
+            if self.consumed is not None and [mtime, name] <= self.consumed:
+                continue
+            table = feather.read_table(path, memory_map=True)
+            names = set(table.column_names)
+            columns = {
+                column: table.column(column).to_numpy()
+                for column in FEATURE_NAMES
+                if column in names
+            }
+            if LOG_PROBABILITY in names:
+                columns[PREDICTION] = table.column(LOG_PROBABILITY).to_numpy()
+            self.update(columns, table.column(LOG_TIMESTAMP).to_numpy())
+            self.consumed = [mtime, name]
+            n_rows += table.num_rows
+        return n_rows
+
+    def state(self) -> dict:
+        return {
+            "window_seconds": self.window_seconds,
+            "consumed": self.consumed,
+            "windows": {
+                str(start): {
+                    "n_rows": window["n_rows"],
+                    "counts": {
+                        column: counts.tolist()
+                        for column, counts in window["counts"].items()
+                    },
+                }
+                for start, window in self.windows.items()
+            },
+        }
+
+    def load_state(self, state: dict) -> None:
+        if state.get("window_seconds") != self.window_seconds:
+            raise ValueError("Состояние монитора посчитано с другим размером окна")
+        self.consumed = state["consumed"]
+        for start, window in state["windows"].items():
+            restored = self._window(int(start))
+            restored["n_rows"] = window["n_rows"]
+            for column, counts in window["counts"].items():
+                restored["counts"][column] += np.asarray(counts, dtype=np.int64)
+
+
+def current_champion() -> Optional[str]:
+    from src.models.registry import get_champion
+
+    champion = get_champion()
+    return champion["id"] if champion else None
+
+
+# Эталон привязан к чемпиону реестра: распределение вероятностей зависит от
+# модели, поэтому при смене чемпиона эталон строится заново. В "model" - версия,
+# которая реально загрузилась (load_champion может откатиться на следующую)
+def build_reference_from_splits(champion: Optional[str] = None) -> dict:
+    from src.data.cleaning import FILL_VALUES_PATH, load_fill_values
+    from src.data.splits import load_splits
+    from src.models.registry import load_champion
+
+    X_train, _, _, _ = load_splits(copy=True)
+    proba, model_id = None, None
+    try:
+        model, entry = load_champion()
+        proba = model.predict_proba(X_train)[:, 1]
+        model_id = entry["id"]
+    except (OSError, ValueError) as error:
+        print(f"Эталон предсказаний не построен: {error}", file=sys.stderr)
+    fill_values = (
+        load_fill_values(FILL_VALUES_PATH) if os.path.exists(FILL_VALUES_PATH) else {}
+    )
+    fill_values = {
+        column: value
+        for column, value in fill_values.items()
+        if value is not None and not np.isnan(value)
+    }
+    reference = build_reference(X_train, proba, fill_values)
+    reference["champion"] = champion
+    reference["model"] = model_id
+    return reference
+
+
+def run(
+    reference_path: str = DRIFT_REFERENCE_PATH,
+    state_path: str = DRIFT_STATE_PATH,
+    verdicts_path: str = DRIFT_VERDICTS_PATH,
+    log_dir: str = PREDICTION_LOG_DIR,
+) -> list[dict]:
+    champion = current_champion()
+    reference = load_json(reference_path) if os.path.exists(reference_path) else None
+    rebuilt = reference is None or reference.get("champion") != champion
+    if rebuilt:
+        if reference is not None:
+            print(
+                f"Чемпион сменился ({reference.get('champion')} -> {champion}), "
+                "эталон дрейфа построен заново",
+                file=sys.stderr,
+            )
+        reference = build_reference_from_splits(champion)
+        save_json(reference, reference_path)
+
+    monitor = DriftMonitor(reference)
+    if os.path.exists(state_path):
+        state = load_json(state_path)
+        if rebuilt:
+            # Счётчики окон посчитаны по корзинам прежнего эталона, отметка
+            # прочитанного лога остаётся
+            state["windows"] = {}
+        monitor.load_state(state)
+    monitor.consume_logs(log_dir)
+    verdicts = monitor.close_windows()
+
+    os.makedirs(os.path.dirname(verdicts_path) or ".", exist_ok=True)
+    with open(verdicts_path, "a") as file:
+        for verdict in verdicts:
+            if verdict["complete"]:
+                file.write(json.dumps(verdict) + "\n")
+    save_json(monitor.state(), state_path)
+    return verdicts
+
+
+if __name__ == "__main__":
+    # В stdout - только вердикты по одному JSON на строку, их разбирает DAG
+    for verdict in run():
+        print(json.dumps(verdict))
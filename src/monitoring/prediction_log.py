@@ -0,0 +1,229 @@
+import glob
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.ipc as ipc
+from src.features.build_features import FEATURE_NAMES
+from src.monitoring.metrics import PREDICTION_LOG_DROPPED, PREDICTION_LOG_WRITTEN
+
+PREDICTION_LOG_ENABLED = os.environ.get("PREDICTION_LOG", "1") == "1"
+PREDICTION_LOG_DIR = os.environ.get("PREDICTION_LOG_DIR", "logs/predictions")
+# Ёмкость кольцевого буфера в строках. Если писатель не успевает, новые записи
+# отбрасываются со счётчиком prediction_log_dropped_total, запрос не ждёт
+PREDICTION_LOG_CAPACITY = int(os.environ.get("PREDICTION_LOG_CAPACITY", 100_000))
+PREDICTION_LOG_FLUSH_ROWS = int(os.environ.get("PREDICTION_LOG_FLUSH_ROWS", 4096))
+PREDICTION_LOG_FLUSH_SECONDS = float(os.environ.get("PREDICTION_LOG_FLUSH_SECONDS", 1))
+# Файл закрывается и становится виден читателям по числу строк или по времени
+PREDICTION_LOG_ROTATE_ROWS = int(
+    os.environ.get("PREDICTION_LOG_ROTATE_ROWS", 1_000_000)
+)
+PREDICTION_LOG_ROTATE_SECONDS = float(
+    os.environ.get("PREDICTION_LOG_ROTATE_SECONDS", 3600)
+)
+
+# Колонки лога помимо FEATURE_NAMES
+LOG_PROBABILITY = "probability"
+LOG_TIMESTAMP = "timestamp"
+LOG_LATENCY = "latency_seconds"
+LOG_MODEL = "model"
+
+SCHEMA = pa.schema(
+    [pa.field(name, pa.float32()) for name in FEATURE_NAMES]
+    + [
+        pa.field(LOG_PROBABILITY, pa.float32()),
+        pa.field(LOG_LATENCY, pa.float32()),
+        pa.field(LOG_TIMESTAMP, pa.float64()),
+        pa.field(LOG_MODEL, pa.dictionary(pa.int16(), pa.string())),
+    ]
+)
+
+
+# Лог предсказаний: обработчик кладёт строки в предвыделенный кольцевой буфер
+# (копирование среза NumPy под коротким локом), фоновый поток забирает их
+# пачками и дописывает в файл Arrow IPC со сжатием zstd. Незакрытый файл имеет
+# суффикс .part, после ротации он переименовывается в .feather
+class PredictionLog:
+    def __init__(
+        self,
+        log_dir: str = PREDICTION_LOG_DIR,
+        capacity: int = PREDICTION_LOG_CAPACITY,
+        flush_rows: int = PREDICTION_LOG_FLUSH_ROWS,
+        flush_seconds: float = PREDICTION_LOG_FLUSH_SECONDS,
+        rotate_rows: int = PREDICTION_LOG_ROTATE_ROWS,
+        rotate_seconds: float = PREDICTION_LOG_ROTATE_SECONDS,
+    ):
+        self.log_dir = log_dir
+        self.capacity = capacity
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.rotate_rows = rotate_rows
+        self.rotate_seconds = rotate_seconds
+
+        self.features = np.empty((capacity, len(FEATURE_NAMES)), np.float32)
+        self.probability = np.empty(capacity, np.float32)
+        self.latency = np.empty(capacity, np.float32)
+        self.timestamp = np.empty(capacity, np.float64)
+        self.model = np.empty(capacity, np.int16)
+        self.models = []
+        self.head = 0
+        self.size = 0
+        self.dropped = 0
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.thread = None
+        self.writer = None
+        self.path = None
+        self.file_rows = 0
+        self.file_opened = 0.0
+        self.n_files = 0
+
+    def start(self) -> None:
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.stopping = False
+        self.thread = threading.Thread(
+            target=self._run, name="prediction-log", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+        self.stopping = True
+        self.wakeup.set()
+        self.thread.join()
+        self.thread = None
+
+    def push(self, matrix, probability, latency: float, model: str) -> int:
+        n_rows = len(probability)
+        timestamp = time.time()
+        with self.lock:
+            free = self.capacity - self.size
+            if n_rows > free:
+                self.dropped += n_rows - free
+                PREDICTION_LOG_DROPPED.inc(n_rows - free)
+                n_rows = free
+            if n_rows == 0:
+                return 0
+            if model not in self.models:
+                self.models.append(model)
+            model_index = self.models.index(model)
+
+            index = (self.head + self.size + np.arange(n_rows)) % self.capacity
+            self.features[index] = matrix[:n_rows]
+            self.probability[index] = probability[:n_rows]
+            self.latency[index] = latency
+            self.timestamp[index] = timestamp
+            self.model[index] = model_index
+            self.size += n_rows
+            pending = self.size
+        if pending >= self.flush_rows:
+            self.wakeup.set()
+        return n_rows
+
+    def _drain(self):
+        with self.lock:
+            if self.size == 0:
+                return None
+            index = (self.head + np.arange(self.size)) % self.capacity
+            rows = (
+                self.features[index],
+                self.probability[index],
+                self.latency[index],
+                self.timestamp[index],
+                self.model[index],
+                list(self.models),
+            )
+            self.head = (self.head + self.size) % self.capacity
+            self.size = 0
+        return rows
+
+    def _table(self, rows) -> pa.Table:
+        features, probability, latency, timestamp, model, models = rows
+        columns = [pa.array(features[:, i]) for i in range(len(FEATURE_NAMES))]
+        columns += [
+            pa.array(probability),
+            pa.array(latency),
+            pa.array(timestamp),
+            pa.DictionaryArray.from_arrays(
+                pa.array(model), pa.array(models, pa.string())
+            ),
+        ]
+        return pa.Table.from_arrays(columns, schema=SCHEMA)
+
+    def _open(self) -> None:
+        self.n_files += 1
+        name = (
+            f"predictions-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+            f"-{self.n_files:04d}"
+        )
+        self.path = os.path.join(self.log_dir, name)
+        options = ipc.IpcWriteOptions(compression="zstd")
+        self.writer = ipc.new_file(f"{self.path}.part", SCHEMA, options=options)
+        self.file_rows = 0
+        self.file_opened = time.monotonic()
+
+    def _rotate(self) -> None:
+        if self.writer is None:
+            return
+        self.writer.close()
+        os.replace(f"{self.path}.part", f"{self.path}.feather")
+        self.writer = None
+
+    def flush(self) -> int:
+        rows = self._drain()
+        if rows is None:
+            return 0
+        table = self._table(rows)
+        if self.writer is None:
+            self._open()
+        self.writer.write_table(table)
+        self.file_rows += table.num_rows
+        PREDICTION_LOG_WRITTEN.inc(table.num_rows)
+        return table.num_rows
+
+    def _rotate_if_needed(self) -> None:
+        # По времени файл закрывается и без нового трафика
+        if self.writer is not None and (
+            self.file_rows >= self.rotate_rows
+            or time.monotonic() - self.file_opened >= self.rotate_seconds
+        ):
+            self._rotate()
+
+    def _run(self) -> None:
+        while not self.stopping:
+            self.wakeup.wait(self.flush_seconds)
+            self.wakeup.clear()
+            try:
+                self.flush()
+                self._rotate_if_needed()
+            except Exception as error:
+                # Ошибка записи не должна останавливать сервис и сам писатель
+                print(f"Ошибка записи лога предсказаний: {error}")
+        self.flush()
+        self._rotate()
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "pending": self.size,
+            "dropped": self.dropped,
+        }
+
+
+def log_files(log_dir: str = PREDICTION_LOG_DIR) -> list[str]:
+    return sorted(glob.glob(os.path.join(log_dir, "*.feather")))
+
+
+# Чтение закрытых файлов лога одним DataFrame, например для дообучения
+def read_prediction_logs(log_dir: str = PREDICTION_LOG_DIR) -> pd.DataFrame:
+    paths = log_files(log_dir)
+    if not paths:
+        return pd.DataFrame(columns=SCHEMA.names)
+    tables = [feather.read_table(path, memory_map=True) for path in paths]
+    return pa.concat_tables(tables).to_pandas()
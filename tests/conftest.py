@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+import src.api.app as api
+from src.features.build_features import FEATURE_NAMES
+from src.models.pipeline import build_pipeline
+from src.models.train_pipeline import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+
+RAW_DATA_PATH = "data/raw/UCI_Credit_Card.csv"
+TARGET = "default.payment.next.month"
+
+
+# Сырой датасет читается с диска один раз за запуск тестов
+@pytest.fixture(scope="session")
+def raw_data() -> pd.DataFrame:
+    return pd.read_csv(RAW_DATA_PATH)
+
+
+# Первые nrows строк сырого датасета (все, если не задано). Тесты меняют и
+# дочищают выборку на месте, поэтому каждый вызов отдаёт копию
+@pytest.fixture
+def raw_sample(raw_data):
+    def sample(nrows: int = None) -> pd.DataFrame:
+        return raw_data.iloc[:nrows].copy()
+
+    return sample
+
+
+# Весь датасет после basic_clean_data, общий для сессии: только для чтения
+@pytest.fixture(scope="session")
+def clean_data(raw_data) -> pd.DataFrame:
+    from src.data.make_dataset import basic_clean_data
+
+    return basic_clean_data(raw_data.copy(), "")
+
+
+@pytest.fixture
+def records(raw_sample) -> list[dict]:
+    return raw_sample(5)[FEATURE_NAMES].to_dict("records")
+
+
+@pytest.fixture
+def client(monkeypatch, raw_sample):
+    data = raw_sample(500)
+    pipeline = build_pipeline(
+        NUMERIC_FEATURES, CATEGORICAL_FEATURES, "LogisticRegression"
+    ).fit(data[FEATURE_NAMES], data[TARGET])
+    # Чемпион подставляется как загруженный мастером gunicorn, лог и кэш
+    # предсказаний не пишутся
+    monkeypatch.setattr(api, "champion", (pipeline, {"id": "Test:1", "sha256": ""}))
+    monkeypatch.setattr(api, "model", None)
+    monkeypatch.setattr(api, "model_info", None)
+    monkeypatch.setattr(api, "prediction_log", None)
+    monkeypatch.setattr(api, "prediction_cache", None)
+    with TestClient(api.app) as client:
+        yield client
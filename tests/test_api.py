@@ -0,0 +1,64 @@
+import json
+from prometheus_client import REGISTRY
+import src.api.app as api
+import src.api.backends as backends
+from src.api.limits import BodySizeLimitMiddleware
+
+
+def body_limits() -> dict:
+    return next(
+        middleware.options["limits"]
+        for middleware in api.app.user_middleware
+        if middleware.cls is BodySizeLimitMiddleware
+    )
+
+
+def serialized_requests() -> float:
+    return REGISTRY.get_sample_value(
+        "prediction_stage_seconds_count", {"stage": "serialization"}
+    )
+
+
+def test_batch_body_rejected_before_parsing(client, records, monkeypatch):
+    body = json.dumps({"records": records * 20}).encode()
+    monkeypatch.setitem(body_limits(), "/predict/batch", len(body) - 1)
+
+    response = client.post(
+        "/predict/batch", content=body, headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 413
+
+    # Тело без Content-Length отклоняется по мере чтения
+    chunks = (body[i : i + 1024] for i in range(0, len(body), 1024))
+    response = client.post(
+        "/predict/batch", content=chunks, headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 413
+
+    monkeypatch.setitem(body_limits(), "/predict/batch", len(body))
+    chunks = (body[i : i + 1024] for i in range(0, len(body), 1024))
+    response = client.post(
+        "/predict/batch", content=chunks, headers={"Content-Type": "application/json"}
+    )
+    assert response.json()["count"] == len(records) * 20
+
+
+def test_early_responses_are_closed_in_metrics(client, records, monkeypatch):
+    before = serialized_requests()
+    assert client.post("/predict/batch", json={}).status_code == 422
+    monkeypatch.setattr(api, "MAX_BATCH_SIZE", 2)
+    assert client.post("/predict/batch", json={"records": records}).status_code == 413
+    monkeypatch.setattr(api, "model", None)
+    assert client.post("/predict", json=records[0]).status_code == 503
+    assert serialized_requests() == before + 3
+
+
+def test_unverified_onnx_backend_falls_back_to_sklearn(client, records, monkeypatch):
+    # У тестового чемпиона нет ONNX-вариантов, бэкенд onnx_best не создаётся
+    def create_backend(pipeline, backend_name="onnx_best", entry=None):
+        return backends.create_backend(pipeline, backend_name, entry)
+
+    monkeypatch.setattr(api, "create_backend", create_backend)
+    api.load_model()
+    assert api.model.name == "sklearn"
+    assert client.post("/predict", json=records[0]).status_code == 200
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from skl2onnx import to_onnx
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from src.api.backends import (
+    OnnxBackend,
+    SklearnBackend,
+    check_backend,
+    create_backend,
+    reference_matrix,
+    save_reference,
+)
+from src.features.build_features import FEATURE_NAMES
+
+
+@pytest.fixture
+def data(raw_sample):
+    return raw_sample(500)
+
+
+@pytest.fixture
+def matrix(data):
+    return data[FEATURE_NAMES].to_numpy(dtype=np.float32)
+
+
+def fit_pipeline(data):
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("num", StandardScaler(), ["LIMIT_BAL", "AGE", "BILL_AMT1", "PAY_AMT1"]),
+            ("cat", OneHotEncoder(handle_unknown="ignore"), ["EDUCATION", "PAY_0"]),
+        ]
+    )
+    pipeline = Pipeline(
+        steps=[
+            ("preprocessor", preprocessor),
+            ("classifier", LogisticRegression(max_iter=500)),
+        ]
+    )
+    return pipeline.fit(data[FEATURE_NAMES], data["default.payment.next.month"])
+
+
+def test_onnx_backend_matches_sklearn(tmp_path, data, matrix):
+    pipeline = fit_pipeline(data)
+    onnx_path = tmp_path / "model.onnx"
+    onnx_model = to_onnx(
+        pipeline, data[FEATURE_NAMES].astype(np.float32)[:1], target_opset=13
+    )
+    onnx_path.write_bytes(onnx_model.SerializeToString())
+
+    backend = OnnxBackend("onnx", str(onnx_path))
+    max_diff = check_backend(backend, SklearnBackend(pipeline), matrix, 1e-4)
+    assert max_diff < 1e-4
+
+    # Повторный вызов с меньшим пакетом переиспользует тот же буфер
+    np.testing.assert_allclose(
+        backend.predict_proba(matrix[:3]), backend.predict_proba(matrix)[:3]
+    )
+
+
+def test_check_backend_rejects_divergent_model(data, matrix):
+    class ConstantBackend:
+        name = "constant"
+
+        def predict_proba(self, matrix):
+            return np.full(len(matrix), 0.5)
+
+    with pytest.raises(ValueError):
+        check_backend(
+            ConstantBackend(), SklearnBackend(fit_pipeline(data)), matrix, 0.01
+        )
+
+
+def test_backends_use_stored_reference_without_raw_data(
+    tmp_path, monkeypatch, data, matrix
+):
+    pipeline = fit_pipeline(data)
+    path = save_reference(matrix, str(tmp_path / "model.reference.npy"))
+    entry = {"id": "LogisticRegression:1", "reference": {"path": path}}
+    # Хост сервиса без data/raw
+    monkeypatch.chdir(tmp_path)
+    np.testing.assert_array_equal(reference_matrix(entry), matrix)
+    assert create_backend(pipeline, "sklearn", entry).compiled_preprocessor is not None
+    assert create_backend(pipeline, "sklearn", {}).compiled_preprocessor is None
+    with pytest.raises(ValueError):
+        create_backend(pipeline, "onnx", entry)
@@ -0,0 +1,66 @@
+import asyncio
+import time
+import pytest
+from src.api.batching import MicroBatcher
+
+
+def test_concurrent_requests_are_scored_together():
+    calls = []
+
+    def predict_fn(items):
+        calls.append(len(items))
+        return [item * 2 for item in items]
+
+    async def run():
+        batcher = MicroBatcher(predict_fn, max_batch_size=8, max_latency_ms=20)
+        await batcher.start()
+        results = await asyncio.gather(*[batcher.submit(i) for i in range(20)])
+        await batcher.stop()
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(run())
+
+    assert results == [i * 2 for i in range(20)]
+    assert max(calls) == 8
+    assert sum(calls) == 20
+    assert stats["requests"] == 20
+    assert stats["batches"] == len(calls)
+
+
+def test_errors_are_propagated_to_callers():
+    def predict_fn(items):
+        raise RuntimeError("model failed")
+
+    async def run():
+        batcher = MicroBatcher(predict_fn, max_batch_size=4, max_latency_ms=1)
+        await batcher.start()
+        results = await asyncio.gather(
+            *[batcher.submit(i) for i in range(3)], return_exceptions=True
+        )
+        await batcher.stop()
+        return results
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+
+
+def test_stop_fails_pending_requests():
+    def predict_fn(items):
+        time.sleep(0.2)
+        return items
+
+    async def run():
+        batcher = MicroBatcher(predict_fn, max_batch_size=2, max_latency_ms=1)
+        await batcher.start()
+        # Первый пакет считается моделью, остальные запросы ждут в очереди
+        requests = [asyncio.create_task(batcher.submit(i)) for i in range(5)]
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        await batcher.stop()
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        with pytest.raises(RuntimeError):
+            await batcher.submit(5)
+        return results, time.perf_counter() - started
+
+    results, seconds = asyncio.run(run())
+    assert all(str(result) == "batcher stopped" for result in results)
+    assert seconds < 0.1
@@ -0,0 +1,72 @@
+import os
+import time
+import joblib
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from src.features.build_features import FEATURE_NAMES
+from src.models.benchmark import compare, discover_cases, run_case, run_isolated
+from src.models.registry import register_model
+
+
+def test_run_case_reports_latency_and_quality(tmp_path, raw_sample):
+    data = raw_sample(500)
+    pipeline = Pipeline(
+        [
+            ("preprocessor", ColumnTransformer([("num", StandardScaler(), ["AGE"])])),
+            ("classifier", LogisticRegression()),
+        ]
+    ).fit(data[FEATURE_NAMES], data["default.payment.next.month"])
+    path = str(tmp_path / "model.pkl")
+    joblib.dump(pipeline, path)
+    registry_path = str(tmp_path / "registry.json")
+    register_model("LogisticRegression", path, {"best_f1": 0.1}, registry_path)
+
+    (case,) = discover_cases(registry_path)
+    matrix = data[FEATURE_NAMES].to_numpy(dtype=np.float32)
+    result = run_case(
+        case, matrix, data["default.payment.next.month"].to_numpy(), [1, 64]
+    )
+    assert result["variant"] == "sklearn"
+    assert 0.5 < result["roc_auc"] <= 1
+    assert result["latency"]["64"]["calls"] > 0
+    latency = result["latency"]["1"]
+    assert 0 < latency["p50_ms"] <= latency["p95_ms"] <= latency["p99_ms"]
+
+
+def test_compare_flags_regressions():
+    def benchmark(p50):
+        return {
+            "results": [
+                {
+                    "model": "RandomForestClassifier:1",
+                    "variant": "forest",
+                    "latency": {"1": {"p50_ms": p50, "p99_ms": 2.0}},
+                }
+            ]
+        }
+
+    assert compare(benchmark(1.0), benchmark(1.1), max_regression=0.2) == []
+    (regression,) = compare(benchmark(1.0), benchmark(1.5), max_regression=0.2)
+    assert "RandomForestClassifier:1/forest batch=1 p50_ms" in regression
+
+
+def _exit_without_result(queue, case, matrix, y, batch_sizes):
+    os._exit(3)
+
+
+def _hang(queue, case, matrix, y, batch_sizes):
+    time.sleep(60)
+
+
+def test_run_isolated_records_dead_child():
+    case = {"model": "LogisticRegression:1", "variant": "sklearn", "path": ""}
+    matrix = np.zeros((1, len(FEATURE_NAMES)), dtype=np.float32)
+    args = (case, matrix, np.zeros(1), [1])
+
+    result = run_isolated(*args, target=_exit_without_result)
+    assert result["error"] == "Процесс замера завершился с кодом 3"
+    result = run_isolated(*args, timeout=1, target=_hang)
+    assert result["variant"] == "sklearn" and "не завершился" in result["error"]
@@ -0,0 +1,71 @@
+import uuid
+import joblib
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from src.features.build_features import FEATURE_NAMES
+from src.models.bulk_score import score_file
+from src.models.registry import register_model
+
+
+def register_pipeline(tmp_path, data) -> tuple:
+    pipeline = Pipeline(
+        [
+            (
+                "preprocessor",
+                ColumnTransformer(
+                    [("num", SimpleImputer(strategy="median"), ["AGE", "LIMIT_BAL"])]
+                ),
+            ),
+            ("classifier", LogisticRegression()),
+        ]
+    ).fit(data[FEATURE_NAMES], data["default.payment.next.month"])
+    model_path = str(tmp_path / "model.pkl")
+    joblib.dump(pipeline, model_path)
+    registry_path = str(tmp_path / "registry.json")
+    register_model("LogisticRegression", model_path, {"best_f1": 0.1}, registry_path)
+    return pipeline, registry_path
+
+
+def test_score_file_preserves_order(tmp_path, raw_sample):
+    frame = raw_sample(1000)
+    pipeline, registry_path = register_pipeline(tmp_path, frame)
+    frame.loc[10, "AGE"] = np.nan
+    input_path = str(tmp_path / "applicants.csv")
+    frame.to_csv(input_path, index=False)
+    output_path = str(tmp_path / "scores.feather")
+
+    stats = score_file(
+        input_path, output_path, registry_path, workers=2, chunk_rows=300
+    )
+    assert stats["rows"] == len(frame)
+
+    scores = feather.read_table(output_path).to_pandas()
+    assert scores["row"].tolist() == list(range(len(frame)))
+    assert scores["ID"].tolist() == frame["ID"].tolist()
+    expected = pipeline.predict_proba(frame[FEATURE_NAMES].astype(np.float32))[:, 1]
+    np.testing.assert_allclose(scores["probability"], expected, atol=1e-6)
+
+
+def test_score_file_keeps_id_type(tmp_path, raw_sample):
+    frame = raw_sample(1000)
+    _, registry_path = register_pipeline(tmp_path, frame)
+    frame["ID"] = [str(uuid.UUID(int=i)) for i in range(len(frame))]
+    inputs = {
+        "applicants.csv": lambda path: frame.to_csv(path, index=False),
+        "applicants.parquet": lambda path: frame.to_parquet(path, index=False),
+    }
+    for name, write in inputs.items():
+        input_path = str(tmp_path / name)
+        write(input_path)
+        output_path = str(tmp_path / f"{name}.scores.parquet")
+        score_file(input_path, output_path, registry_path, workers=1, chunk_rows=300)
+
+        scores = pq.read_table(output_path)
+        assert pa.types.is_string(scores.schema.field("ID").type)
+        assert scores.column("ID").to_pylist() == frame["ID"].tolist()
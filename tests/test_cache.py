@@ -0,0 +1,84 @@
+import sqlite3
+import time
+import pytest
+from src.api.app import ClientData
+from src.api.cache import FileCache, MemoryCache, cache_key
+
+
+@pytest.fixture
+def rows(raw_sample) -> list[dict]:
+    return (
+        raw_sample(3)
+        .drop(columns=["ID", "default.payment.next.month"])
+        .to_dict("records")
+    )
+
+
+@pytest.fixture
+def clients(rows) -> list:
+    return [ClientData(**row) for row in rows]
+
+
+def test_cache_key_is_canonical(rows, clients):
+    same_client = ClientData(**{name: str(value) for name, value in rows[0].items()})
+    assert cache_key(clients[0], "Model:1") == cache_key(same_client, "Model:1")
+    assert cache_key(clients[0], "Model:1") != cache_key(clients[0], "Model:2")
+    assert cache_key(clients[0], "Model:1") != cache_key(clients[1], "Model:1")
+
+
+def test_memory_cache_lru_and_ttl(clients):
+    cache = MemoryCache(max_entries=2, ttl_seconds=60)
+    keys = [cache_key(client, "Model:1") for client in clients]
+    cache.put(keys[0], 0.1, "Model:1")
+    cache.put(keys[1], 0.2, "Model:1")
+    assert cache.get(keys[0]) == 0.1
+    cache.put(keys[2], 0.3, "Model:1")
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == 0.1
+
+    expired = MemoryCache(ttl_seconds=0)
+    expired.put(keys[0], 0.1, "Model:1")
+    assert expired.get(keys[0]) is None
+
+
+@pytest.mark.parametrize("model_id, expected", [("Model:1", 0.5), ("Model:2", None)])
+def test_file_cache_is_shared_and_invalidated(tmp_path, clients, model_id, expected):
+    path = str(tmp_path / "cache.sqlite")
+    key = cache_key(clients[0], "Model:1")
+    FileCache(path).put(key, 0.5, "Model:1")
+    # Второй экземпляр - как другой воркер с тем же файлом
+    other_worker = FileCache(path)
+    other_worker.invalidate(model_id)
+    assert other_worker.get(key) == expected
+
+
+def test_file_cache_does_not_wait_for_lock(tmp_path, clients):
+    path = str(tmp_path / "cache.sqlite")
+    cache = FileCache(path)
+    keys = [cache_key(client, "Model:1") for client in clients]
+    cache.put(keys[0], 0.5, "Model:1")
+
+    # Другой воркер держит блокировку записи
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    started = time.perf_counter()
+    cache.put(keys[1], 0.7, "Model:1")
+    assert cache.get(keys[0]) == 0.5
+    assert time.perf_counter() - started < 0.1
+    writer.execute("ROLLBACK")
+    assert cache.get(keys[1]) is None
+
+
+def test_file_cache_size_survives_lock(tmp_path, clients, monkeypatch):
+    cache = FileCache(str(tmp_path / "cache.sqlite"))
+    assert cache.size() == 0
+    cache.put(cache_key(clients[0], "Model:1"), 0.5, "Model:1")
+    assert cache.size() == 1
+
+    class LockedConnection:
+        def execute(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+    # Файл занят другим воркером: отдаётся последний известный размер
+    monkeypatch.setattr(cache, "_connection", LockedConnection)
+    assert cache.size() == 1
@@ -1,13 +1,30 @@
-from src.data.make_dataset import load_and_split_data
-
-
-def test_valid_path():
-    assert load_and_split_data("data/raw/UCI_Credit_Card.csv") == True
-
-
-def test_invalid_path():
-    assert load_and_split_data("data/models/UCI_Credit_Card.csv") == False
-
-
-def test_invalid_data():
-    assert load_and_split_data("data/models/UCI_Credit_Card.csv") == False
+import numpy as np
+from src.data.cleaning import load_fill_values, save_fill_values
+from src.data.make_dataset import basic_clean_data, load_and_split_data
+
+
+def test_valid_path():
+    assert load_and_split_data("data/raw/UCI_Credit_Card.csv") == True
+
+
+def test_invalid_path():
+    assert load_and_split_data("data/models/UCI_Credit_Card.csv") == False
+
+
+def test_invalid_data():
+    assert load_and_split_data("data/models/UCI_Credit_Card.csv") == False
+
+
+def test_clean_data_with_persisted_fill_values(tmp_path, raw_sample):
+    data = raw_sample(1000)
+    data.loc[[1, 5], "AGE"] = np.nan
+    median_age = data["AGE"].median()
+
+    cleaned = basic_clean_data(data.copy(), "")
+    assert cleaned.loc[[1, 5], "AGE"].tolist() == [median_age, median_age]
+
+    path = save_fill_values({"AGE": 30.0, "LIMIT_BAL": np.nan}, tmp_path / "fill.json")
+    fill_values = load_fill_values(path)
+    cleaned = basic_clean_data(data, "", fill_values)
+    assert cleaned is data
+    assert cleaned.loc[[1, 5], "AGE"].tolist() == [30.0, 30.0]
@@ -0,0 +1,81 @@
+import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+import src.monitoring.drift as drift
+from src.features.build_features import FEATURE_NAMES
+from src.monitoring.drift import build_reference, run, save_json
+
+DAY = 24 * 3600
+
+
+def write_log(path, frame, start):
+    frame = frame[FEATURE_NAMES].copy()
+    frame["probability"] = np.linspace(0, 1, len(frame), dtype=np.float32)
+    frame["timestamp"] = start + np.linspace(0, DAY - 1, len(frame))
+    feather.write_feather(pa.Table.from_pandas(frame, preserve_index=False), path)
+
+
+def test_drift_verdicts_per_window(tmp_path, monkeypatch, clean_data):
+    monkeypatch.setattr(drift, "current_champion", lambda: None)
+    reference = build_reference(clean_data[:20000], np.linspace(0, 1, 20000))
+    save_json(reference, tmp_path / "reference.json")
+    shifted = clean_data[20000:].copy()
+    shifted[["LIMIT_BAL", "AGE"] + [f"BILL_AMT{i}" for i in range(1, 7)]] *= 3
+    shifted[[f"PAY_AMT{i}" for i in range(1, 7)]] += 10000
+
+    paths = {
+        "reference": tmp_path / "reference.json",
+        "state": tmp_path / "state.json",
+        "verdicts": tmp_path / "verdicts.jsonl",
+    }
+
+    def check():
+        return run(*[str(path) for path in paths.values()], str(tmp_path / "logs"))
+
+    (tmp_path / "logs").mkdir()
+    write_log(tmp_path / "logs" / "0.feather", clean_data[20000:], 0)
+    write_log(tmp_path / "logs" / "1.feather", shifted, DAY)
+    verdicts = check()
+    assert [verdict["drift_detected"] for verdict in verdicts] == [False, True]
+    assert "LIMIT_BAL" in verdicts[1]["drifted_features"]
+    assert not verdicts[1]["complete"]
+
+    # Повторный запуск читает только новые файлы и закрывает окно со сдвигом
+    write_log(tmp_path / "logs" / "2.feather", clean_data[20000:], 2 * DAY)
+    verdicts = check()
+    assert [verdict["window_start"] for verdict in verdicts] == [DAY, 2 * DAY]
+    assert verdicts[0]["n_rows"] == len(shifted) and verdicts[0]["drift_detected"]
+    with open(paths["verdicts"]) as file:
+        assert [json.loads(line)["window_start"] for line in file] == [0, DAY]
+    with open(paths["state"]) as file:
+        assert json.load(file)["consumed"][1] == "2.feather"
+
+
+def test_reference_rebuilt_when_champion_changes(tmp_path, monkeypatch, clean_data):
+    references = []
+
+    def build_reference_from_splits(champion):
+        references.append(champion)
+        reference = build_reference(clean_data[:20000], np.linspace(0, 1, 20000))
+        reference["champion"] = champion
+        return reference
+
+    monkeypatch.setattr(
+        drift, "build_reference_from_splits", build_reference_from_splits
+    )
+    paths = [str(tmp_path / name) for name in ("reference.json", "state.json")]
+    paths += [str(tmp_path / "verdicts.jsonl"), str(tmp_path / "logs")]
+    (tmp_path / "logs").mkdir()
+    write_log(tmp_path / "logs" / "0.feather", clean_data[20000:], 0)
+
+    monkeypatch.setattr(drift, "current_champion", lambda: "LogisticRegression:1")
+    assert run(*paths)[0]["n_rows"] == len(clean_data) - 20000
+    assert run(*paths)[0]["n_rows"] == len(clean_data) - 20000
+    assert references == ["LogisticRegression:1"]
+
+    # Новый чемпион: эталон строится заново, счётчики старого эталона
+    # сбрасываются, уже прочитанный лог не читается повторно
+    monkeypatch.setattr(drift, "current_champion", lambda: "LogisticRegression:2")
+    assert run(*paths) == []
+    assert references == ["LogisticRegression:1", "LogisticRegression:2"]
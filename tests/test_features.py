@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from src.api.app import ClientData
+from src.features.build_features import (
+    FEATURE_NAMES,
+    columns_to_matrix,
+    records_to_matrix,
+)
+from src.features.vectorizer import check_compiled, compile_preprocessor
+
+
+@pytest.fixture
+def x_test(raw_sample):
+    return raw_sample(50)[FEATURE_NAMES]
+
+
+def test_records_and_columns_give_same_matrix(x_test):
+    records = [ClientData(**row) for row in x_test.to_dict(orient="records")]
+    columns = {name: x_test[name].tolist() for name in FEATURE_NAMES}
+
+    from_records = records_to_matrix(records)
+    from_columns = columns_to_matrix(columns)
+
+    assert from_records.dtype == np.float32
+    assert from_records.flags["C_CONTIGUOUS"]
+    assert from_records.shape == (len(x_test), len(FEATURE_NAMES))
+    np.testing.assert_array_equal(from_records, from_columns)
+    np.testing.assert_array_equal(from_records, x_test.to_numpy(dtype=np.float32))
+
+
+def test_columns_without_feature_are_rejected():
+    columns = {name: [0.0] for name in FEATURE_NAMES[1:]}
+    with pytest.raises(ValueError):
+        columns_to_matrix(columns)
+
+
+def test_compiled_preprocessor_is_bit_identical(x_test):
+    numeric_transformer = Pipeline(
+        steps=[
+            ("imputer", SimpleImputer(strategy="median")),
+            ("scaler", StandardScaler()),
+        ]
+    )
+    categorical_transformer = Pipeline(
+        steps=[
+            ("imputer", SimpleImputer(strategy="constant", fill_value=-1)),
+            ("onehot", OneHotEncoder(handle_unknown="ignore")),
+        ]
+    )
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("num", numeric_transformer, ["LIMIT_BAL", "AGE", "BILL_AMT1", "PAY_AMT1"]),
+            ("cat", categorical_transformer, ["EDUCATION", "MARRIAGE", "PAY_0"]),
+        ]
+    ).fit(x_test)
+
+    matrix = x_test.to_numpy(dtype=np.float32)
+    matrix[::3, FEATURE_NAMES.index("AGE")] = np.nan
+    matrix[::4, FEATURE_NAMES.index("PAY_0")] = np.nan
+    matrix[::5, FEATURE_NAMES.index("EDUCATION")] = 42
+
+    compiled = compile_preprocessor(preprocessor)
+    assert check_compiled(compiled, preprocessor, matrix)
@@ -0,0 +1,87 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from src.features.build_features import FEATURE_NAMES
+from src.models.forest import compact_pipeline, compile_forest, export_compact
+from src.models.registry import load_champion, register_model
+
+
+@pytest.fixture
+def dataset(raw_sample) -> tuple:
+    data = raw_sample(2000)
+    return (
+        data[FEATURE_NAMES].to_numpy(dtype=np.float64),
+        data["default.payment.next.month"].to_numpy(),
+    )
+
+
+@pytest.mark.parametrize(
+    "classifier",
+    [
+        RandomForestClassifier(n_estimators=20, random_state=0),
+        # max_leaf_nodes строит деревья в ширину, узлы перенумеровываются
+        RandomForestClassifier(n_estimators=10, max_leaf_nodes=50, random_state=0),
+        GradientBoostingClassifier(n_estimators=30, max_depth=4, random_state=0),
+    ],
+)
+def test_compiled_forest_matches_sklearn(classifier, dataset):
+    X, y = dataset
+    classifier.fit(X, y)
+    forest = compile_forest(classifier)
+    np.testing.assert_allclose(
+        forest.predict_proba(X), classifier.predict_proba(X), atol=1e-6
+    )
+    # Одна строка и пачка дают одинаковый результат
+    np.testing.assert_allclose(
+        forest.predict_proba(X[:1]), forest.predict_proba(X)[:1], atol=1e-12
+    )
+
+    half = compile_forest(classifier, leaf_dtype="float16")
+    assert half.nbytes < forest.nbytes
+    np.testing.assert_allclose(
+        half.predict_proba(X), classifier.predict_proba(X), atol=1e-2
+    )
+
+
+def test_compile_forest_rejects_other_models(dataset):
+    X, y = dataset
+    with pytest.raises(ValueError):
+        compile_forest(LogisticRegression().fit(X, y))
+
+
+def test_compact_artifact_in_registry(tmp_path, dataset):
+    X, y = dataset
+    pipeline = Pipeline(
+        [
+            ("scaler", StandardScaler()),
+            ("classifier", RandomForestClassifier(n_estimators=10, random_state=0)),
+        ]
+    ).fit(X, y)
+    model_path = str(tmp_path / "model.pkl")
+    joblib.dump(pipeline, model_path)
+    compact_path = export_compact(pipeline, str(tmp_path / "model.compact.pkl"), X)
+    registry_path = str(tmp_path / "registry.json")
+    register_model(
+        "RandomForestClassifier",
+        model_path,
+        {"best_f1": 0.5},
+        registry_path,
+        compact_path=compact_path,
+    )
+
+    compact, entry = load_champion(registry_path)
+    assert entry["compact"]["size_bytes"] < entry["size_bytes"]
+    # Таблицы узлов открыты через memory-map и не копируются при предсказании
+    forest = compact.steps[-1][1]
+    assert isinstance(forest.threshold, np.memmap)
+    np.testing.assert_allclose(
+        compact.predict_proba(X), pipeline.predict_proba(X), atol=1e-6
+    )
+
+    full, _ = load_champion(registry_path, compact=False)
+    assert full.steps[-1][1] is not forest
+    assert compact_pipeline(full).steps[0][1] is full.steps[0][1]
@@ -0,0 +1,94 @@
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import joblib
+from src.features.build_features import FEATURE_NAMES
+from src.models.pipeline import build_pipeline
+from src.models.registry import register_model
+from src.models.train_pipeline import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_healthy(url: str, seconds: float = 60) -> str:
+    deadline = time.monotonic() + seconds
+    while True:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1) as response:
+                return response.read().decode()
+        except (urllib.error.URLError, ConnectionError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def worker_pids(log_path) -> list[int]:
+    with open(log_path) as log:
+        return [
+            int(pid)
+            for pid in re.findall(r"Booting worker with pid: (\d+)", log.read())
+        ]
+
+
+def test_workers_share_champion_loaded_before_fork(tmp_path, raw_sample):
+    data = raw_sample(500)
+    pipeline = build_pipeline(
+        NUMERIC_FEATURES, CATEGORICAL_FEATURES, "LogisticRegression"
+    ).fit(data[FEATURE_NAMES], data["default.payment.next.month"])
+    model_path = str(tmp_path / "model.pkl")
+    joblib.dump(pipeline, model_path)
+    registry_path = str(tmp_path / "registry.json")
+    register_model("LogisticRegression", model_path, {"best_f1": 0.1}, registry_path)
+
+    url = f"http://127.0.0.1:{free_port()}"
+    env = {
+        **os.environ,
+        "BIND": url.removeprefix("http://"),
+        "WEB_CONCURRENCY": "2",
+        "MODEL_REGISTRY_PATH": registry_path,
+        "PROMETHEUS_MULTIPROC_DIR": str(tmp_path / "metrics"),
+        "PREDICTION_LOG": "0",
+        "PYTHONUNBUFFERED": "1",
+    }
+    log_path = tmp_path / "gunicorn.log"
+    with open(log_path, "w") as log:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "src/api/gunicorn_conf.py"]
+            + ["src.api.app:app"],
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    try:
+        assert "LogisticRegression:1" in wait_healthy(url)
+        # Чемпион загружен в мастере до создания воркеров
+        output = log_path.read_text()
+        assert output.count("загружена до создания воркеров") == 1
+        assert output.index("загружена до создания воркеров") < output.index(
+            "Booting worker"
+        )
+
+        # Новые воркеры форкаются от мастера и не читают модель с диска:
+        # без файла модели они всё равно отвечают тем же чемпионом
+        os.remove(model_path)
+        first = worker_pids(log_path)
+        for pid in first:
+            os.kill(pid, signal.SIGKILL)
+        deadline = time.monotonic() + 60
+        while len(worker_pids(log_path)) < len(first) + 2:
+            assert time.monotonic() < deadline
+            time.sleep(0.2)
+        assert "LogisticRegression:1" in wait_healthy(url)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
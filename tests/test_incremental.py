@@ -0,0 +1,71 @@
+import joblib
+import numpy as np
+from sklearn.model_selection import train_test_split
+from src.data.splits import TARGET_COLUMN
+from src.features.build_features import FEATURE_NAMES
+from src.models.incremental import neighbourhood, new_data_files, retrain_family
+from src.models.pipeline import MODELS, build_pipeline
+from src.models.train_pipeline import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+
+
+def forest_pipeline(**params):
+    pipeline = build_pipeline(
+        NUMERIC_FEATURES, CATEGORICAL_FEATURES, "RandomForestClassifier"
+    )
+    return pipeline.set_params(
+        **{f"classifier__{key}": value for key, value in params.items()}
+    )
+
+
+def test_neighbourhood_around_previous_params():
+    pipeline = forest_pipeline(n_estimators=400, min_samples_leaf=2, max_samples=0.8)
+    space = neighbourhood(
+        pipeline, MODELS["RandomForestClassifier"]["param_distributions"]
+    )
+    assert space["classifier__max_samples"] == [0.7, 0.8, 0.9]
+    assert space["classifier__min_samples_leaf"] == [1, 2]
+    # Число деревьев задаётся ростом ансамбля, нечисловые параметры не меняются
+    assert space["classifier__n_estimators"] == [400]
+    assert space["classifier__max_features"] == ["sqrt"]
+
+
+def test_retrain_family_grows_previous_forest(tmp_path, raw_sample):
+    data = raw_sample(3000)
+    old, new = data.iloc[:2000], data.iloc[2000:]
+    pipeline = forest_pipeline(n_estimators=20, random_state=0).fit(
+        old[FEATURE_NAMES], old[TARGET_COLUMN]
+    )
+    path = str(tmp_path / "model.pkl")
+    joblib.dump(pipeline, path)
+
+    X_train, X_val, y_train, y_val = train_test_split(
+        new[FEATURE_NAMES], new[TARGET_COLUMN], test_size=0.2, random_state=0
+    )
+    retrained, model_log = retrain_family(
+        "RandomForestClassifier",
+        {"id": "RandomForestClassifier:1", "path": path},
+        (X_train, y_train, X_val, y_val),
+        (len(new), len(old)),
+        n_jobs=1,
+    )
+
+    forest = retrained.steps[-1][1]
+    # 20 старых деревьев остались, новых - не меньше RETRAIN_MIN_NEW_ESTIMATORS
+    assert forest.n_estimators == 30
+    for before, after in zip(pipeline.steps[-1][1].estimators_, forest.estimators_):
+        np.testing.assert_array_equal(before.tree_.threshold, after.tree_.threshold)
+    # Препроцессор прошлой модели не переобучается
+    np.testing.assert_array_equal(
+        retrained[:-1].transform(X_val), pipeline[:-1].transform(X_val)
+    )
+    assert "previous_f1" in model_log["metrics"]
+
+
+def test_new_data_files_skips_processed(tmp_path):
+    for name in ("a.csv", "b.parquet", "notes.txt"):
+        (tmp_path / name).write_text("")
+    assert [path.split("/")[-1] for path in new_data_files(str(tmp_path), [])] == [
+        "a.csv",
+        "b.parquet",
+    ]
+    assert new_data_files(str(tmp_path), ["a.csv", "b.parquet"]) == []
@@ -0,0 +1,74 @@
+import threading
+from prometheus_client.parser import text_string_to_metric_families
+import src.api.app as api
+from src.api.cache import FileCache
+
+STAGES = ("validation", "features", "inference", "serialization")
+
+
+def scrape(client) -> dict:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+
+def delta(before: dict, after: dict, name: str, **labels) -> float:
+    key = (name, tuple(sorted(labels.items())))
+    return after.get(key, 0.0) - before.get(key, 0.0)
+
+
+def test_predictions_are_exposed_in_metrics(client, records):
+    before = scrape(client)
+    single = client.post("/predict", json=records[0]).json()
+    batch = client.post("/predict/batch", json={"records": records}).json()
+    after = scrape(client)
+    n_rows = 1 + len(records)
+
+    for endpoint in ("/predict", "/predict/batch"):
+        assert (
+            delta(before, after, "prediction_latency_seconds_count", endpoint=endpoint)
+            == 1
+        )
+    for stage in STAGES:
+        assert delta(before, after, "prediction_stage_seconds_count", stage=stage) == 2
+    assert delta(before, after, "prediction_batch_size_count") == 2
+    assert delta(before, after, "prediction_batch_size_sum") == n_rows
+    defaults = single["default_prediction"] + sum(batch["default_predictions"])
+    assert delta(before, after, "predictions_total", prediction="1") == defaults
+    assert (
+        delta(before, after, "predictions_total", prediction="0") == n_rows - defaults
+    )
+
+
+def test_cache_hits_are_counted_off_the_event_loop(
+    client, records, monkeypatch, tmp_path
+):
+    cache = FileCache(str(tmp_path / "cache.sqlite"))
+    threads = []
+    get = cache.get
+
+    def tracked_get(key):
+        threads.append(threading.current_thread())
+        return get(key)
+
+    monkeypatch.setattr(cache, "get", tracked_get)
+    monkeypatch.setattr(api, "prediction_cache", cache)
+    before = scrape(client)
+    first = client.post("/predict", json=records[0]).json()
+    assert client.post("/predict", json=records[0]).json() == first
+    after = scrape(client)
+
+    # SQLite опрашивается в пуле потоков, а не в потоке event loop
+    assert len(threads) == 2 and threading.main_thread() not in threads
+    assert delta(before, after, "prediction_cache_requests_total", result="hit") == 1
+    predicted = sum(
+        delta(before, after, "predictions_total", prediction=label)
+        for label in ("0", "1")
+    )
+    assert predicted == 2
+    # Размер пачки считает только вызовы модели
+    assert delta(before, after, "prediction_batch_size_count") == 1
@@ -0,0 +1,74 @@
+import joblib
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from onxx_transformation.export import export_onnx, select_variant
+from src.api.backends import SklearnBackend, create_backend
+from src.features.build_features import FEATURE_NAMES
+from src.models.registry import load_champion, register_model, update_model
+
+
+def test_onnx_matches_sklearn_on_float32_input(tmp_path, raw_sample):
+    data = raw_sample(2000)
+    # Тот же препроцессор, что в src/models/pipeline.py
+    preprocessor = ColumnTransformer(
+        [
+            (
+                "num",
+                Pipeline(
+                    [
+                        ("imputer", SimpleImputer(strategy="median")),
+                        ("scaler", StandardScaler()),
+                    ]
+                ),
+                ["LIMIT_BAL", "AGE", "BILL_AMT1", "PAY_AMT1"],
+            ),
+            ("cat", OneHotEncoder(handle_unknown="ignore"), ["EDUCATION", "PAY_0"]),
+        ]
+    )
+    pipeline = Pipeline(
+        [
+            ("preprocessor", preprocessor),
+            ("classifier", GradientBoostingClassifier(n_estimators=50, random_state=0)),
+        ]
+    ).fit(data[FEATURE_NAMES], data["default.payment.next.month"])
+    model_path = str(tmp_path / "model.pkl")
+    joblib.dump(pipeline, model_path)
+    onnx_path = export_onnx(pipeline, str(tmp_path / "model_v1.onnx"))
+
+    registry_path = str(tmp_path / "registry.json")
+    entry = register_model(
+        "GradientBoostingClassifier", model_path, {"best_f1": 0.5}, registry_path
+    )
+    update_model(
+        entry["id"],
+        {"onnx": {"onnx": {"path": onnx_path}}, "onnx_best": "onnx"},
+        registry_path,
+    )
+    pipeline, entry = load_champion(registry_path, compact=False)
+
+    # Путь к ONNX берётся из записи реестра, а не из ONNX_MODEL_PATH
+    backend = create_backend(pipeline, "onnx_best", entry)
+    assert backend.name == "onnx"
+    matrix = data[FEATURE_NAMES].to_numpy(dtype=np.float32)
+    np.testing.assert_allclose(
+        backend.predict_proba(matrix),
+        SklearnBackend(pipeline).predict_proba(matrix),
+        atol=1e-5,
+    )
+
+
+def test_select_variant_prefers_simple_graph_within_noise():
+    report = {"max_diff": 0.0, "roc_auc_delta": 0.0}
+    reports = {
+        "onnx": {**report, "p50_ms": 1.0},
+        "onnx_opt": {**report, "p50_ms": 0.98},
+        "onnx_int8": {**report, "max_diff": 0.2, "p50_ms": 0.5},
+        "onnx_dynamic": {**report, "p50_ms": 0.8},
+    }
+    assert select_variant(reports) == "onnx_dynamic"
+    del reports["onnx_dynamic"]
+    assert select_variant(reports) == "onnx"
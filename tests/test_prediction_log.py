@@ -0,0 +1,24 @@
+import numpy as np
+from src.features.build_features import FEATURE_NAMES
+from src.monitoring.prediction_log import PredictionLog, read_prediction_logs
+
+
+def test_ring_buffer_drops_when_full_and_writes_in_order(tmp_path):
+    log = PredictionLog(str(tmp_path), capacity=8, rotate_rows=10)
+    matrix = np.arange(6 * len(FEATURE_NAMES), dtype=np.float32).reshape(6, -1)
+    proba = np.linspace(0, 1, 6, dtype=np.float32)
+
+    assert log.push(matrix, proba, 0.001, "Model:1") == 6
+    assert log.push(matrix, proba, 0.001, "Model:2") == 2
+    assert log.stats()["dropped"] == 4
+    assert log.flush() == 8
+    # Запись через границу кольцевого буфера
+    assert log.push(matrix, proba, 0.001, "Model:2") == 6
+    log.flush()
+    log._rotate_if_needed()
+
+    logs = read_prediction_logs(str(tmp_path))
+    assert len(logs) == 14
+    np.testing.assert_array_equal(logs[FEATURE_NAMES].to_numpy()[8:], matrix)
+    np.testing.assert_array_equal(logs["probability"].to_numpy()[:6], proba)
+    assert logs["model"].tolist() == ["Model:1"] * 6 + ["Model:2"] * 8
@@ -0,0 +1,100 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from src.models.registry import (
+    get_champion,
+    load_champion,
+    read_registry,
+    register_model,
+    select_champion,
+)
+
+
+def fit_model(path):
+    X = np.array([[0.0], [1.0], [2.0], [3.0]])
+    y = np.array([0, 0, 1, 1])
+    joblib.dump(LogisticRegression().fit(X, y), path)
+    return str(path)
+
+
+def test_champion_is_best_f1(tmp_path):
+    registry_path = str(tmp_path / "registry.json")
+    first = fit_model(tmp_path / "first.pkl")
+    second = fit_model(tmp_path / "second.pkl")
+
+    register_model("LogisticRegression", first, {"best_f1": 0.5}, registry_path)
+    register_model("LogisticRegression", second, {"best_f1": 0.4}, registry_path)
+
+    champion = get_champion(registry_path)
+    assert champion["id"] == "LogisticRegression:1"
+    assert champion["path"] == first
+
+
+def test_load_champion_checks_hash(tmp_path):
+    registry_path = str(tmp_path / "registry.json")
+    path = fit_model(tmp_path / "model.pkl")
+    register_model("LogisticRegression", path, {"best_f1": 0.5}, registry_path)
+
+    model, entry = load_champion(registry_path)
+    assert model.predict_proba([[3.0]])[0][1] > 0.5
+
+    with open(path, "ab") as f:
+        f.write(b"0")
+    with pytest.raises(ValueError):
+        load_champion(registry_path)
+
+
+def test_load_champion_falls_back_to_next_version(tmp_path):
+    registry_path = str(tmp_path / "registry.json")
+    first = fit_model(tmp_path / "first.pkl")
+    second = fit_model(tmp_path / "second.pkl")
+    register_model("LogisticRegression", first, {"best_f1": 0.4}, registry_path)
+    register_model("LogisticRegression", second, {"best_f1": 0.5}, registry_path)
+
+    # Файл чемпиона изменён после регистрации: загружается следующая версия
+    with open(second, "ab") as f:
+        f.write(b"0")
+    _, entry = load_champion(registry_path)
+    assert entry["id"] == "LogisticRegression:1"
+    assert get_champion(registry_path)["id"] == "LogisticRegression:2"
+
+
+def test_champion_prefers_test_split_score(tmp_path):
+    registry_path = str(tmp_path / "registry.json")
+    legacy = fit_model(tmp_path / "legacy.pkl")
+    scored = fit_model(tmp_path / "scored.pkl")
+    register_model("LogisticRegression", legacy, {"best_f1": 0.9}, registry_path)
+    # F1 кросс-валидации не сравнивается с F1 на тестовой выборке
+    register_model(
+        "LogisticRegression", scored, {"best_f1": 0.5, "test_f1": 0.4}, registry_path
+    )
+    assert get_champion(registry_path)["id"] == "LogisticRegression:2"
+
+
+def test_champion_fits_serving_budget(tmp_path):
+    registry_path = str(tmp_path / "registry.json")
+    fast = fit_model(tmp_path / "fast.pkl")
+    slow = fit_model(tmp_path / "slow.pkl")
+
+    register_model(
+        "LogisticRegression",
+        fast,
+        {"best_f1": 0.4},
+        registry_path,
+        serving={"p95_ms": 1.0, "memory_mb": 10.0},
+    )
+    # Лучший F1, но p95 выше бюджета
+    register_model(
+        "RandomForestClassifier",
+        slow,
+        {"best_f1": 0.5},
+        registry_path,
+        serving={"p95_ms": 500.0, "memory_mb": 10.0},
+    )
+    assert get_champion(registry_path)["id"] == "LogisticRegression:1"
+
+    models = read_registry(registry_path)["models"]
+    assert select_champion(models, max_p95_ms=1000)["id"] == "RandomForestClassifier:1"
+    # Если в бюджет не укладывается никто, выбирается самая быстрая модель
+    assert select_champion(models, max_p95_ms=0.1)["id"] == "LogisticRegression:1"
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from sklearn.model_selection import RandomizedSearchCV
+from src.models.pipeline import SCORING, build_pipeline
+from src.models.search import search_models
+
+NUMERIC = ["LIMIT_BAL", "AGE", "BILL_AMT1", "PAY_AMT1"]
+CATEGORICAL = ["EDUCATION", "MARRIAGE", "PAY_0"]
+PARAMS = {
+    "classifier__C": [0.01, 0.1, 1, 10],
+    "classifier__class_weight": [None, "balanced", {0: 1, 1: 3}],
+}
+
+
+@pytest.fixture
+def dataset(raw_sample) -> tuple:
+    data = raw_sample(1500)
+    return (
+        data.drop(columns=["ID", "default.payment.next.month"]),
+        data["default.payment.next.month"],
+    )
+
+
+@pytest.mark.parametrize("cache_folds", [True, False])
+def test_without_halving_matches_randomized_search(cache_folds, dataset):
+    X, y = dataset
+    pipeline = build_pipeline(NUMERIC, CATEGORICAL, "LogisticRegression")
+    random_search = RandomizedSearchCV(
+        pipeline, PARAMS, n_iter=6, scoring=SCORING, refit="f1", random_state=42
+    ).fit(X, y)
+
+    result = search_models(
+        {"LogisticRegression": (pipeline, PARAMS)},
+        X,
+        y,
+        SCORING,
+        n_iter=6,
+        halving_factor=1,
+        cache_folds=cache_folds,
+        n_jobs=1,
+        verbose=False,
+    )["LogisticRegression"]
+
+    assert result["best_params"] == random_search.best_params_
+    np.testing.assert_allclose(
+        [candidate["mean_test_f1"] for candidate in result["cv_results"]],
+        random_search.cv_results_["mean_test_f1"],
+    )
+
+
+def test_halving_keeps_best_candidates_for_full_data(dataset):
+    X, y = dataset
+    pipeline = build_pipeline(NUMERIC, CATEGORICAL, "LogisticRegression")
+    result = search_models(
+        {"LogisticRegression": (pipeline, PARAMS)},
+        X,
+        y,
+        SCORING,
+        n_iter=9,
+        halving_factor=3,
+        min_resources=100,
+        n_jobs=1,
+        verbose=False,
+    )["LogisticRegression"]
+
+    best = result["cv_results"][result["best_index"]]
+    assert best["n_resources"] == len(X)
+    finalists = [c for c in result["cv_results"] if c["n_resources"] == len(X)]
+    assert len(finalists) == 1
+    assert result["best_estimator"].predict(X[:5]).shape == (5,)
@@ -0,0 +1,57 @@
+import os
+import numpy as np
+import pytest
+from src.data.splits import TARGET_COLUMN, write_split
+from src.models.pipeline import SCORING, build_pipeline
+from src.models.search import search_models
+from src.models.session import TrainingSession
+
+
+@pytest.fixture
+def dataset(raw_sample) -> tuple:
+    data = raw_sample(1200)
+    return data.drop(columns=["ID", TARGET_COLUMN]), data[TARGET_COLUMN]
+
+
+def write_splits(processed_dir, X, y, y_train):
+    write_split(X[:1000], "x_train", processed_dir)
+    write_split(y_train, "y_train", processed_dir)
+    write_split(X[1000:], "x_test", processed_dir)
+    write_split(y[1000:], "y_test", processed_dir)
+
+
+def test_session_shares_splits_between_workers(tmp_path, dataset):
+    X, y = dataset
+    write_splits(tmp_path, X, y, y[:1000])
+    with TrainingSession(tmp_path, shared_dir=tmp_path) as session:
+        folder = session.folder
+        assert isinstance(session.X_train["LIMIT_BAL"].to_numpy().base, np.memmap)
+        np.testing.assert_array_equal(session.y_train, y[:1000])
+
+        result = search_models(
+            {
+                "LogisticRegression": (
+                    build_pipeline(
+                        ["LIMIT_BAL", "AGE"], ["PAY_0"], "LogisticRegression"
+                    ),
+                    {"classifier__C": [0.1, 1]},
+                )
+            },
+            session.X_train,
+            session.y_train,
+            SCORING,
+            n_iter=2,
+            cv=3,
+            halving_factor=1,
+            n_jobs=2,
+            verbose=False,
+        )["LogisticRegression"]
+        assert result["best_estimator"].predict(session.X_test).shape == (200,)
+    assert not os.path.exists(folder)
+
+
+def test_session_rejects_bad_labels(tmp_path, dataset):
+    X, y = dataset
+    write_splits(tmp_path, X, y, y[:1000].replace(1, 2))
+    with pytest.raises(ValueError, match="недопустимые метки"):
+        TrainingSession(tmp_path, shared_dir=tmp_path)
@@ -0,0 +1,67 @@
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+import pytest
+from src.data.splits import (
+    SCHEMA,
+    TARGET_COLUMN,
+    SplitWriter,
+    read_split,
+    split_path,
+    write_split,
+)
+
+
+@pytest.fixture
+def data(raw_sample):
+    return raw_sample(1000).drop(columns=["ID"])
+
+
+def test_split_round_trip(tmp_path, data):
+    write_split(data, "whole", tmp_path)
+    whole = read_split("whole", tmp_path)
+    assert dict(whole.dtypes.astype(str)) == SCHEMA
+    assert np.array_equal(whole.to_numpy(), data.to_numpy())
+    # Без copy колонки смотрят в memory-map и доступны только для чтения
+    assert not whole["LIMIT_BAL"].to_numpy().flags.writeable
+    assert (
+        read_split("whole", tmp_path, copy=True)["LIMIT_BAL"].to_numpy().flags.writeable
+    )
+
+    # Запись по частям даёт ту же выборку, что и запись целиком
+    writer = SplitWriter("chunked", tmp_path)
+    for start in range(0, len(data), 300):
+        writer.write(data[start : start + 300])
+    assert not os.path.exists(split_path("chunked", tmp_path))
+    writer.commit()
+    assert writer.n_rows == len(data)
+    assert read_split("chunked", tmp_path, copy=True).equals(whole)
+
+    write_split(data[TARGET_COLUMN], "y", tmp_path)
+    assert read_split("y", tmp_path)[TARGET_COLUMN].dtype == np.int8
+
+
+def test_schema_mismatch_is_rejected(tmp_path, data):
+    # LIMIT_BAL в float64 вместо float32 из схемы
+    feather.write_feather(
+        pa.Table.from_pandas(data[["LIMIT_BAL"]], preserve_index=False),
+        split_path("wide", tmp_path),
+    )
+    with pytest.raises(ValueError, match="LIMIT_BAL"):
+        read_split("wide", tmp_path)
+
+    # Колонки нет в схеме
+    feather.write_feather(
+        pa.table({"ID": pa.array([1, 2], pa.int64())}), split_path("extra", tmp_path)
+    )
+    with pytest.raises(ValueError, match="ID"):
+        read_split("extra", tmp_path)
+
+    # Прерванная запись по частям не оставляет ни выборки, ни временного файла
+    writer = SplitWriter("aborted", tmp_path)
+    writer.write(data[:10])
+    writer.abort()
+    assert sorted(os.listdir(tmp_path)) == ["extra.feather", "wide.feather"]
+    with pytest.raises(ValueError):
+        SplitWriter("empty", tmp_path).commit()
@@ -0,0 +1,74 @@
+import os
+from src.data.stage_cache import StageCache, cached_stage
+
+
+def write(path, text: str) -> str:
+    path.write_text(text)
+    return str(path)
+
+
+def test_cached_stage_restores_outputs(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"), max_bytes=2**20)
+    source = write(tmp_path / "input.csv", "a,b\n1,2\n")
+    output = str(tmp_path / "output.txt")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        write(tmp_path / "output.txt", "result")
+        return {"rows": 1}
+
+    def run():
+        return cached_stage(
+            "stage",
+            compute,
+            lambda value: {"output.txt": output},
+            inputs=[source],
+            params={"alpha": 1},
+            cache=cache,
+        )
+
+    assert run() == {"rows": 1}
+    os.remove(output)
+    # Второй запуск не пересчитывает этап и возвращает файл на место
+    assert run() == {"rows": 1}
+    assert len(calls) == 1
+    assert open(output).read() == "result"
+
+    # Изменение содержимого входа меняет ключ
+    write(tmp_path / "input.csv", "a,b\n1,3\n")
+    run()
+    assert len(calls) == 2
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"), max_bytes=2**30)
+    payload = write(tmp_path / "payload.bin", "x" * 400_000)
+    for key in ("old", "used", "new"):
+        cache.store("stage", key, {"payload.bin": payload}, {"key": key})
+        os.utime(
+            os.path.join(cache.cache_dir, f"stage-{key}", "manifest.json"),
+            (0, {"old": 1, "used": 2, "new": 3}[key]),
+        )
+    # Загрузка обновляет время использования записи
+    assert cache.load("stage", "old") == {"key": "old"}
+
+    cache.max_bytes = 900_000
+    assert cache.evict() == 1
+    names = sorted(os.listdir(cache.cache_dir))
+    assert names == ["stage-new", "stage-old"]
+
+
+def test_load_restores_to_computed_destinations(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"), max_bytes=2**20)
+    model = write(tmp_path / "model.pkl", "v1")
+    cache.store("stage", "key", {"model.pkl": model}, {"version": 2})
+
+    # Пути восстановления выбираются по значению записи, исходный файл не трогается
+    def destinations(value):
+        return {"model.pkl": str(tmp_path / f"model_v{value['version']}.pkl")}
+
+    write(tmp_path / "model.pkl", "v3")
+    assert cache.load("stage", "key", destinations) == {"version": 2}
+    assert open(tmp_path / "model_v2.pkl").read() == "v1"
+    assert open(model).read() == "v3"
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+# Бюджет холодного старта сервиса: импорт src.api.app в чистом процессе.
+# Модули обучения, валидации данных и экспорта не должны подтягиваться
+STARTUP_IMPORT_SECONDS = float(os.environ.get("STARTUP_IMPORT_SECONDS", 5))
+STARTUP_RSS_MB = float(os.environ.get("STARTUP_RSS_MB", 300))
+TRAINING_MODULES = [
+    "mlflow",
+    "matplotlib",
+    "skl2onnx",
+    "onnxruntime",
+    "great_expectations",
+    "sklearn.ensemble",
+    "src.data.make_dataset",
+    "src.models.train_pipeline",
+]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import src.api.app
+seconds = time.perf_counter() - started
+# VmHWM - пик RSS текущего образа процесса; ru_maxrss после exec может
+# унаследовать пик родителя (pytest)
+with open("/proc/self/status") as status:
+    hwm = next(line for line in status if line.startswith("VmHWM"))
+print(json.dumps({
+    "seconds": seconds,
+    "rss_mb": int(hwm.split()[1]) / 1024,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def test_serving_import_budget():
+    env = {**os.environ, "PREDICTION_LOG": "0", "PREDICTION_CACHE": "off"}
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    ).stdout
+    startup = json.loads(output.strip().splitlines()[-1])
+
+    loaded = [module for module in TRAINING_MODULES if module in startup["modules"]]
+    assert loaded == []
+    assert startup["seconds"] < STARTUP_IMPORT_SECONDS
+    assert startup["rss_mb"] < STARTUP_RSS_MB
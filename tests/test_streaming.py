@@ -0,0 +1,23 @@
+import os
+from src.data.splits import load_splits
+from src.data.streaming import stream_and_split_data
+
+RAW_PATH = "data/raw/UCI_Credit_Card.csv"
+
+
+def test_split_does_not_depend_on_chunking(tmp_path):
+    assert stream_and_split_data(RAW_PATH, processed_dir=tmp_path / "whole")
+    assert stream_and_split_data(RAW_PATH, chunk_rows=4000, processed_dir=tmp_path)
+
+    whole = load_splits(tmp_path / "whole", copy=True)
+    chunked = load_splits(tmp_path, copy=True)
+    for expected, actual in zip(whole, chunked):
+        assert expected.equals(actual)
+    assert abs(len(whole[2]) / 30000 - 0.2) < 0.01
+
+
+def test_failed_validation_leaves_no_splits(tmp_path):
+    assert not stream_and_split_data(
+        "data/raw/UCI_Credit_Card_not_corr.csv", processed_dir=tmp_path
+    )
+    assert os.listdir(tmp_path) == []
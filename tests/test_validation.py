@@ -0,0 +1,50 @@
+import numpy as np
+from src.data.validation import CompiledSuite, load_suite, validate_frame
+
+
+def broken_data(clean_data):
+    frame = clean_data.copy()
+    frame.loc[3, "AGE"] = 150
+    frame.loc[5, "LIMIT_BAL"] = np.nan
+    frame.loc[7, "default.payment.next.month"] = 3
+    frame["SEX"] = frame["SEX"].astype("int8")
+    return frame.drop(columns=["PAY_AMT6"])
+
+
+def test_matches_great_expectations(tmp_path, clean_data):
+    import great_expectations as ge
+    from great_expectations.core import ExpectationConfiguration
+    from great_expectations.core.expectation_suite import ExpectationSuite
+
+    suite = load_suite(str(tmp_path))
+    ge_suite = ExpectationSuite(expectation_suite_name=suite["expectation_suite_name"])
+    for expectation in suite["expectations"]:
+        ge_suite.add_expectation(ExpectationConfiguration(**expectation))
+
+    for frame in (clean_data, broken_data(clean_data)):
+        expected = ge.from_pandas(frame, expectation_suite=ge_suite).validate()
+        report = CompiledSuite(suite).validate(frame)
+
+        def outcomes(results):
+            return sorted(
+                (
+                    result["expectation_config"]["expectation_type"],
+                    result["expectation_config"]["kwargs"]["column"],
+                    result["success"],
+                )
+                for result in results
+            )
+
+        assert outcomes(report["results"]) == outcomes(
+            expected.to_json_dict()["results"]
+        )
+        assert report["success"] == expected.success
+
+
+def test_suite_cached_by_content_hash(tmp_path, clean_data):
+    suite = load_suite(str(tmp_path))
+    path = tmp_path / "credit_card_data_suite.json"
+    modified = path.stat().st_mtime_ns
+    assert load_suite(str(tmp_path)) == suite
+    assert path.stat().st_mtime_ns == modified
+    assert validate_frame(clean_data, str(tmp_path))["success"]